@@ -0,0 +1,195 @@
+"""Estimation et limitation de bande passante des téléchargements (sans dépendance Kivy)"""
+
+import threading
+import time
+
+
+class BandwidthEstimator:
+    """Estimateur partagé par les connexions d'un même téléchargement
+
+    Deux moyennes mobiles exponentielles (EWMA) sont suivies:
+    - `fresh_rate`: débit d'une connexion pendant sa première fenêtre, là où
+      les fournisseurs laissent passer une rafale avant de brider;
+    - `ttfb`: temps jusqu'au premier octet, c'est-à-dire le coût d'une
+      reconnexion.
+    Une reconnexion n'est décidée que si la rafale attendue rapporte plus
+    d'octets que ce que coûte la poignée de main.
+    """
+
+    def __init__(self, alpha=0.3, window=1.0, margin=1.2, min_gain=0.2):
+        self.alpha = alpha
+        self.window = window
+        self.margin = margin
+        self.min_gain = min_gain
+
+        self.fresh_rate = None
+        self.ttfb = None
+
+    def _ewma(self, previous, sample):
+        if previous is None:
+            return sample
+        return previous + self.alpha * (sample - previous)
+
+    def record_ttfb(self, seconds):
+        self.ttfb = self._ewma(self.ttfb, seconds)
+
+    def record_fresh_rate(self, rate):
+        self.fresh_rate = self._ewma(self.fresh_rate, rate)
+
+    def monitor(self, label=''):
+        """Créer le suivi d'une nouvelle connexion"""
+        return ConnectionMonitor(self, label)
+
+    def should_reconnect(self, current_rate):
+        """Comparer les octets attendus sur une fenêtre avec et sans reconnexion"""
+        if current_rate <= 0:
+            return True, "connexion bloquee"
+        if self.fresh_rate is None or self.ttfb is None:
+            return False, "estimation en cours"
+        if self.fresh_rate <= current_rate * (1 + self.min_gain):
+            return False, "debit stable"
+
+        horizon = self.window
+        reconnect_bytes = self.fresh_rate * max(horizon - self.ttfb, 0)
+        keep_bytes = current_rate * horizon
+        if reconnect_bytes > keep_bytes * self.margin:
+            return True, "rafale attendue superieure au cout de reconnexion"
+        return False, "reconnexion trop couteuse"
+
+
+class ConnectionMonitor:
+    """Mesures d'une connexion, évaluées à chaque fenêtre de l'estimateur"""
+
+    def __init__(self, estimator, label=''):
+        self.estimator = estimator
+        self.label = label
+        self.request_time = time.time()
+        self.first_byte_time = None
+        self.window_start = None
+        self.window_bytes = 0
+        self.window_index = 0
+        self.rate = None
+
+    def first_byte(self):
+        """Appelé quand les en-têtes de la réponse sont reçus"""
+        now = time.time()
+        self.first_byte_time = self.window_start = now
+        self.estimator.record_ttfb(now - self.request_time)
+
+    def add(self, nbytes):
+        """Comptabiliser des octets reçus; retourne True s'il faut reconnecter"""
+        if self.first_byte_time is None:
+            self.first_byte()
+        self.window_bytes += nbytes
+
+        now = time.time()
+        elapsed = now - self.window_start
+        if elapsed < self.estimator.window:
+            return False
+
+        window_rate = self.window_bytes / elapsed
+        self.window_start = now
+        self.window_bytes = 0
+        self.window_index += 1
+
+        if self.window_index == 1:
+            self.estimator.record_fresh_rate(window_rate)
+            self.rate = window_rate
+            return False
+
+        self.rate = self.estimator._ewma(self.rate, window_rate)
+        reconnect, reason = self.estimator.should_reconnect(self.rate)
+        self._log(reconnect, reason)
+        return reconnect
+
+    def _log(self, reconnect, reason):
+        estimator = self.estimator
+        fresh = (estimator.fresh_rate or 0) / (1024 * 1024)
+        ttfb = (estimator.ttfb or 0) * 1000
+        action = "reconnexion" if reconnect else "conservee"
+        print(f"DEBUG: Connexion {self.label} {action}: {reason} "
+              f"(actuel {self.rate / (1024 * 1024):.2f} MB/s, rafale {fresh:.2f} MB/s, ttfb {ttfb:.0f} ms)")
+
+
+class BandwidthShaper:
+    """Limiteur de débit global (seau à jetons) partagé par tous les téléchargements
+
+    Le débit global est réparti entre les jobs actifs au prorata de leur
+    poids: un job seul dispose de tout le débit, deux jobs de poids 2 et 1
+    en reçoivent 2/3 et 1/3. Un débit de 0 signifie illimité. Le débit peut
+    être modifié à tout moment avec set_rate().
+    """
+
+    def __init__(self, rate=0, burst_seconds=0.25):
+        self.rate = rate
+        self.burst_seconds = burst_seconds
+        self.jobs = []
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate):
+        """Changer le débit global (octets/s, 0 = illimité)"""
+        with self._lock:
+            self.rate = max(0, int(rate))
+            for job in self.jobs:
+                job.tokens = min(job.tokens, self._share(job) * self.burst_seconds)
+
+    def job(self, weight=1.0, label=''):
+        """Enregistrer un job; à utiliser comme context manager"""
+        return ShaperJob(self, weight, label)
+
+    def _share(self, job):
+        total_weight = sum(j.weight for j in self.jobs) or job.weight
+        return self.rate * job.weight / total_weight
+
+    def _register(self, job):
+        with self._lock:
+            job.last_refill = time.time()
+            self.jobs.append(job)
+
+    def _unregister(self, job):
+        with self._lock:
+            if job in self.jobs:
+                self.jobs.remove(job)
+
+    def consume(self, job, nbytes):
+        """Bloquer jusqu'à ce que `nbytes` puissent être transférés par ce job"""
+        while True:
+            with self._lock:
+                if self.rate <= 0:
+                    return
+                share = self._share(job)
+                now = time.time()
+                job.tokens = min(job.tokens + share * (now - job.last_refill),
+                                 max(share * self.burst_seconds, nbytes))
+                job.last_refill = now
+                if job.tokens >= nbytes:
+                    job.tokens -= nbytes
+                    return
+                wait = (nbytes - job.tokens) / share
+            time.sleep(min(wait, 0.1))
+
+
+class ShaperJob:
+    """Part d'un job dans le BandwidthShaper"""
+
+    def __init__(self, shaper, weight=1.0, label=''):
+        self.shaper = shaper
+        self.weight = weight
+        self.label = label
+        self.tokens = 0.0
+        self.last_refill = 0.0
+
+    def consume(self, nbytes):
+        self.shaper.consume(self, nbytes)
+
+    def __enter__(self):
+        self.shaper._register(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shaper._unregister(self)
+        return False
+
+
+# Limiteur unique du processus, utilisé par toutes les boucles d'écriture
+shaper = BandwidthShaper()
@@ -0,0 +1,107 @@
+"""Benchmark des chemins de téléchargement contre le serveur à pannes local
+
+Usage: python benchmarks/bench_download.py [--size MB] [--scenario NOM ...]
+
+Pour chaque scénario et chaque chemin (série, segmenté, file d'épisodes)
+affiche le débit, les reconnexions, les octets retéléchargés (octets
+envoyés par le serveur au-delà de la taille utile) et la durée.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fault_server import FaultConfig, FaultServer  # noqa: E402
+from downloader import Downloader  # noqa: E402
+from download_queue import DownloadQueue, DownloadItem, DONE  # noqa: E402
+
+
+MB = 1024 * 1024
+
+SCENARIOS = {
+    'propre': lambda: FaultConfig(),
+    'bride': lambda: FaultConfig(burst=2 * MB, rate=4 * MB),
+    'coupures': lambda: FaultConfig(disconnect_rate=0.01),
+    'sans-longueur': lambda: FaultConfig(no_length=True),
+    'sans-range': lambda: FaultConfig(ignore_range=True),
+}
+
+
+def run_downloader(server, workdir, segments):
+    path = os.path.join(workdir, f'serie{segments}.bin')
+    result = Downloader(server.url(), path, None, segments=segments).run()
+    with open(path, 'rb') as f:
+        ok = result['complete'] and f.read() == server.data
+    return ok, len(server.data), result['reconnections']
+
+
+def run_queue(server, workdir, episodes=4, workers=3):
+    items = [DownloadItem(server.url(f'ep{i}.mp4'), os.path.join(workdir, f'ep{i}.bin'))
+             for i in range(episodes)]
+    queue = DownloadQueue(max_workers=workers, backoff=0.1)
+    for item in items:
+        queue.add(item)
+    counts = queue.run()
+    ok = counts[DONE] == episodes
+    for item in items:
+        with open(item.save_path, 'rb') as f:
+            ok = ok and f.read() == server.data
+    reconnections = sum(item.result['reconnections'] for item in items if item.result)
+    return ok, len(server.data) * episodes, reconnections
+
+
+PATHS = {
+    'serie': lambda server, workdir: run_downloader(server, workdir, 1),
+    'segmente': lambda server, workdir: run_downloader(server, workdir, 4),
+    'file': run_queue,
+}
+
+
+def bench(server, scenario, path_name, workdir):
+    server.reset_counters(SCENARIOS[scenario]())
+    start = time.time()
+    ok, useful_bytes, reconnections = PATHS[path_name](server, workdir)
+    elapsed = time.time() - start
+    return {
+        'scenario': scenario,
+        'path': path_name,
+        'ok': ok,
+        'mb_s': useful_bytes / MB / elapsed if elapsed > 0 else 0,
+        'reconnections': reconnections,
+        'refetched': max(0, server.bytes_sent - useful_bytes),
+        'requests': server.requests,
+        'elapsed': elapsed,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=32, help='taille du fichier servi (MB)')
+    parser.add_argument('--scenario', nargs='*', choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--path', nargs='*', choices=sorted(PATHS), default=list(PATHS))
+    args = parser.parse_args(argv)
+
+    server = FaultServer.with_random_data(args.size * MB).start()
+    workdir = tempfile.mkdtemp(prefix='iptv-bench-')
+    print(f"{'scenario':<14}{'chemin':<10}{'MB/s':>8}{'reconn':>8}{'refetch MB':>12}{'requetes':>10}{'duree s':>9}  ok")
+    try:
+        for scenario in args.scenario:
+            for path_name in args.path:
+                row = bench(server, scenario, path_name, workdir)
+                print(f"{row['scenario']:<14}{row['path']:<10}{row['mb_s']:>8.1f}{row['reconnections']:>8}"
+                      f"{row['refetched'] / MB:>12.1f}{row['requests']:>10}{row['elapsed']:>9.2f}  "
+                      f"{'oui' if row['ok'] else 'NON'}")
+                for name in os.listdir(workdir):
+                    os.remove(os.path.join(workdir, name))
+    finally:
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark de la boucle de réception: iter_content contre readinto sur tampons recyclés
+
+Usage: python benchmarks/bench_receive.py [--size MB] [--rounds N]
+
+À lancer aussi sur l'appareil ARM cible (Termux ou adb shell avec le
+Python de l'APK): le coût par MB y dépend surtout des allocations et des
+copies que ce benchmark compare. Colonnes: débit, temps CPU par MB,
+nombre de nouveaux tampons de corps alloués, pic mémoire Python. Le
+serveur local tourne dans le même processus: son CPU est compté pour les
+deux chemins, l'écart mesuré est donc un minorant.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fault_server import FaultServer  # noqa: E402
+import http_client  # noqa: E402
+from disk_writer import BufferPool, FileWriter  # noqa: E402
+from downloader import PooledReader  # noqa: E402
+
+
+MB = 1024 * 1024
+CHUNK_SIZE = 512 * 1024
+
+
+def receive_iter_content(url, path, pool):
+    """Boucle historique: un nouvel objet bytes par chunk"""
+    allocations = 0
+    position = 0
+    response = http_client.client.stream(url)
+    with FileWriter(path, truncate=True) as writer:
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            allocations += 1
+            writer.write(position, chunk)
+            position += len(chunk)
+    response.close()
+    return position, allocations
+
+
+def receive_pooled(url, path, pool):
+    """readinto dans des tampons recyclés après écriture (pool alloué une fois)"""
+    position = 0
+    response = http_client.client.stream(url)
+    with FileWriter(path, truncate=True) as writer:
+        reader = PooledReader(response, pool)
+        for chunk in reader:
+            writer.write(position, chunk, reader.take())
+            position += len(chunk)
+    response.close()
+    return position, 0
+
+
+PATHS = {
+    'iter_content': receive_iter_content,
+    'readinto': receive_pooled,
+}
+
+
+def bench(name, url, path, rounds):
+    tracemalloc.start()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    pool = BufferPool(CHUNK_SIZE, 18) if name == 'readinto' else None
+    allocations = pool.count if pool else 0
+    total = 0
+    for _ in range(rounds):
+        received, allocated = PATHS[name](url, path, pool)
+        total += received
+        allocations += allocated
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'path': name,
+        'mb_s': total / MB / wall,
+        'cpu_ms_per_mb': cpu * 1000 / (total / MB),
+        'allocations': allocations,
+        'peak_mb': peak / MB,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=64, help='taille du fichier servi (MB)')
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    server = FaultServer.with_random_data(args.size * MB).start()
+    fd, path = tempfile.mkstemp(prefix='iptv-bench-')
+    os.close(fd)
+    print(f"{'chemin':<14}{'MB/s':>8}{'CPU ms/MB':>11}{'tampons':>9}{'pic MB':>8}")
+    try:
+        for name in PATHS:
+            row = bench(name, server.url(), path, args.rounds)
+            print(f"{row['path']:<14}{row['mb_s']:>8.1f}{row['cpu_ms_per_mb']:>11.2f}"
+                  f"{row['allocations']:>9}{row['peak_mb']:>8.1f}")
+    finally:
+        server.stop()
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
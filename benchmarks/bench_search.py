@@ -0,0 +1,121 @@
+"""Benchmark de la recherche: filtre linéaire historique contre SearchIndex (trigrammes)
+
+Usage: python benchmarks/bench_search.py [--sizes 10000,100000,500000] [--rounds N]
+
+Catalogue synthétique de films (nom, genre, année: les trois champs du
+filtre historique, recopié ici), noms tirés d'un vocabulaire avec accents. Pour
+chaque taille: temps de construction puis, sur une seconde construction
+sous tracemalloc (plus lente), pic mémoire de l'index, puis temps
+moyen par requête du filtre linéaire (lower() de chaque champ à chaque frappe) et de l'index,
+en sous-chaîne et en préfixe de mots. Les frappes simulent la saisie
+progressive de chaque requête, comme le champ de recherche de l'interface.
+L'index en sous-chaîne doit trouver au moins les entrées du filtre
+linéaire, plus celles qui ne diffèrent que par les accents ('legende'
+trouve 'Légende').
+
+Pas de mesure d'ajout incrémental: CatalogStore remplace une section
+entière à chaque rafraîchissement et abandonne son index, reconstruit
+à la recherche suivante; SearchIndex n'est jamais complété après coup.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_index import SearchIndex, TEXT, VALUE  # noqa: E402
+
+
+MB = 1024 * 1024
+WORDS = ['star', 'wars', 'police', 'nuit', 'amour', 'dernier', 'retour', 'guerre', 'mission',
+         'ciel', 'ombre', 'soleil', 'secret', 'royaume', 'Énigme', 'château', 'légende', 'océan']
+GENRES = ['Action', 'Comédie', 'Drame', 'Horreur', 'Science-Fiction', 'Documentaire', 'Animation']
+QUERIES = ['star wars', 'mission', 'ombre du', 'ret', 'legende', 'zzz', 'horreur', '2004']
+FIELDS = {'name': TEXT, 'genre': VALUE, 'year': VALUE}
+
+
+def make_movies(count, seed=1):
+    rng = random.Random(seed)
+    return [{
+        'name': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))).capitalize() + f" {i}",
+        'genre': rng.choice(GENRES),
+        'year': str(rng.randint(1960, 2024)),
+    } for i in range(count)]
+
+
+def filter_movies(movies, search_term):
+    """Filtre linéaire que l'index remplace: lower() de chaque champ à chaque frappe"""
+    term = search_term.lower()
+    return [mv for mv in movies
+            if term in mv['name'].lower() or term in mv['genre'].lower()
+            or term in str(mv['year']).lower()]
+
+
+def keystrokes(query):
+    """'star' -> ['s', 'st', 'sta', 'star']"""
+    return [query[:length] for length in range(1, len(query) + 1)]
+
+
+def timed(function, queries, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query in queries:
+            function(query)
+    return (time.perf_counter() - start) * 1000 / (rounds * len(queries))
+
+
+def bench(count, rounds):
+    movies = make_movies(count)
+
+    def build_index():
+        index = SearchIndex(FIELDS)
+        for item_id, movie in enumerate(movies):
+            index.add(item_id, movie)
+        return index
+
+    tracemalloc.start()
+    build_index()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    index = build_index()
+    build = time.perf_counter() - start
+
+    for query in QUERIES:
+        expected = len(filter_movies(movies, query))
+        found = len(index.search(query))
+        if found < expected:
+            raise AssertionError(f"{query!r}: index {found}, filtre {expected}")
+
+    typed = [prefix for query in QUERIES for prefix in keystrokes(query)]
+    return {
+        'items': count,
+        'build_s': build,
+        'index_mb': peak / MB,
+        'scan_ms': timed(lambda query: filter_movies(movies, query)[:50], typed, rounds),
+        'substring_ms': timed(lambda query: index.search(query, limit=50), typed, rounds),
+        'prefix_ms': timed(lambda query: index.search(query, prefix=True, limit=50), typed, rounds),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,500000', help='tailles de catalogue, séparées par des virgules')
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'entrees':>9}{'constr. s':>11}{'index MB':>10}"
+          f"{'lineaire ms':>13}{'sous-ch. ms':>13}{'prefixe ms':>12}")
+    for size in args.sizes.split(','):
+        row = bench(int(size), args.rounds)
+        print(f"{row['items']:>9}{row['build_s']:>11.2f}{row['index_mb']:>10.1f}"
+              f"{row['scan_ms']:>13.2f}{row['substring_ms']:>13.2f}{row['prefix_ms']:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
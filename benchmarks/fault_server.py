@@ -0,0 +1,157 @@
+"""Serveur HTTP local avec Range et injection de pannes, pour les benchmarks
+
+Simule un fournisseur IPTV: débit bridé par connexion après une rafale,
+coupures aléatoires, réponses sans Content-Length et 200 au lieu de 206.
+Sert aussi aux tests (tests/), avec des coupures déterministes.
+"""
+
+import http.server
+import os
+import random
+import re
+import socketserver
+import threading
+import time
+
+
+class FaultConfig:
+    """Comportement du serveur pour un scénario"""
+
+    def __init__(self, burst=0, rate=0, disconnect_rate=0.0, no_length=False,
+                 ignore_range=False, chunked=False, cut_first=0, fail_first=0, seed=1):
+        self.burst = burst                      # octets servis à pleine vitesse par connexion
+        self.rate = rate                        # débit par connexion après la rafale (0 = illimité)
+        self.disconnect_rate = disconnect_rate  # probabilité de coupure par bloc de 64 KiB
+        self.no_length = no_length              # ni Content-Length ni Range
+        self.ignore_range = ignore_range        # 200 avec le fichier entier malgré Range
+        self.chunked = chunked                  # sans longueur: corps en chunked (coupure détectable)
+        self.cut_first = cut_first              # nombre de premières réponses coupées à mi-corps
+        self.fail_first = fail_first            # nombre de premières requêtes refusées (503)
+        self.random = random.Random(seed)
+
+
+class FaultServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """Serveur en thread d'arrière-plan; compte les octets envoyés et les connexions"""
+
+    daemon_threads = True
+    block_size = 64 * 1024
+
+    def __init__(self, data, config=None):
+        super().__init__(('127.0.0.1', 0), FaultHandler)
+        self.data = data
+        self.config = config or FaultConfig()
+        self.bytes_sent = 0
+        self.requests = 0
+        self.disconnects = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @classmethod
+    def with_random_data(cls, size, config=None):
+        return cls(os.urandom(size), config)
+
+    def url(self, name='video.mp4'):
+        return f'http://127.0.0.1:{self.server_port}/{name}'
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def reset_counters(self, config=None):
+        with self._lock:
+            self.bytes_sent = self.requests = self.disconnects = 0
+            if config:
+                self.config = config
+
+    def count(self, sent=0, request=0, disconnect=0):
+        with self._lock:
+            self.bytes_sent += sent
+            self.requests += request
+            self.disconnects += disconnect
+            return self.requests
+
+
+class FaultHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def _respond(self, send_body):
+        server = self.server
+        config = server.config
+        data = server.data
+        number = server.count(request=1)
+        if number <= config.fail_first:
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        cut = number - config.fail_first <= config.cut_first
+
+        if config.no_length:
+            self.send_response(200)
+            if config.chunked:
+                self.send_header('Transfer-Encoding', 'chunked')
+            else:
+                self.send_header('Connection', 'close')
+                self.close_connection = True
+            self.end_headers()
+            if send_body:
+                self._send_body(data, cut)
+            return
+
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range') or '')
+        if match and not config.ignore_range:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(data) - 1
+            end = min(end, len(data) - 1)
+            body = data[start:end + 1]
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(data)}')
+        else:
+            body = data
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Accept-Ranges', 'none' if config.ignore_range else 'bytes')
+        self.send_header('ETag', '"bench"')
+        self.end_headers()
+        if send_body:
+            self._send_body(body, cut)
+
+    def _send_body(self, body, cut=False):
+        server = self.server
+        config = server.config
+        block_size = server.block_size
+        view = memoryview(body)
+        position = 0
+        try:
+            while position < len(view):
+                if ((cut and position >= len(view) // 2)
+                        or (config.disconnect_rate and config.random.random() < config.disconnect_rate)):
+                    server.count(disconnect=1)
+                    self.close_connection = True
+                    return
+                block = view[position:position + block_size]
+                if config.no_length and config.chunked:
+                    self.wfile.write(b'%x\r\n' % len(block) + bytes(block) + b'\r\n')
+                else:
+                    self.wfile.write(block)
+                server.count(sent=len(block))
+                position += len(block)
+                if config.rate and position > config.burst:
+                    time.sleep(len(block) / config.rate)
+            if config.no_length and config.chunked:
+                self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
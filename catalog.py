@@ -0,0 +1,350 @@
+"""Chargement du catalogue IPTV: playlist M3U et API Xtream (sans dépendance Kivy)"""
+
+import json
+import os
+import re
+import sys
+import threading
+
+import http_client
+from connection_governor import governor, API
+from json_stream import iter_json_array
+from m3u_parser import ChannelRecord, iter_lines, iter_m3u
+
+
+CONFIG_FILE = "iptv_config.json"
+
+# Dossiers où chercher la configuration quand elle n'est pas dans le dossier de téléchargement
+DEFAULT_CONFIG_DIRS = [
+    "/storage/emulated/0/Download",
+    "/sdcard/Download",
+    os.path.expanduser("~/Downloads"),
+]
+
+
+class XtreamAccount:
+    """Identifiants d'un compte Xtream et construction des URLs player_api.php"""
+
+    def __init__(self, server_url, username, password):
+        self.base_url = server_url.strip().rstrip('/')
+        self.username = username.strip()
+        self.password = password.strip()
+
+    def is_complete(self):
+        return bool(self.base_url and self.username and self.password)
+
+    def api_url(self, action=None, **params):
+        url = f"{self.base_url}/player_api.php?username={self.username}&password={self.password}"
+        if action:
+            url += f"&action={action}"
+        for key, value in params.items():
+            url += f"&{key}={value}"
+        return url
+
+    def stream_url(self, kind, stream_id, extension):
+        return f"{self.base_url}/{kind}/{self.username}/{self.password}/{stream_id}.{extension}"
+
+
+def api_get(url, timeout=30):
+    """Appel player_api.php sous un bail API du budget de connexions"""
+    with governor.lease(API, 'api'):
+        return http_client.get(url, timeout=timeout)
+
+
+def refresh_account_info(account):
+    """Lire max_connections / active_cons du compte Xtream pour le governor"""
+    if not account.is_complete():
+        return
+    try:
+        response = api_get(account.api_url(), timeout=15)
+        user_info = response.json().get('user_info', {})
+        governor.update_account(user_info.get('max_connections'), user_info.get('active_cons'))
+    except Exception as e:
+        print(f"Erreur lecture user_info: {e}")
+
+
+M3U_CHUNK_SIZE = 64 * 1024
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def conditional_get(url, validator, timeout=30):
+    """GET en streaming, conditionnel si `validator` contient ETag / Last-Modified
+
+    `validator` est un dict {'etag', 'last_modified'} mis à jour depuis la
+    réponse. Retourne None sur 304 Not Modified (la connexion est rendue au
+    pool), sinon la réponse, à fermer par l'appelant.
+    """
+    headers = {}
+    if validator:
+        if validator.get('etag'):
+            headers['If-None-Match'] = validator['etag']
+        if validator.get('last_modified'):
+            headers['If-Modified-Since'] = validator['last_modified']
+    response = http_client.get(url, timeout=timeout, stream=True, headers=headers)
+    if response.status_code == 304:
+        response.close()
+        return None
+    response.raise_for_status()
+    if validator is not None:
+        validator.clear()
+        if response.headers.get('ETag'):
+            validator['etag'] = response.headers['ETag']
+        if response.headers.get('Last-Modified'):
+            validator['last_modified'] = response.headers['Last-Modified']
+    return response
+
+
+def load_m3u(playlist_url, on_channels, on_progress=None, first_batch=50, validator=None):
+    """Télécharger et parser une playlist M3U pendant son téléchargement
+
+    Le corps est lu par chunks et parsé ligne à ligne. `on_channels(channels)`
+    reçoit un générateur des chaînes à consommer pendant l'appel (par
+    exemple CatalogStore.replace_section): la mémoire crête est une chaîne
+    plus un chunk. `on_progress(first, count)` reçoit les `first_batch`
+    premières chaînes (de quoi remplir un premier écran) et le nombre de
+    chaînes lues, dès `first_batch` chaînes puis à chaque doublement: le
+    nombre de rafraîchissements reste logarithmique. Avec `validator`
+    (voir conditional_get), retourne False sans appeler on_channels si la
+    playlist n'a pas changé; True sinon.
+    """
+    response = conditional_get(playlist_url, validator)
+    if response is None:
+        return False
+    try:
+        chunks = response.iter_content(chunk_size=M3U_CHUNK_SIZE)
+        on_channels(_reporting(iter_m3u(iter_lines(chunks)), on_progress, first_batch))
+    finally:
+        response.close()
+    return True
+
+
+def _reporting(channels, on_progress, first_batch):
+    """Chaînes de `channels`, en appelant on_progress(premières, nombre lu) au fil de la lecture"""
+    if on_progress is None:
+        yield from channels
+        return
+    first = []
+    next_report = first_batch
+    for count, channel in enumerate(channels, 1):
+        if count <= first_batch:
+            first.append(channel)
+        if count >= next_report:
+            on_progress(first, count)
+            next_report *= 2
+        yield channel
+
+
+def live_channel(account, channel, categories):
+    """Entrée de get_live_streams -> ChannelRecord"""
+    return ChannelRecord(
+        channel.get('name', 'Inconnu'), categories.get(str(channel.get('category_id'))) or 'IPTV',
+        url=account.stream_url('live', channel['stream_id'], 'm3u8'),
+        stream_id=channel.get('stream_id'),
+        tvg_id=channel.get('epg_channel_id') or None,
+        tvg_logo=channel.get('stream_icon') or None,
+        tvg_chno=channel.get('num')
+    )
+
+
+def vod_movie(account, movie, categories):
+    """Entrée de get_vod_streams -> film"""
+    return {
+        'name': movie.get('name', 'Inconnu'),
+        'year': str(movie.get('year', '')),
+        'genre': movie.get('genre', 'Inconnu'),
+        'category': categories.get(str(movie.get('category_id')), ''),
+        'url': account.stream_url('movie', movie['stream_id'], movie.get('container_extension', 'mp4')),
+        'stream_id': movie.get('stream_id')
+    }
+
+
+def vod_series(account, series, categories):
+    """Entrée de get_series -> série (épisodes chargés à la sélection)"""
+    return {
+        'name': series.get('name', 'Inconnu'),
+        'category': categories.get(str(series.get('category_id')), ''),
+        'series_id': series.get('series_id'),
+        'episodes': []
+    }
+
+
+# Section du catalogue -> (action des flux, action des catégories, conversion d'une entrée)
+XTREAM_SECTIONS = (
+    ('channels', 'get_live_streams', 'get_live_categories', live_channel),
+    ('movies', 'get_vod_streams', 'get_vod_categories', vod_movie),
+    ('series', 'get_series', 'get_series_categories', vod_series),
+)
+
+
+def load_categories(account, action):
+    """{category_id: category_name} d'une section; vide si l'endpoint échoue"""
+    try:
+        response = api_get(account.api_url(action), timeout=30)
+        response.raise_for_status()
+        return {str(category.get('category_id')): sys.intern(category.get('category_name') or '')
+                for category in response.json() or []}
+    except Exception as e:
+        print(f"Erreur categories {action}: {e}")
+        return {}
+
+
+def load_section(account, streams_action, categories_action, convert, on_items, validator=None):
+    """Charger une section en convertissant les entrées au fil de la réception
+
+    Les catégories (petites) d'abord, pour nommer les groupes pendant la
+    conversion; puis le tableau des flux est décodé élément par élément
+    depuis la socket. `on_items(items)` reçoit un générateur des entrées
+    converties, à consommer pendant l'appel (CatalogStore.replace_section):
+    chaque entrée brute est convertie, écrite puis libérée, la mémoire
+    crête est un élément plus un chunk. Le bail API couvre toute la
+    lecture du corps, la connexion restant occupée jusque-là.
+    Avec `validator`, retourne False sans appeler on_items si le serveur
+    répond 304; True sinon.
+    """
+    categories = load_categories(account, categories_action)
+    with governor.lease(API, 'api'):
+        response = conditional_get(account.api_url(streams_action), validator)
+        if response is None:
+            return False
+        try:
+            chunks = response.iter_content(chunk_size=JSON_CHUNK_SIZE)
+            on_items(convert(account, entry, categories) for entry in iter_json_array(chunks))
+        finally:
+            response.close()
+    return True
+
+
+def load_xtream(account, on_section, validators=None):
+    """Charger chaînes, films et séries depuis l'API Xtream
+
+    Les trois sections sont demandées en même temps sur les connexions
+    keep-alive du client partagé, dans la limite du budget du compte: le
+    chargement dure le temps de la plus lente au lieu de la somme.
+    `on_section(name, items)` est appelé depuis le thread de la section
+    ('channels', 'movies' ou 'series') avec un générateur de ses entrées,
+    à consommer pendant l'appel (voir load_section), pour remplir son
+    onglet sans attendre les autres. Une section en échec
+    n'empêche pas les autres d'arriver; la première erreur est relevée à
+    la fin. `validators` ({section: validator}) rend les requêtes
+    conditionnelles: on_section n'est pas appelé pour une section
+    inchangée (304).
+
+    Retourne les noms des sections rechargées.
+    """
+    # Budget de connexions du compte (user_info.max_connections / active_cons)
+    refresh_account_info(account)
+
+    loaded = []
+    errors = []
+
+    def load(name, streams_action, categories_action, convert):
+        validator = validators.setdefault(name, {}) if validators is not None else None
+        try:
+            if load_section(account, streams_action, categories_action,
+                            lambda items: on_section(name, items), validator):
+                loaded.append(name)
+        except Exception as e:
+            print(f"Erreur chargement {name}: {e}")
+            errors.append(e)
+
+    threads = [threading.Thread(target=load, args=section, daemon=True) for section in XTREAM_SECTIONS]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return loaded
+
+
+def fetch_series_info(account, series_id):
+    """Réponse brute de get_series_info (info de la série et épisodes par saison)"""
+    response = api_get(account.api_url('get_series_info', series_id=series_id), timeout=20)
+    response.raise_for_status()
+    return response.json()
+
+
+def series_episodes(account, series_info):
+    """Organiser les épisodes de get_series_info par saisons ({'Saison N': [...]})"""
+    episodes_by_season = {}
+    for season_num, season_episodes in (series_info.get('episodes') or {}).items():
+        season_key = f"Saison {season_num}"
+        episodes_by_season[season_key] = []
+
+        for episode in season_episodes:
+            episodes_by_season[season_key].append({
+                'title': episode.get('title', f"Episode {episode.get('episode_num', '')}"),
+                'episode_num': f"S{season_num}E{episode.get('episode_num', '')}",
+                'season': season_num,
+                'url': account.stream_url('series', episode['id'], episode.get('container_extension', 'mp4')),
+                'id': episode.get('id')
+            })
+    return episodes_by_season
+
+
+def load_series_episodes(account, series_id):
+    """Charger les épisodes d'une série, organisés par saisons"""
+    return series_episodes(account, fetch_series_info(account, series_id))
+
+
+def filter_channels(channels, search_term):
+    if not search_term:
+        return channels
+    term = search_term.lower()
+    return [ch for ch in channels
+            if term in ch['name'].lower() or term in ch['group'].lower()]
+
+
+def clean_filename(filename):
+    """Nettoyer un nom de fichier pour le système de fichiers"""
+    if not filename:
+        return "fichier"
+
+    # Remplacer les caractères interdits et problématiques
+    clean = re.sub(r'[<>:"/\\|?*\x00-\x1f]', '_', str(filename))
+    # Enlever les espaces en début/fin
+    clean = clean.strip()
+    # Remplacer les espaces multiples par un seul
+    clean = re.sub(r'\s+', ' ', clean)
+    # Limiter la longueur
+    if len(clean) > 100:
+        clean = clean[:100]
+
+    return clean if clean else "fichier"
+
+
+def episode_path(downloads_path, series_name, episode, index):
+    """Chemin d'un épisode: <dossier>/<Serie>/Saison N/<Serie> - SxEy - <titre>.mp4"""
+    episode_num = episode.get('episode_num', f'Episode_{index+1}')
+    episode_title = episode.get('title', 'Sans_titre')
+    season = episode.get('season', '1')
+    filename = f"{series_name} - {episode_num} - {episode_title}"
+
+    season_folder = os.path.join(downloads_path, series_name, f"Saison {season}")
+    return os.path.join(season_folder, f"{clean_filename(filename)}.mp4")
+
+
+def default_download_path():
+    """Dossier Download d'Android, sinon ~/Downloads"""
+    for path in ("/storage/emulated/0/Download", "/sdcard/Download"):
+        if os.path.exists(path):
+            return path
+    return os.path.expanduser("~/Downloads")
+
+
+def find_config(download_path):
+    """Chemin de iptv_config.json: dossier de téléchargement puis dossiers par défaut"""
+    config_path = os.path.join(download_path, CONFIG_FILE)
+    if os.path.exists(config_path):
+        return config_path
+    for path in DEFAULT_CONFIG_DIRS:
+        test_path = os.path.join(path, CONFIG_FILE)
+        if os.path.exists(test_path):
+            return test_path
+    return config_path
+
+
+def read_config(config_path):
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
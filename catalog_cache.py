@@ -0,0 +1,137 @@
+"""Cache disque du dernier catalogue par fournisseur et compte (sans dépendance Kivy)"""
+
+import hashlib
+import os
+import threading
+import time
+
+import catalog
+from catalog_store import CatalogStore, SECTIONS
+
+
+class CatalogEntry:
+    """État d'un catalogue en cache: taille des sections et de quoi le revalider
+
+    Les chaînes, films et séries eux-mêmes restent dans `store` (SQLite) et
+    sont lus page par page.
+    """
+
+    def __init__(self, store, counts=None, saved_at=0.0, validators=None):
+        self.store = store
+        self.counts = counts or dict.fromkeys(SECTIONS, 0)
+        self.saved_at = saved_at
+        # {'playlist' | 'channels' | 'movies' | 'series': {'etag', 'last_modified'}}
+        self.validators = validators or {}
+
+    def age(self):
+        return time.time() - self.saved_at
+
+
+class CatalogCache:
+    """Dernier catalogue chargé, une base SQLite par fournisseur et compte
+
+    La clé est un hash de l'URL de la playlist, ou du serveur et de
+    l'utilisateur Xtream: ni URL ni identifiant en clair dans les noms de
+    fichiers. Une base d'un autre format est vidée, comme un cache vide.
+    `indexed` donne aux bases un index de recherche en mémoire (voir
+    CatalogStore), utile pour une interface qui cherche à chaque frappe.
+    """
+
+    ttl = 6 * 3600
+
+    def __init__(self, root, indexed=False):
+        self.root = os.path.abspath(root)
+        self.indexed = indexed
+        self._stores = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(playlist_url=None, account=None):
+        source = playlist_url or f"{account.base_url}|{account.username}"
+        return hashlib.sha1(source.encode('utf-8')).hexdigest()[:20]
+
+    def path(self, key):
+        return os.path.join(self.root, f"catalog-{key}.sqlite")
+
+    def store(self, key):
+        """CatalogStore de la clé, ouvert une fois et partagé entre threads"""
+        with self._lock:
+            if key not in self._stores:
+                os.makedirs(self.root, exist_ok=True)
+                self._stores[key] = CatalogStore(self.path(key), indexed=self.indexed)
+            return self._stores[key]
+
+    def is_fresh(self, entry):
+        return entry.age() < self.ttl
+
+    def load(self, key):
+        """Entrée en cache, ou None (absente, jamais complétée ou illisible)
+
+        Ne lit que les métadonnées: rien du catalogue n'est chargé en mémoire.
+        """
+        if not os.path.exists(self.path(key)):
+            return None
+        try:
+            store = self.store(key)
+            saved_at = store.get_meta('saved_at')
+            if saved_at is None:
+                return None
+            return CatalogEntry(store, store.counts(), saved_at, store.get_meta('validators', {}))
+        except Exception as e:
+            print(f"Erreur lecture cache catalogue: {e}")
+            return None
+
+    def touch(self, key, entry):
+        """Marquer une entrée revalidée (304) sans réécrire le catalogue"""
+        entry.saved_at = time.time()
+        try:
+            entry.store.set_meta(saved_at=entry.saved_at)
+        except Exception as e:
+            print(f"Erreur cache catalogue: {e}")
+
+    def save(self, key, entry):
+        """Enregistrer validateurs et date une fois toutes les sections écrites"""
+        entry.store.set_meta(validators=entry.validators, saved_at=entry.saved_at)
+
+
+def revalidate(cache, key, entry=None, playlist_url=None, account=None, on_section=None,
+               on_progress=None):
+    """Recharger le catalogue avec des requêtes conditionnelles et mettre le cache à jour
+
+    `entry` est le catalogue affiché (None au premier chargement): ses
+    validateurs ETag / Last-Modified accompagnent les requêtes, et une
+    section inchangée (304) n'est pas réécrite. Chaque section modifiée
+    est écrite dans la base au fil de sa réception, sans passer par une
+    liste en mémoire, puis `on_section(name)` est appelé; `on_progress`
+    est passé à load_m3u (premières chaînes de la playlist affichées
+    pendant le téléchargement, utile seulement quand aucun catalogue
+    n'est encore affiché). Les validateurs ne sont enregistrés qu'à la
+    fin: après une interruption, le chargement suivant redemande tout.
+    Retourne (nouvelle entrée, True si quelque chose a changé).
+    """
+    store = cache.store(key)
+    validators = {name: dict(validator) for name, validator in (entry.validators if entry else {}).items()}
+
+    def section_loaded(name, items):
+        store.replace_section(name, items)
+        if on_section:
+            on_section(name)
+
+    if playlist_url:
+        changed = catalog.load_m3u(playlist_url, lambda channels: section_loaded('channels', channels),
+                                   on_progress=on_progress, validator=validators.setdefault('playlist', {}))
+        if changed:
+            # Une playlist M3U n'a ni films ni séries
+            for name in ('movies', 'series'):
+                store.replace_section(name, [])
+    else:
+        changed = bool(catalog.load_xtream(account, section_loaded, validators=validators))
+
+    changed = changed or entry is None
+    if not changed:
+        # Rien à réécrire: seul l'âge du cache repart de zéro
+        cache.touch(key, entry)
+        return entry, False
+    new_entry = CatalogEntry(store, store.counts(), time.time(), validators)
+    cache.save(key, new_entry)
+    return new_entry, changed
@@ -0,0 +1,324 @@
+"""Catalogue sur disque (SQLite + index FTS5), interrogé page par page (sans dépendance Kivy)"""
+
+import contextlib
+import gc
+import itertools
+import json
+import sqlite3
+import threading
+
+from m3u_parser import ChannelRecord
+from search_index import SearchIndex, TEXT, VALUE, normalize
+
+
+SECTIONS = ('channels', 'movies', 'series')
+PAGE_SIZE = 50
+# Lignes écrites par transaction pendant la lecture d'une section
+WRITE_BATCH = 5000
+# Suffixe de la section en cours d'écriture, invisible des lecteurs
+STAGING = '~'
+
+# Colonnes interrogées par la recherche de chaque section (mêmes champs que le filtre historique)
+# et leur type dans l'index en mémoire
+SEARCH_COLUMNS = {
+    'channels': {'name': TEXT, 'grp': VALUE},
+    'movies': {'name': TEXT, 'genre': VALUE, 'year': VALUE},
+    'series': {'name': TEXT},
+}
+
+SCHEMA_VERSION = 2
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    section TEXT NOT NULL,
+    name TEXT NOT NULL,
+    grp TEXT,
+    genre TEXT,
+    year TEXT,
+    keywords TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS items_section ON items (section);
+"""
+# Trigrammes des mots-clés normalisés: une requête MATCH y cherche une sous-chaîne
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+    keywords, content='items', content_rowid='id', tokenize='trigram'
+)
+"""
+
+
+def _row(section, item):
+    """Item du catalogue -> ligne de la table items"""
+    if section == 'channels':
+        name, group = item.name, item.group
+        genre = year = None
+        data = item.to_row()
+    else:
+        name, group = item.get('name', ''), item.get('category')
+        genre, year = item.get('genre'), item.get('year')
+        data = item
+    # Champs cherchés normalisés comme dans SearchIndex: mêmes résultats par les deux chemins
+    keywords = '\n'.join(normalize(item.get(column if column != 'grp' else 'group'))
+                         for column in SEARCH_COLUMNS[section])
+    return (section, name, group, genre, year, keywords,
+            json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+
+
+@contextlib.contextmanager
+def _gc_paused():
+    """Suspendre le ramasse-miettes pendant une construction en masse
+
+    Des centaines de milliers d'objets créés d'affilée déclenchent sinon
+    des collectes répétées qui ne libèrent rien.
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+class CatalogStore:
+    """Chaînes, films et séries d'un catalogue dans une base SQLite
+
+    Rien n'est gardé en mémoire: les listes de l'interface lisent une page
+    (LIMIT/OFFSET) à chaque affichage. La recherche trouve les entrées dont
+    le nom, le groupe, le genre ou l'année contient la requête (minuscules
+    et accents ignorés), comme le filtre historique: une colonne de
+    mots-clés normalisés est indexée par un FTS5 à trigrammes, au lieu
+    d'un parcours de toutes les entrées. Sans tokenizer trigram dans le
+    sqlite3 de la plateforme (avant 3.34), ou pour une requête de moins de
+    trois caractères, la même sous-chaîne est cherchée par instr().
+
+    Une connexion par thread, en mode WAL: l'interface lit l'ancienne
+    version d'une section pendant qu'un thread de chargement écrit la
+    nouvelle, et voit la nouvelle d'un bloc à la fin de la transaction.
+    Les écritures sont sérialisées par un verrou, jamais gardé pendant la
+    lecture réseau d'une section.
+
+    Avec `indexed`, une section peut aussi avoir un SearchIndex en mémoire
+    (trigrammes des noms, postings par groupe / genre / année). Il coûte
+    quelques centaines d'octets par entrée: il n'est construit, en
+    arrière-plan, qu'à la première recherche dans la section, qui passe
+    par FTS en attendant, et il est abandonné quand la section est
+    réécrite. Une recherche dans une section indexée cherche la
+    sous-chaîne exacte, comme le filtre historique, sans requête FTS; les
+    lignes de la page sont ensuite lues par id.
+    """
+
+    def __init__(self, path, indexed=False):
+        self.path = path
+        self.indexed = indexed
+        self.indexes = {}
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        # Numéro d'écriture par section: un index construit entre-temps est périmé
+        self._generations = dict.fromkeys(SECTIONS, 0)
+        self._building = set()
+        self.has_fts = False
+        self._open_schema()
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _open_schema(self):
+        connection = self._connect()
+        with self._write_lock:
+            if (connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION
+                    or self._stored_fields(connection) != list(ChannelRecord.__slots__)):
+                # Autre format (ou base neuve): repartir de zéro, c'est un cache
+                connection.executescript("DROP TABLE IF EXISTS items_fts; DROP TABLE IF EXISTS items;"
+                                         "DROP TABLE IF EXISTS meta;")
+            connection.executescript(SCHEMA)
+            try:
+                connection.execute(FTS_SCHEMA)
+                self.has_fts = True
+            except sqlite3.OperationalError as e:
+                print(f"FTS5 trigram indisponible, recherche par instr: {e}")
+            connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('channel_fields', ?)",
+                               (json.dumps(ChannelRecord.__slots__),))
+            connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            connection.commit()
+
+    @staticmethod
+    def _stored_fields(connection):
+        """Slots de ChannelRecord avec lesquels les lignes de chaînes ont été écrites"""
+        try:
+            row = connection.execute("SELECT value FROM meta WHERE key = 'channel_fields'").fetchone()
+        except sqlite3.OperationalError:
+            return None
+        return json.loads(row[0]) if row else None
+
+    def close(self):
+        """Fermer la connexion du thread appelant"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def replace_section(self, section, items):
+        """Remplacer une section entière (insertion en masse)
+
+        `items` peut être un générateur alimenté par le réseau: il est lu par
+        lots de WRITE_BATCH, chacun écrit dans une section de préparation
+        sans garder le verrou entre deux lots (les sections Xtream arrivent
+        en parallèle), et seul un lot est en mémoire. La section est ensuite
+        remplacée en une transaction courte: les lecteurs voient l'ancienne
+        ou la nouvelle, jamais un mélange. Si `items` lève une exception,
+        l'ancienne section reste en place.
+
+        L'index en mémoire de la section, périmé, est abandonné; il sera
+        reconstruit à la prochaine recherche. Les autres sections gardent le leur.
+        """
+        connection = self._connect()
+        staging = section + STAGING
+        rows = ((staging,) + _row(section, item)[1:] for item in items)
+        with self._write_lock, connection:
+            # Reste d'une écriture interrompue
+            connection.execute("DELETE FROM items WHERE section = ?", (staging,))
+        try:
+            with _gc_paused():
+                for batch in iter(lambda: list(itertools.islice(rows, WRITE_BATCH)), []):
+                    with self._write_lock, connection:
+                        connection.executemany(
+                            "INSERT INTO items (section, name, grp, genre, year, keywords, data) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+        except BaseException:
+            with self._write_lock, connection:
+                connection.execute("DELETE FROM items WHERE section = ?", (staging,))
+            raise
+        with self._write_lock, connection:
+            if self.has_fts:
+                connection.execute(
+                    "INSERT INTO items_fts (items_fts, rowid, keywords) "
+                    "SELECT 'delete', id, keywords FROM items WHERE section = ?", (section,))
+            connection.execute("DELETE FROM items WHERE section = ?", (section,))
+            if self.has_fts:
+                connection.execute(
+                    "INSERT INTO items_fts (rowid, keywords) "
+                    "SELECT id, keywords FROM items WHERE section = ?", (staging,))
+            connection.execute("UPDATE items SET section = ? WHERE section = ?", (section, staging))
+        with self._index_lock:
+            self._generations[section] += 1
+            self.indexes.pop(section, None)
+
+    def build_index(self, section):
+        """Construire l'index d'une section; False s'il a été périmé entre-temps"""
+        with self._index_lock:
+            generation = self._generations[section]
+        index = SearchIndex(SEARCH_COLUMNS[section])
+        rows = self._connect().execute(
+            "SELECT id, name, grp, genre, year FROM items WHERE section = ? ORDER BY id", (section,))
+        with _gc_paused():
+            for item_id, name, group, genre, year in rows:
+                index.add(item_id, {'name': name, 'grp': group, 'genre': genre, 'year': year})
+        with self._index_lock:
+            if self._generations[section] != generation:
+                return False
+            self.indexes[section] = index
+        return True
+
+    def _index_later(self, section):
+        """Lancer la construction de l'index de la section en arrière-plan, une seule à la fois"""
+        with self._index_lock:
+            if section in self.indexes or section in self._building:
+                return
+            self._building.add(section)
+        threading.Thread(target=self._build_in_background, args=(section,),
+                         name=f"index-{section}", daemon=True).start()
+
+    def _build_in_background(self, section):
+        try:
+            self.build_index(section)
+        except Exception as e:
+            print(f"Erreur index de recherche {section}: {e}")
+        finally:
+            with self._index_lock:
+                self._building.discard(section)
+            self.close()
+
+    def _index_for(self, section, search_term):
+        """Index en mémoire à utiliser pour cette recherche (None: passer par SQLite)"""
+        if not self.indexed or not search_term:
+            return None
+        index = self.indexes.get(section)
+        if index is None:
+            self._index_later(section)
+        return index
+
+    def _where(self, section, search_term):
+        """Clause WHERE et paramètres d'une recherche dans une section"""
+        term = normalize(search_term).strip()
+        if not term:
+            return "section = ?", (section,)
+        if self.has_fts and len(term) >= 3:
+            # Phrase entre guillemets: le tokenizer trigram y cherche la sous-chaîne exacte
+            phrase = '"%s"' % term.replace('"', '""')
+            return ("section = ? AND id IN (SELECT rowid FROM items_fts WHERE items_fts MATCH ?)",
+                    (section, phrase))
+        return "section = ? AND instr(keywords, ?) > 0", (section, term)
+
+    def search(self, section, search_term='', limit=PAGE_SIZE, offset=0, is_cancelled=None):
+        """Une page de résultats, dans l'ordre du fournisseur
+
+        `is_cancelled()` est consulté pendant la requête SQLite: s'il devient
+        vrai, la requête est interrompue (sqlite3.OperationalError). Une
+        recherche faite seulement d'espaces ne trouve rien.
+        """
+        if search_term and not search_term.strip():
+            return []
+        connection = self._connect()
+        if is_cancelled is not None:
+            connection.set_progress_handler(is_cancelled, 10000)
+        try:
+            index = self._index_for(section, search_term)
+            if index is not None:
+                rows = self._rows_by_id(index.search(search_term, limit=offset + limit)[offset:])
+            else:
+                where, params = self._where(section, search_term)
+                rows = connection.execute(
+                    f"SELECT data FROM items WHERE {where} ORDER BY id LIMIT ? OFFSET ?",
+                    params + (limit, offset)).fetchall()
+        finally:
+            if is_cancelled is not None:
+                connection.set_progress_handler(None, 0)
+        if section == 'channels':
+            return [ChannelRecord.from_row(json.loads(data)) for data, in rows]
+        return [json.loads(data) for data, in rows]
+
+    def _rows_by_id(self, ids):
+        """Colonne data des lignes `ids`, dans l'ordre de `ids`"""
+        if not ids:
+            return []
+        placeholders = ','.join('?' * len(ids))
+        found = dict(self._connect().execute(
+            f"SELECT id, data FROM items WHERE id IN ({placeholders})", ids))
+        return [(found[item_id],) for item_id in ids if item_id in found]
+
+    def counts(self):
+        """{section: nombre d'entrées}"""
+        counts = dict.fromkeys(SECTIONS, 0)
+        counts.update(self._connect().execute(
+            "SELECT section, COUNT(*) FROM items WHERE section IN (?, ?, ?) GROUP BY section", SECTIONS))
+        return counts
+
+    def get_meta(self, key, default=None):
+        row = self._connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, **values):
+        connection = self._connect()
+        with self._write_lock, connection:
+            connection.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                   [(key, json.dumps(value)) for key, value in values.items()])
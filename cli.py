@@ -0,0 +1,304 @@
+"""IPTV Manager en ligne de commande, sans interface (sans dépendance Kivy)
+
+Usage:
+    python cli.py sync
+    python cli.py search "star" --type series
+    python cli.py download --series 1234 --parallel 4 --json
+
+Les identifiants viennent de iptv_config.json (le même fichier que
+l'application, cherché dans le dossier de téléchargement puis dans les
+dossiers par défaut) et peuvent être remplacés par --server/--username/
+--password ou --playlist. `sync` met à jour le cache du catalogue
+(<dossier>/.iptv_cache, base SQLite, requêtes conditionnelles), que
+`search` interroge sans réseau.
+
+Avec --json, chaque événement est une ligne JSON sur stdout
+({"event": ..., ...}) et les messages du moteur passent sur stderr.
+Pendant `download`, un événement "progress" par épisode en cours donne
+les octets reçus au plus une fois par PROGRESS_INTERVAL secondes.
+Code de sortie: 0 si tout a réussi, 1 en cas d'échec, 2 sur erreur d'usage.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+import catalog
+from catalog import XtreamAccount
+from catalog_cache import CatalogCache, revalidate
+from catalog_store import SECTIONS, PAGE_SIZE
+
+
+CACHE_DIR = '.iptv_cache'
+
+# Secondes entre deux événements "progress" d'un même téléchargement (--json)
+PROGRESS_INTERVAL = 1.0
+
+
+class Reporter:
+    """Sortie des événements: lignes JSON ou texte lisible"""
+
+    def __init__(self, as_json, stream):
+        self.as_json = as_json
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def emit(self, event, text=None, **fields):
+        if self.as_json:
+            line = json.dumps({'event': event, 'time': round(time.time(), 3), **fields},
+                              ensure_ascii=False)
+        else:
+            line = text if text is not None else f"{event}: " + ", ".join(f"{k}={v}" for k, v in fields.items())
+        with self._lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+
+class Settings:
+    """Configuration effective: iptv_config.json puis options de la ligne de commande"""
+
+    def __init__(self, args):
+        download_path = args.output or catalog.default_download_path()
+        config = {}
+        config_path = args.config or catalog.find_config(download_path)
+        if os.path.exists(config_path):
+            config = catalog.read_config(config_path)
+        if not args.output and config.get('download_path'):
+            download_path = config['download_path']
+
+        self.download_path = download_path
+        self.playlist_url = args.playlist if args.playlist is not None else config.get('playlist_url', '')
+        self.account = XtreamAccount(
+            args.server if args.server is not None else config.get('server_url', ''),
+            args.username if args.username is not None else config.get('username', ''),
+            args.password if args.password is not None else config.get('password', '')
+        )
+        self.parallel_downloads = config.get('parallel_downloads', 3)
+        self.rate_limit_mbps = config.get('rate_limit_mbps', 0)
+        self.cache = CatalogCache(args.cache_dir or os.path.join(download_path, CACHE_DIR))
+
+    def cache_key(self):
+        if self.playlist_url:
+            return self.cache.key(playlist_url=self.playlist_url)
+        if self.account.is_complete():
+            return self.cache.key(account=self.account)
+        raise ValueError("aucune source: renseigner --playlist ou --server/--username/--password")
+
+    def sync(self, entry=None):
+        """Revalider le catalogue (requêtes conditionnelles) et mettre le cache à jour"""
+        return revalidate(self.cache, self.cache_key(), entry,
+                          playlist_url=self.playlist_url or None, account=self.account)
+
+
+def cmd_sync(args, settings, reporter):
+    start = time.time()
+    entry = settings.cache.load(settings.cache_key())
+    entry, changed = settings.sync(entry)
+    elapsed = time.time() - start
+    path = settings.cache.path(settings.cache_key())
+    counts = entry.counts
+    reporter.emit('sync', f"Catalogue{'' if changed else ' inchange'}: {counts['channels']} chaines, "
+                          f"{counts['movies']} films, {counts['series']} series ({elapsed:.1f} s) -> {path}",
+                  **counts, changed=changed, seconds=round(elapsed, 3), path=path)
+    return 0
+
+
+def cmd_search(args, settings, reporter):
+    entry = settings.cache.load(settings.cache_key())
+    if entry is None:
+        entry, _ = settings.sync()
+
+    found = 0
+    for kind in (SECTIONS if args.type == 'all' else [args.type]):
+        for item in entry.store.search(kind, args.term, limit=args.limit, offset=args.offset):
+            found += 1
+            ident = item.get('series_id') if kind == 'series' else item.get('stream_id')
+            reporter.emit('result', f"[{kind}] {ident}\t{item['name']}",
+                          type=kind, id=ident, name=item['name'],
+                          group=item.get('group'), url=item.get('url'))
+    reporter.emit('done', f"{found} resultat(s)", results=found)
+    return 0
+
+
+def cmd_download(args, settings, reporter):
+    # Imports du moteur à la demande: sync et search n'en ont pas besoin
+    from bandwidth import shaper
+    from connection_governor import governor
+    from download_queue import DownloadQueue, DownloadItem, DONE, FAILED, RUNNING
+    from library_index import LibraryIndex
+    from progress_bus import progress_bus
+
+    account = settings.account
+    if not account.is_complete():
+        raise ValueError("--series demande un compte Xtream (--server/--username/--password)")
+
+    rate_limit = args.rate if args.rate is not None else settings.rate_limit_mbps
+    shaper.set_rate((rate_limit or 0) * 1024 * 1024)
+    catalog.refresh_account_info(account)
+    # Connexions prises par d'autres appareils relues pendant les téléchargements
+    governor.watch_account(lambda: catalog.refresh_account_info(account))
+
+    series_info = catalog.fetch_series_info(account, args.series)
+    series_name = catalog.clean_filename((series_info.get('info') or {}).get('name') or f"Serie {args.series}")
+    episodes_by_season = catalog.series_episodes(account, series_info)
+    if args.season is not None:
+        season_key = f"Saison {args.season}"
+        episodes_by_season = {season_key: episodes_by_season.get(season_key, [])}
+
+    items = []
+    for episodes in episodes_by_season.values():
+        for episode in episodes:
+            file_path = catalog.episode_path(settings.download_path, series_name, episode, len(items))
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            items.append(DownloadItem(episode['url'], file_path,
+                                      label=episode.get('episode_num', f'Episode_{len(items)+1}')))
+    total = len(items)
+    reporter.emit('start', f"{series_name}: {total} episode(s) -> {settings.download_path}",
+                  series=series_name, episodes=total, path=settings.download_path)
+    if not items:
+        return 1
+
+    library = LibraryIndex(settings.download_path)
+    for folder in sorted({os.path.dirname(item.save_path) for item in items}):
+        library.refresh(folder)
+
+    def on_update(item, counts):
+        fields = {'label': item.label, 'state': item.state, 'path': item.save_path,
+                  'done': counts[DONE], 'failed': counts[FAILED], 'total': total}
+        if item.state == DONE and item.result:
+            fields.update(bytes=item.result.get('downloaded'), sha256=item.result.get('sha256'),
+                          reconnections=item.result.get('reconnections'))
+        if item.skipped:
+            fields['skipped'] = True
+        if item.error:
+            fields['error'] = item.error
+        finished = counts[DONE] + counts[FAILED]
+        note = " (deja present)" if item.skipped else (f" ({item.error})" if item.error else "")
+        reporter.emit('item', f"[{finished}/{total}] {item.label} {item.state}{note}", **fields)
+        update_channel(item)
+
+    # Progression octet par octet: un canal du bus par épisode en cours, échantillonné
+    # toutes les PROGRESS_INTERVAL secondes (en JSON seulement, le texte resterait lisible)
+    channels = {}
+    channels_lock = threading.Lock()
+
+    def render_progress(item, channel):
+        reporter.emit('progress', label=item.label, path=item.save_path, bytes=channel.downloaded,
+                      total=channel.total or None, percent=round(channel.percent, 1),
+                      speed=round(channel.speed, 3), connections=channel.connections,
+                      reconnections=channel.reconnections)
+
+    def update_channel(item):
+        if not reporter.as_json:
+            return
+        with channels_lock:
+            if item.state == RUNNING and item.save_path not in channels:
+                channels[item.save_path] = progress_bus.channel(
+                    item.save_path, lambda channel: render_progress(item, channel))
+            elif item.state in (DONE, FAILED):
+                channel = channels.pop(item.save_path, None)
+                if channel is not None:
+                    channel.close()
+
+    def on_progress(item, *progress):
+        with channels_lock:
+            channel = channels.get(item.save_path)
+        if channel is not None:
+            channel.update(*progress)
+
+    sampling = threading.Event()
+
+    def sample_progress():
+        while not sampling.wait(PROGRESS_INTERVAL):
+            progress_bus.sample()
+        progress_bus.sample()
+
+    cancelled = threading.Event()
+    parallel = args.parallel if args.parallel is not None else settings.parallel_downloads
+    queue = DownloadQueue(max_workers=max(1, min(8, parallel)), on_update=on_update,
+                          is_cancelled=cancelled.is_set, library=library,
+                          on_progress=on_progress if reporter.as_json else None)
+    for item in items:
+        queue.add(item)
+
+    start = time.time()
+    sampler = threading.Thread(target=sample_progress, daemon=True)
+    sampler.start()
+    queue.start()
+    try:
+        queue.wait()
+    except KeyboardInterrupt:
+        cancelled.set()
+        reporter.emit('cancel', "Annulation...")
+        queue.wait()
+    finally:
+        sampling.set()
+        sampler.join()
+        library.save()
+
+    counts = queue.counts()
+    elapsed = time.time() - start
+    reporter.emit('done', f"{series_name}: {counts[DONE]} reussi(s), {counts[FAILED]} echec(s), "
+                          f"{queue.skipped_count()} deja present(s) ({elapsed:.1f} s)",
+                  done=counts[DONE], failed=counts[FAILED], skipped=queue.skipped_count(),
+                  total=total, seconds=round(elapsed, 3))
+    return 0 if counts[FAILED] == 0 and not cancelled.is_set() else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description="IPTV Manager sans interface")
+    parser.add_argument('--config', help="fichier iptv_config.json (défaut: recherche comme l'application)")
+    parser.add_argument('--server', help="URL du serveur Xtream")
+    parser.add_argument('--username')
+    parser.add_argument('--password')
+    parser.add_argument('--playlist', help="URL d'une playlist M3U (remplace l'API Xtream)")
+    parser.add_argument('--output', help="dossier de téléchargement")
+    parser.add_argument('--cache-dir', help="dossier du cache catalogue (défaut: <dossier>/.iptv_cache)")
+    parser.add_argument('--json', action='store_true', help="événements en lignes JSON sur stdout")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('sync', help="charger le catalogue et l'enregistrer localement")
+
+    search = commands.add_parser('search', help="chercher dans le catalogue")
+    search.add_argument('term')
+    search.add_argument('--type', choices=['all', *SECTIONS], default='all')
+    search.add_argument('--limit', type=int, default=PAGE_SIZE, help="résultats maximum par type")
+    search.add_argument('--offset', type=int, default=0, help="résultats à sauter (page suivante)")
+
+    download = commands.add_parser('download', help="télécharger une série")
+    download.add_argument('--series', required=True, help="series_id Xtream")
+    download.add_argument('--season', help="seulement cette saison")
+    download.add_argument('--parallel', type=int, help="téléchargements simultanés (1 à 8)")
+    download.add_argument('--rate', type=float, help="limite de débit totale en MB/s (0 = illimité)")
+    return parser
+
+
+COMMANDS = {
+    'sync': cmd_sync,
+    'search': cmd_search,
+    'download': cmd_download,
+}
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    reporter = Reporter(args.json, sys.stdout)
+    # En JSON, stdout ne porte que les événements: les print du moteur vont sur stderr
+    redirect = contextlib.redirect_stdout(sys.stderr) if args.json else contextlib.nullcontext()
+    with redirect:
+        try:
+            settings = Settings(args)
+            return COMMANDS[args.command](args, settings, reporter)
+        except KeyboardInterrupt:
+            return 1
+        except Exception as e:
+            reporter.emit('error', f"Erreur: {e}", message=str(e))
+            return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
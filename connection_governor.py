@@ -0,0 +1,224 @@
+"""Budget de connexions simultanées du compte Xtream (sans dépendance Kivy)"""
+
+import itertools
+import threading
+import time
+
+
+# Priorités des baux, de la plus urgente à la moins urgente
+PLAYBACK = 0
+RECORDING = 1
+API = 2
+DOWNLOAD = 3
+
+PRIORITY_NAMES = {PLAYBACK: 'lecture', RECORDING: 'enregistrement', API: 'api', DOWNLOAD: 'telechargement'}
+
+# Relecture de user_info tant que des téléchargements tiennent un bail
+ACCOUNT_POLL_SECONDS = 120
+
+
+class Lease:
+    """Une connexion accordée par le ConnectionGovernor
+
+    `preempted` passe à True quand une priorité plus haute attend la place:
+    le détenteur (un téléchargement) doit fermer sa connexion au plus tôt
+    et appeler release().
+    """
+
+    def __init__(self, governor, priority, label=''):
+        self.governor = governor
+        self.priority = priority
+        self.label = label
+        self.granted_at = time.time()
+        self.preempted = False
+        self.released = False
+
+    def release(self):
+        self.governor._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+class ConnectionGovernor:
+    """Répartit les connexions autorisées par le compte entre lecture, API et téléchargements
+
+    `max_connections` et `active_cons` viennent de `user_info` (player_api.php
+    sans action). Les connexions actives qui ne sont pas à nous (autre
+    appareil, lecteur externe) sont déduites du budget. Un bail est accordé
+    par ordre de priorité puis d'arrivée; quand la lecture ou un
+    enregistrement attend, le bail de téléchargement le plus récent est
+    marqué préempté. Avec max_connections à 0 (inconnu), tout est accordé
+    immédiatement.
+
+    active_cons change sans nous (lecteur externe lancé ou arrêté, autre
+    appareil): avec watch_account(), le compte est relu à l'expiration de
+    chaque hold() et périodiquement tant que des téléchargements tournent.
+    """
+
+    def __init__(self, max_connections=0):
+        self.max_connections = max_connections
+        self.external = 0
+        self.leases = []
+        self.refresh_account = None
+        self.poll_interval = ACCOUNT_POLL_SECONDS
+        self._poller = None
+        self._waiting = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+
+    def watch_account(self, refresh, interval=ACCOUNT_POLL_SECONDS):
+        """Relire le compte par `refresh()` (qui appelle update_account) quand il a pu changer"""
+        with self._cond:
+            self.refresh_account = refresh
+            self.poll_interval = interval
+            if any(lease.priority == DOWNLOAD for lease in self.leases):
+                self._start_poller()
+
+    def update_account(self, max_connections, active_connections=0):
+        """Appliquer user_info.max_connections / active_cons"""
+        try:
+            max_connections = max(0, int(max_connections or 0))
+            active_connections = max(0, int(active_connections or 0))
+        except (TypeError, ValueError):
+            return
+        with self._cond:
+            ours = sum(1 for lease in self.leases if lease.priority != API)
+            self.max_connections = max_connections
+            self.external = max(0, active_connections - ours)
+            self._cond.notify_all()
+        print(f"DEBUG: Budget connexions: {max_connections} max, {self.external} externes")
+
+    def capacity(self):
+        """Connexions utilisables par l'application (None = illimité)"""
+        if not self.max_connections:
+            return None
+        # Au moins une: active_cons peut être périmé
+        return max(1, self.max_connections - self.external)
+
+    def free_slots(self):
+        with self._cond:
+            capacity = self.capacity()
+            if capacity is None:
+                return None
+            return max(0, capacity - len(self.leases))
+
+    def acquire(self, priority, label='', timeout=None, cancelled=None):
+        """Attendre un bail; None si `cancelled()` devient vrai ou si le délai expire"""
+        deadline = time.time() + timeout if timeout is not None else None
+        waiter = (priority, next(self._order))
+        with self._cond:
+            self._waiting.append(waiter)
+            try:
+                while True:
+                    if cancelled and cancelled():
+                        return None
+                    if self._can_grant(waiter):
+                        return self._grant(priority, label)
+                    self._preempt_for(priority)
+                    wait = 0.5
+                    if deadline is not None:
+                        wait = min(wait, deadline - time.time())
+                        if wait <= 0:
+                            return None
+                    self._cond.wait(wait)
+            finally:
+                self._waiting.remove(waiter)
+
+    def lease(self, priority, label=''):
+        """Bail bloquant, à utiliser comme context manager"""
+        return self.acquire(priority, label)
+
+    def hold(self, priority, seconds, label=''):
+        """Bail immédiat pendant `seconds`, même au-delà du budget
+
+        Pour la lecture par un lecteur externe, qui démarre sans attendre:
+        les téléchargements sont préemptés pour faire la place, et la
+        connexion du lecteur est ensuite vue dans active_cons.
+        """
+        with self._cond:
+            lease = self._grant(priority, label)
+            self._preempt_for(priority)
+        timer = threading.Timer(seconds, self._expire_hold, (lease,))
+        timer.daemon = True
+        timer.start()
+        return lease
+
+    def _expire_hold(self, lease):
+        """Fin du hold: le lecteur tourne peut-être encore, active_cons le dira"""
+        lease.release()
+        self._refresh()
+
+    def _refresh(self):
+        refresh = self.refresh_account
+        if refresh is None:
+            return
+        try:
+            refresh()
+        except Exception as e:
+            print(f"Erreur relecture compte: {e}")
+
+    def _start_poller(self):
+        """Démarrer la relecture périodique (appelé sous le verrou)"""
+        if self.refresh_account is None or self._poller is not None:
+            return
+        self._poller = threading.Thread(target=self._poll_account, name='account-poll', daemon=True)
+        self._poller.start()
+
+    def _poll_account(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._cond:
+                if not any(lease.priority == DOWNLOAD for lease in self.leases):
+                    # Plus de téléchargement: le prochain bail relancera la relecture
+                    self._poller = None
+                    return
+            self._refresh()
+
+    def _can_grant(self, waiter):
+        capacity = self.capacity()
+        if capacity is None:
+            return True
+        ahead = sum(1 for other in self._waiting if other < waiter)
+        return len(self.leases) + ahead < capacity
+
+    def _grant(self, priority, label):
+        lease = Lease(self, priority, label)
+        self.leases.append(lease)
+        if priority == DOWNLOAD:
+            self._start_poller()
+        return lease
+
+    def _preempt_for(self, priority):
+        """Marquer assez de baux de téléchargement pour libérer la place des priorités hautes"""
+        capacity = self.capacity()
+        if capacity is None or priority >= DOWNLOAD:
+            return
+        urgent = sum(1 for other in self._waiting if other[0] < DOWNLOAD)
+        pending = sum(1 for lease in self.leases if lease.preempted)
+        excess = len(self.leases) + urgent - capacity - pending
+        if excess <= 0:
+            return
+        downloads = sorted((lease for lease in self.leases
+                            if lease.priority == DOWNLOAD and not lease.preempted),
+                           key=lambda lease: lease.granted_at, reverse=True)
+        for lease in downloads[:excess]:
+            lease.preempted = True
+            print(f"DEBUG: Connexion {lease.label} cedee ({PRIORITY_NAMES[priority]} prioritaire)")
+
+    def _release(self, lease):
+        with self._cond:
+            if lease.released:
+                return
+            lease.released = True
+            if lease in self.leases:
+                self.leases.remove(lease)
+            self._cond.notify_all()
+
+
+# Budget unique du processus, initialisé depuis user_info au chargement du compte
+governor = ConnectionGovernor()
@@ -0,0 +1,222 @@
+"""Écriture disque en arrière-plan pour les téléchargements (sans dépendance Kivy)"""
+
+import os
+import queue
+import shutil
+import threading
+
+
+class WriteError(Exception):
+    """Échec d'écriture sur disque (disque plein, carte SD retirée...)"""
+
+
+def free_space(path):
+    """Octets disponibles sur le volume de `path` (statvfs, sinon shutil.disk_usage)"""
+    while path and not os.path.exists(path):
+        path = os.path.dirname(path)
+    path = path or '.'
+    if hasattr(os, 'statvfs'):
+        stat = os.statvfs(path)
+        return stat.f_frsize * stat.f_bavail
+    return shutil.disk_usage(path).free
+
+
+def allocated_size(path):
+    """Octets réellement réservés sur disque par un fichier (0 s'il n'existe pas)"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return 0
+    blocks = getattr(stat, 'st_blocks', None)
+    if blocks is None:
+        return stat.st_size
+    return min(stat.st_size, blocks * 512)
+
+
+class PooledBuffer:
+    """Tampon réutilisable d'un BufferPool (bytearray et sa memoryview)"""
+
+    __slots__ = ('pool', 'data', 'view')
+
+    def __init__(self, pool, size):
+        self.pool = pool
+        self.data = bytearray(size)
+        self.view = memoryview(self.data)
+
+    def release(self):
+        self.pool._release(self)
+
+
+class BufferPool:
+    """Tampons de réception alloués une fois et recyclés après écriture
+
+    acquire() bloque quand tous les tampons sont en vol (réception ou file
+    d'écriture): le pool borne la mémoire comme la file du FileWriter.
+    """
+
+    def __init__(self, buffer_size=512 * 1024, count=24):
+        self.buffer_size = buffer_size
+        self.count = count
+        self._free = queue.LifoQueue()
+        for _ in range(count):
+            self._free.put(PooledBuffer(self, buffer_size))
+
+    def acquire(self):
+        return self._free.get()
+
+    def _release(self, buffer):
+        self._free.put(buffer)
+
+
+class FileWriter:
+    """Écrivain dédié alimenté par une file bornée de tampons
+
+    Les threads réseau déposent (offset, données) avec write() et
+    retournent lire le socket; un thread unique regroupe les tampons
+    disponibles, fusionne les plages contiguës et les écrit en positionnel
+    (pwritev/pwrite). La file est bornée: quand le stockage (carte SD) ne
+    suit plus, write() bloque au lieu de faire grossir la mémoire.
+    `on_written(offset, size, buffers)` est appelé une fois les octets sur disque.
+    Un tampon déposé avec `release` (PooledBuffer) est rendu à son pool
+    après écriture, succès ou échec.
+    """
+
+    def __init__(self, path, total_size=None, max_pending=16,
+                 batch_bytes=4 * 1024 * 1024, on_written=None, truncate=False):
+        self.path = path
+        self.batch_bytes = batch_bytes
+        self.on_written = on_written
+        self.error = None
+        self.bytes_written = 0
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+        if truncate:
+            flags |= os.O_TRUNC
+        self._fd = os.open(path, flags, 0o644)
+        if total_size:
+            self.preallocate(total_size)
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def preallocate(self, total_size):
+        """Réserver la taille finale (posix_fallocate, sinon simple extension)"""
+        if os.fstat(self._fd).st_size >= total_size:
+            return
+        try:
+            if hasattr(os, 'posix_fallocate'):
+                os.posix_fallocate(self._fd, 0, total_size)
+                return
+        except OSError as e:
+            # FAT/exFAT sur carte SD: fallocate non supporté
+            print(f"posix_fallocate indisponible ({e}), extension simple")
+        os.ftruncate(self._fd, total_size)
+
+    def write(self, offset, data, release=None):
+        """Déposer un tampon à écrire à `offset` (bloque si la file est pleine)"""
+        if self.error:
+            if release is not None:
+                release.release()
+            raise WriteError(str(self.error))
+        self._queue.put((offset, data, release))
+
+    def flush(self):
+        """Attendre que tous les tampons déposés soient sur disque"""
+        self._queue.join()
+        if self.error:
+            raise WriteError(str(self.error))
+
+    def close(self):
+        """Vider la file, arrêter le thread et fermer le fichier"""
+        self._queue.put(None)
+        self._thread.join()
+        try:
+            os.close(self._fd)
+        except OSError:
+            pass
+        if self.error:
+            raise WriteError(str(self.error))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _collect(self, first):
+        """Regrouper les tampons déjà en file, dans la limite de batch_bytes"""
+        batch = [first]
+        size = len(first[1])
+        stop = False
+        while size < self.batch_bytes:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stop = True
+                break
+            batch.append(item)
+            size += len(item[1])
+        return batch, stop
+
+    def _run(self):
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is None:
+                self._queue.task_done()
+                break
+
+            batch, stop = self._collect(first)
+            try:
+                if not self.error:
+                    self._write_batch(batch)
+            except Exception as e:
+                self.error = e
+            finally:
+                for _, _, release in batch:
+                    if release is not None:
+                        release.release()
+                for _ in range(len(batch) + (1 if stop else 0)):
+                    self._queue.task_done()
+
+    def _write_batch(self, batch):
+        batch.sort(key=lambda item: item[0])
+        run_offset, run = batch[0][0], [batch[0][1]]
+        run_end = run_offset + len(batch[0][1])
+        for offset, data, _ in batch[1:]:
+            if offset == run_end:
+                run.append(data)
+                run_end += len(data)
+            else:
+                self._write_run(run_offset, run)
+                run_offset, run, run_end = offset, [data], offset + len(data)
+        self._write_run(run_offset, run)
+
+    def _write_run(self, offset, buffers):
+        size = sum(len(b) for b in buffers)
+        if hasattr(os, 'pwritev'):
+            written = os.pwritev(self._fd, buffers, offset)
+            if written < size:
+                self._pwrite_all(offset + written, b''.join(buffers)[written:])
+        elif hasattr(os, 'pwrite'):
+            self._pwrite_all(offset, b''.join(buffers))
+        else:
+            os.lseek(self._fd, offset, os.SEEK_SET)
+            data = b''.join(buffers)
+            while data:
+                data = data[os.write(self._fd, data):]
+
+        self.bytes_written += size
+        if self.on_written:
+            self.on_written(offset, size, buffers)
+
+    def _pwrite_all(self, offset, data):
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(self._fd, view, offset)
+            offset += written
+            view = view[written:]
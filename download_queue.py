@@ -0,0 +1,227 @@
+"""File de téléchargements avec pool de workers borné (sans dépendance Kivy)"""
+
+import os
+import threading
+import time
+
+from disk_writer import allocated_size, free_space
+from downloader import Downloader, probe_remote
+from library_index import UNKNOWN
+
+
+QUEUED = 'en attente'
+RUNNING = 'en cours'
+DONE = 'termine'
+FAILED = 'echec'
+
+
+class DownloadItem:
+    """Un fichier à télécharger et son état dans la file"""
+
+    def __init__(self, url, save_path, label='', size=None):
+        self.url = url
+        self.save_path = save_path
+        self.label = label or save_path
+        self.size = size
+        self.state = QUEUED
+        self.attempts = 0
+        self.error = None
+        self.result = None
+        self.skipped = False
+
+
+class DownloadQueue:
+    """Pool de workers qui consomme des DownloadItem avec reprises et backoff
+
+    Chaque item passe par les états QUEUED -> RUNNING -> DONE/FAILED. Un
+    échec est retenté jusqu'à `max_retries` fois avec un délai exponentiel
+    (backoff, 2*backoff, 4*backoff...). Les items réutilisent le Downloader,
+    donc les reconnexions et la reprise sur manifeste. Avec un LibraryIndex,
+    les fichiers que le téléchargeur a enregistrés complets depuis la même
+    URL sont marqués DONE sans requête réseau; un fichier présent sans
+    trace du téléchargeur ne l'est que s'il a la taille attendue (celle de
+    l'item, ou celle annoncée par le serveur).
+
+    Contrôle d'admission: un item de taille connue ne démarre que si le
+    volume cible peut l'accueillir en plus de ce que les items en cours
+    doivent encore écrire, avec une marge `space_margin`. Sinon il attend
+    la fin des items en cours, et il est refusé s'il ne tient toujours pas
+    une fois seul.
+    """
+
+    space_margin = 256 * 1024 * 1024
+    space_poll_interval = 5.0
+
+    def __init__(self, size_func=None, max_workers=3, max_retries=3, backoff=2.0,
+                 segments=1, on_update=None, is_cancelled=None, library=None, on_progress=None):
+        self.size_func = size_func
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.segments = segments
+        self.on_update = on_update
+        self.is_cancelled = is_cancelled or (lambda: False)
+        self.library = library
+        # on_progress(item, octets, taille, MB/s, connexions, reconnexions), au rythme du Downloader
+        self.on_progress = on_progress
+
+        self.items = []
+        self._pending = []
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._admission = threading.Lock()
+        self._threads = []
+
+    def add(self, item):
+        with self._lock:
+            self.items.append(item)
+            self._pending.append(item)
+        return item
+
+    def start(self):
+        """Démarrer les workers (au plus un par item en attente)"""
+        worker_count = min(self.max_workers, len(self._pending)) or 1
+        for _ in range(worker_count):
+            thread = threading.Thread(target=self._worker, daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def wait(self):
+        """Bloquer jusqu'à ce que tous les items soient traités"""
+        for thread in self._threads:
+            thread.join()
+
+    def run(self):
+        self.start()
+        self.wait()
+        return self.counts()
+
+    def counts(self):
+        """Nombre d'items par état"""
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        with self._lock:
+            for item in self.items:
+                counts[item.state] += 1
+        return counts
+
+    def _set_state(self, item, state, error=None):
+        with self._lock:
+            item.state = state
+            item.error = error
+            self._changed.notify_all()
+        if self.on_update:
+            try:
+                self.on_update(item, self.counts())
+            except Exception as e:
+                print(f"Erreur notification file: {e}")
+
+    def _next_item(self):
+        with self._lock:
+            if self._pending and not self.is_cancelled():
+                return self._pending.pop(0)
+        return None
+
+    def _worker(self):
+        while True:
+            item = self._next_item()
+            if item is None:
+                break
+            self._run_item(item)
+
+    def skipped_count(self):
+        with self._lock:
+            return sum(1 for item in self.items if item.skipped)
+
+    def _remaining_bytes(self, item):
+        """Octets que l'item doit encore réserver sur disque (fichier préalloué = 0)"""
+        return max(0, (item.size or 0) - allocated_size(item.save_path))
+
+    def _admit(self, item):
+        """Passer l'item en RUNNING dès que l'espace disque suffit; False s'il ne suffira pas"""
+        folder = os.path.dirname(item.save_path)
+        while not self.is_cancelled():
+            # Vérification et passage en RUNNING atomiques entre workers
+            with self._admission:
+                if not item.size:
+                    self._set_state(item, RUNNING)
+                    return True
+                with self._lock:
+                    running = [other for other in self.items if other.state == RUNNING]
+                reserved = sum(self._remaining_bytes(other) for other in running)
+                available = free_space(folder) - reserved - self.space_margin
+                needed = self._remaining_bytes(item)
+                if needed <= available:
+                    self._set_state(item, RUNNING)
+                    return True
+            if not running:
+                print(f"Espace insuffisant pour {item.label}: {needed} octets, {max(available, 0)} disponibles")
+                return False
+            with self._lock:
+                self._changed.wait(self.space_poll_interval)
+        return False
+
+    def _already_downloaded(self, item):
+        """Vrai si le fichier de l'item est déjà complet sur disque"""
+        if self.library.is_complete(item.save_path, item.url):
+            return True
+        entry = self.library.lookup(item.save_path)
+        if not entry or entry['state'] != UNKNOWN:
+            return False
+        size = item.size
+        if size is None:
+            try:
+                size = self.size_func(item.url) if self.size_func else probe_remote(item.url).size
+            except Exception as e:
+                print(f"Erreur taille {item.label}: {e}")
+                return False
+        if not self.library.matches_size(item.save_path, size):
+            return False
+        # Même taille que le fichier distant: adopté comme téléchargé depuis cette URL
+        self.library.record(item.save_path, item.url, True)
+        return True
+
+    def _run_item(self, item):
+        if self.library and self._already_downloaded(item):
+            item.skipped = True
+            self._set_state(item, DONE)
+            return
+
+        if not self._admit(item):
+            self._set_state(item, FAILED, "annule" if self.is_cancelled() else "espace disque insuffisant")
+            return
+
+        while True:
+            item.attempts += 1
+            try:
+                # Sans size_func, le Downloader découvre la taille sur sa première requête
+                total_size = self.size_func(item.url) if self.size_func else None
+                downloader = Downloader(
+                    item.url, item.save_path, total_size,
+                    segments=self.segments,
+                    is_cancelled=self.is_cancelled,
+                    on_progress=(lambda *progress: self.on_progress(item, *progress)) if self.on_progress else None
+                )
+                item.result = downloader.run()
+                if self.library:
+                    self.library.record(item.save_path, item.url, item.result['complete'],
+                                        item.result.get('sha256'))
+                if item.result['complete']:
+                    self._set_state(item, DONE)
+                    return
+                if item.result['cancelled']:
+                    self._set_state(item, FAILED, "annule")
+                    return
+                raise Exception(f"incomplet ({item.result['downloaded']}/{item.result['total_size']} octets)")
+
+            except Exception as e:
+                print(f"Erreur telechargement {item.label} (essai {item.attempts}): {e}")
+                if item.attempts > self.max_retries or self.is_cancelled():
+                    self._set_state(item, FAILED, str(e))
+                    return
+                self._sleep(self.backoff * (2 ** (item.attempts - 1)))
+
+    def _sleep(self, delay):
+        """Attendre le backoff en restant réactif à l'annulation"""
+        deadline = time.time() + delay
+        while time.time() < deadline and not self.is_cancelled():
+            time.sleep(min(0.2, deadline - time.time()))
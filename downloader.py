@@ -0,0 +1,1070 @@
+"""Moteur de téléchargement HTTP avec reconnexions (sans dépendance Kivy)"""
+
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+
+import requests
+
+import http_client
+from bandwidth import BandwidthEstimator, shaper
+from connection_governor import API, DOWNLOAD, governor
+from disk_writer import BufferPool, FileWriter, WriteError
+
+
+USER_AGENTS = [
+    'VLC/3.0.18 LibVLC/3.0.18',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Mozilla/5.0 (Android 10; Mobile; rv:109.0) Gecko/111.0 Firefox/109.0',
+    'Mozilla/5.0 (Linux; Android 10; SM-G973F) AppleWebKit/537.36'
+]
+
+# En dessous de cette taille, le mode segmenté ne vaut pas le coût des connexions
+MIN_SEGMENT_SIZE = 8 * 1024 * 1024
+# Connexions au plus d'un téléchargement segmenté, places libres du compte comprises
+MAX_SEGMENTS = 8
+
+# Octets déjà écrits redemandés à chaque reconnexion pour vérifier l'alignement
+OVERLAP_CHECK = 64 * 1024
+
+
+class RangeNotSupported(Exception):
+    """Le serveur ne respecte pas les requêtes Range demandées"""
+
+
+class SourceChanged(Exception):
+    """Le fichier distant a changé depuis le début du téléchargement (ETag/Last-Modified)"""
+
+
+def plan_segments(missing, segments):
+    """Redécouper les plages manquantes pour alimenter `segments` connexions"""
+    parts = list(missing)
+    while len(parts) < segments:
+        i = max(range(len(parts)), key=lambda k: parts[k][1] - parts[k][0])
+        start, end = parts[i]
+        size = end - start + 1
+        if size < 2 * MIN_SEGMENT_SIZE:
+            break
+        middle = start + size // 2
+        parts[i:i + 1] = [(start, middle - 1), (middle, end)]
+    return sorted(parts)
+
+
+def parse_content_range(value):
+    """Parser un en-tête Content-Range: 'bytes start-end/total'"""
+    try:
+        unit, _, spec = value.partition(' ')
+        if unit.strip().lower() != 'bytes':
+            return None
+        span, _, total = spec.partition('/')
+        start, _, end = span.partition('-')
+        total = int(total) if total.strip() not in ('', '*') else None
+        return int(start), int(end), total
+    except (AttributeError, ValueError):
+        return None
+
+
+class RemoteInfo:
+    """Ce que le serveur annonce d'un fichier: taille, support des Range, validateurs"""
+
+    def __init__(self, size=None, accepts_ranges=False, etag=None, last_modified=None):
+        self.size = size
+        self.accepts_ranges = accepts_ranges
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = time.time()
+
+    @classmethod
+    def from_response(cls, response):
+        """Déduire les informations d'une réponse à un GET avec Range"""
+        size = None
+        accepts_ranges = False
+        if response.status_code == 206:
+            content_range = parse_content_range(response.headers.get('content-range'))
+            size = content_range[2] if content_range else None
+            accepts_ranges = True
+        else:
+            content_length = response.headers.get('content-length')
+            size = int(content_length) if content_length and content_length.isdigit() else None
+            accepts_ranges = response.headers.get('accept-ranges', '').lower() == 'bytes'
+        return cls(
+            size=size,
+            accepts_ranges=accepts_ranges,
+            etag=response.headers.get('etag'),
+            last_modified=response.headers.get('last-modified')
+        )
+
+
+# Résultats de sondage par URL, réutilisés pendant REMOTE_INFO_TTL secondes;
+# au-delà de REMOTE_INFO_MAX URLs, les entrées expirées puis les plus anciennes sont oubliées
+REMOTE_INFO_TTL = 600
+REMOTE_INFO_MAX = 1000
+_remote_info_cache = {}
+_remote_info_lock = threading.Lock()
+
+
+def cached_remote_info(url):
+    with _remote_info_lock:
+        info = _remote_info_cache.get(url)
+    if info and time.time() - info.fetched_at < REMOTE_INFO_TTL:
+        return info
+    return None
+
+
+def remember_remote_info(url, info):
+    with _remote_info_lock:
+        # Réinsérée en fin: l'ordre du dict est celui des sondages
+        _remote_info_cache.pop(url, None)
+        _remote_info_cache[url] = info
+        if len(_remote_info_cache) <= REMOTE_INFO_MAX:
+            return
+        now = time.time()
+        for key in [key for key, cached in _remote_info_cache.items()
+                    if now - cached.fetched_at >= REMOTE_INFO_TTL]:
+            del _remote_info_cache[key]
+        while len(_remote_info_cache) > REMOTE_INFO_MAX:
+            del _remote_info_cache[next(iter(_remote_info_cache))]
+
+
+def open_ranged(url):
+    """Ouvrir un GET `Range: bytes=0-`: les en-têtes donnent la taille, le corps les données"""
+    response = http_client.client.stream(url, headers={
+        'User-Agent': USER_AGENTS[0],
+        'Accept': '*/*',
+        'Accept-Encoding': 'identity',
+        'Range': 'bytes=0-'
+    })
+    try:
+        response.raise_for_status()
+    except requests.exceptions.HTTPError:
+        response.close()
+        raise
+    info = RemoteInfo.from_response(response)
+    remember_remote_info(url, info)
+    return response, info
+
+
+def probe_remote(url, priority=DOWNLOAD):
+    """Informations d'un fichier distant (cache par URL avec TTL, une seule requête sinon)
+
+    La requête prend une connexion du compte: elle attend un bail de
+    `priority` auprès du governor.
+    """
+    info = cached_remote_info(url)
+    if info:
+        return info
+    with governor.lease(priority, 'sondage'):
+        response, info = open_ranged(url)
+        response.close()
+    return info
+
+
+def probe_sizes(urls, max_workers=6, priority=API):
+    """Tailles de plusieurs fichiers distants, sondés en parallèle par un pool borné
+
+    Retourne {url: taille} (None si inconnue ou en erreur). Les informations
+    restent dans le cache de probe_remote, le téléchargement qui suit ne
+    refait pas la requête.
+    Chaque sondage tient un bail `priority` (API par défaut: l'utilisateur
+    attend la réponse), le pool ne dépasse donc pas le budget du compte.
+    """
+    pending = queue.Queue()
+    for url in dict.fromkeys(urls):
+        pending.put(url)
+    sizes = {}
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            try:
+                url = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                size = probe_remote(url, priority).size
+            except Exception as e:
+                print(f"Erreur taille {url}: {e}")
+                size = None
+            with lock:
+                sizes[url] = size
+
+    threads = [threading.Thread(target=worker, daemon=True)
+               for _ in range(max(1, min(max_workers, pending.qsize())))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sizes
+
+
+class PooledReader:
+    """Corps d'une réponse lu par readinto dans les tampons d'un BufferPool
+
+    Chaque tour donne une memoryview sur un tampon du pool, sans allouer de
+    nouvel objet bytes. take() transfère le tampon courant (au FileWriter,
+    qui le rend après écriture); sinon il est recyclé au tour suivant.
+    Sans accès au flux brut, ou si le contenu est compressé, repli sur
+    iter_content.
+    """
+
+    def __init__(self, response, pool):
+        self.response = response
+        self.pool = pool
+        self.current = None
+        encoding = response.headers.get('content-encoding', 'identity').lower()
+        fp = getattr(response.raw, '_fp', None) if encoding in ('', 'identity') else None
+        self._fp = fp if hasattr(fp, 'readinto') else None
+
+    def __iter__(self):
+        if self._fp is None:
+            yield from self.response.iter_content(chunk_size=self.pool.buffer_size)
+            return
+
+        while True:
+            buffer = self.pool.acquire()
+            try:
+                size = self._fp.readinto(buffer.data)
+            except BaseException:
+                buffer.release()
+                raise
+            if not size:
+                buffer.release()
+                # Corps lu en entier: la connexion retourne au pool keep-alive
+                self.response.raw.release_conn()
+                return
+            self.current = buffer
+            try:
+                yield buffer.view[:size]
+            finally:
+                if self.current is not None:
+                    self.current.release()
+                    self.current = None
+
+    def take(self):
+        """Prendre la propriété du tampon courant (None en repli iter_content)"""
+        buffer, self.current = self.current, None
+        return buffer
+
+
+class DownloadManifest:
+    """Manifeste de reprise stocké à côté du fichier téléchargé
+
+    Les plages terminées sont gardées en intervalles semi-ouverts [début, fin)
+    et fusionnées au fil de l'eau. Le fichier est réécrit de façon atomique
+    (fichier temporaire + os.replace) au plus une fois par `save_interval`.
+    """
+
+    suffix = '.part.json'
+    save_interval = 1.0
+
+    def __init__(self, save_path, url, total_size, etag=None, last_modified=None, ranges=None):
+        self.save_path = save_path
+        self.path = save_path + self.suffix
+        self.url = url
+        self.total_size = total_size
+        self.etag = etag
+        self.last_modified = last_modified
+        self.ranges = [list(r) for r in (ranges or [])]
+        self._lock = threading.Lock()
+        self._last_save = 0.0
+
+    @classmethod
+    def load(cls, save_path):
+        """Charger le manifeste d'un fichier, ou None s'il est absent ou illisible"""
+        try:
+            with open(save_path + cls.suffix, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return cls(
+                save_path,
+                data['url'],
+                data['total_size'],
+                etag=data.get('etag'),
+                last_modified=data.get('last_modified'),
+                ranges=data.get('ranges', [])
+            )
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def matches(self, url, total_size):
+        """Vérifier que le manifeste décrit bien ce téléchargement et le fichier sur disque"""
+        if self.url != url or self.total_size != total_size:
+            return False
+        try:
+            file_size = os.path.getsize(self.save_path)
+        except OSError:
+            return False
+        return all(end <= file_size for _, end in self.ranges)
+
+    def validators(self):
+        """Valeur pour l'en-tête If-Range (ETag de préférence)"""
+        return self.etag or self.last_modified
+
+    def check_response(self, response):
+        """Comparer les validateurs de la réponse à ceux enregistrés"""
+        etag = response.headers.get('etag')
+        last_modified = response.headers.get('last-modified')
+        with self._lock:
+            if self.etag and etag and etag != self.etag:
+                raise SourceChanged(f"ETag {self.etag} -> {etag}")
+            if not self.etag and self.last_modified and last_modified and last_modified != self.last_modified:
+                raise SourceChanged(f"Last-Modified {self.last_modified} -> {last_modified}")
+            self.etag = self.etag or etag
+            self.last_modified = self.last_modified or last_modified
+
+    def add_range(self, start, end):
+        """Marquer [start, end) comme écrit sur disque"""
+        with self._lock:
+            merged = []
+            placed = False
+            for r in self.ranges:
+                if r[1] < start or r[0] > end:
+                    if not placed and r[0] > end:
+                        merged.append([start, end])
+                        placed = True
+                    merged.append(r)
+                else:
+                    start = min(start, r[0])
+                    end = max(end, r[1])
+            if not placed:
+                merged.append([start, end])
+            self.ranges = merged
+        self.save()
+
+    def written_before(self, position, limit):
+        """Longueur (au plus `limit`) écrite d'un seul tenant juste avant `position`"""
+        with self._lock:
+            for start, end in self.ranges:
+                if start < position <= end:
+                    return min(limit, position - start)
+        return 0
+
+    def completed_bytes(self):
+        with self._lock:
+            return sum(end - start for start, end in self.ranges)
+
+    def missing_ranges(self):
+        """Plages restant à télécharger, fin incluse comme pour l'en-tête Range"""
+        missing = []
+        position = 0
+        with self._lock:
+            for start, end in self.ranges:
+                if start > position:
+                    missing.append((position, start - 1))
+                position = max(position, end)
+        if position < self.total_size:
+            missing.append((position, self.total_size - 1))
+        return missing
+
+    def reset(self):
+        with self._lock:
+            self.ranges = []
+        self.save(force=True)
+
+    def save(self, force=False):
+        """Écrire le manifeste sur disque (limité dans le temps sauf si force)"""
+        now = time.time()
+        if not force and now - self._last_save < self.save_interval:
+            return
+        self._last_save = now
+        with self._lock:
+            data = {
+                'url': self.url,
+                'total_size': self.total_size,
+                'etag': self.etag,
+                'last_modified': self.last_modified,
+                'ranges': [list(r) for r in self.ranges]
+            }
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Erreur sauvegarde manifeste {self.path}: {e}")
+
+    def delete(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class StreamDigest:
+    """Empreinte SHA-256 du fichier calculée au fil des écritures
+
+    Les tampons qui prolongent le préfixe déjà haché sont pris directement
+    dans le thread d'écriture; les plages écrites en avance (autres segments,
+    reprise) sont relues depuis le disque par catch_up() une fois le
+    téléchargement terminé.
+    """
+
+    def __init__(self, path, algorithm='sha256'):
+        self.path = path
+        self.algorithm = algorithm
+        self.position = 0
+        self._hash = hashlib.new(algorithm)
+        self._lock = threading.Lock()
+
+    def update_at(self, offset, buffers):
+        with self._lock:
+            if offset != self.position:
+                return
+            for buffer in buffers:
+                self._hash.update(buffer)
+                self.position += len(buffer)
+
+    def catch_up(self, size, block_size=1024 * 1024):
+        """Hacher depuis le disque les octets [position, size) pas encore vus"""
+        with self._lock, open(self.path, 'rb') as f:
+            f.seek(self.position)
+            while self.position < size:
+                block = f.read(min(block_size, size - self.position))
+                if not block:
+                    break
+                self._hash.update(block)
+                self.position += len(block)
+
+    def hexdigest(self):
+        with self._lock:
+            return self._hash.hexdigest()
+
+
+class Downloader:
+    """Téléchargement d'une URL vers un fichier, en série ou par segments parallèles
+
+    La progression est suivie dans un DownloadManifest: un téléchargement
+    interrompu (annulation, crash, arrêt du processus) reprend les plages
+    manquantes au lieu de repartir de zéro.
+    """
+
+    max_reconnections = 1000
+    chunk_size = 524288
+    max_pending = 16
+    progress_interval = 0.5
+    repair_passes = 3
+    repair_reconnections = 20
+
+    def __init__(self, url, save_path, total_size, segments=4,
+                 is_cancelled=None, on_progress=None, weight=1.0):
+        self.url = url
+        self.save_path = save_path
+        self.total_size = total_size
+        self.segments = segments
+        self.is_cancelled = is_cancelled or (lambda: False)
+        self.on_progress = on_progress
+        self.weight = weight
+
+        self.downloaded = 0
+        self.resumed_from = 0
+        self.reconnections = 0
+        self.active_connections = 0
+        self.mode = 'serie'
+        self.manifest = None
+        self.estimator = BandwidthEstimator()
+        self.shaper_job = None
+        self.remote_info = None
+        self.digest = None
+        self.buffer_pool = None
+        self.repaired_ranges = 0
+        self._first_response = None
+        self._lease = None
+        self._lock = threading.Lock()
+        self._start_time = 0.0
+        self._last_progress = 0.0
+
+    def run(self):
+        """Lancer le téléchargement et retourner les statistiques finales"""
+        self._start_time = time.time()
+        if not self._ensure_lease():
+            return self._result(False)
+        try:
+            return self._run()
+        finally:
+            self._yield_lease()
+
+    def _ensure_lease(self):
+        """Obtenir (ou attendre) la connexion principale auprès du governor"""
+        if self._lease is None:
+            self._lease = governor.acquire(DOWNLOAD, os.path.basename(self.save_path),
+                                           cancelled=self.is_cancelled)
+        return self._lease is not None
+
+    def _yield_lease(self):
+        """Rendre la connexion principale (fin, ou préemption par la lecture)"""
+        lease, self._lease = self._lease, None
+        if lease is not None:
+            lease.release()
+
+    def _run(self):
+        if self.total_size is None and not self._discover():
+            return self._result(False)
+        if self.total_size is None:
+            # Taille inconnue: lecture jusqu'à la fin du flux, sans manifeste
+            return self._result(self._run_stream())
+
+        self._prepare()
+        self.writer = self._open_writer()
+
+        try:
+            with shaper.job(self.weight, os.path.basename(self.save_path)) as self.shaper_job:
+                for attempt in range(2):
+                    try:
+                        self._run_modes()
+                        self._reconcile()
+                        break
+                    except SourceChanged as e:
+                        print(f"Fichier distant modifie ({e}), reprise depuis zero")
+                        self.writer.close()
+                        self.manifest = DownloadManifest(self.save_path, self.url, self.total_size)
+                        self._prepare_file(resume=False)
+                        self.writer = self._open_writer()
+                        self.downloaded = 0
+        finally:
+            self._close_first_response()
+            # Les octets encore en file sont écrits avant de juger la complétude
+            try:
+                self.writer.close()
+            finally:
+                complete = not self.manifest.missing_ranges()
+                if complete:
+                    self.manifest.delete()
+                else:
+                    self.manifest.save(force=True)
+
+        sha256 = None
+        if complete:
+            # Un fichier préexistant plus long que la taille annoncée est tronqué
+            if os.path.getsize(self.save_path) > self.total_size:
+                os.truncate(self.save_path, self.total_size)
+            self.digest.catch_up(self.total_size)
+            sha256 = self.digest.hexdigest()
+
+        return self._result(complete, sha256)
+
+    def _reconcile(self):
+        """Passe finale: comparer le manifeste à la taille annoncée et refetcher les trous
+
+        Seules les plages manquantes ou courtes sont redemandées, avec un
+        petit budget de reconnexions par passe, au lieu de rapporter un
+        téléchargement partiel.
+        """
+        for repair_pass in range(self.repair_passes):
+            if self.is_cancelled() or not self._ensure_lease():
+                return
+            self.writer.flush()
+            missing = self.manifest.missing_ranges()
+            if not missing:
+                return
+
+            missing_bytes = sum(end - start + 1 for start, end in missing)
+            print(f"Reparation {repair_pass + 1}: {len(missing)} plage(s), {missing_bytes} octets manquants")
+            self.repaired_ranges += len(missing)
+            self.max_reconnections = self.reconnections + self.repair_reconnections
+
+            errors = []
+            for start, end in missing:
+                self._fetch_range(start, end, errors, self._lease)
+                if errors or self._lease.preempted:
+                    break
+            if self._lease.preempted:
+                self._yield_lease()
+                continue
+            if errors:
+                if not isinstance(errors[0], RangeNotSupported):
+                    raise errors[0]
+                # Pas de Range fiable: la boucle série sait repartir de zéro
+                self._run_serial()
+
+    def _result(self, complete, sha256=None):
+        elapsed = time.time() - self._start_time
+        fetched = self.downloaded - self.resumed_from
+        return {
+            'downloaded': self.downloaded,
+            'total_size': self.total_size,
+            'resumed_from': self.resumed_from,
+            'reconnections': self.reconnections,
+            'elapsed': elapsed,
+            'speed': (fetched / (1024 * 1024)) / elapsed if elapsed > 0 else 0,
+            'mode': self.mode,
+            'complete': complete,
+            'repaired_ranges': self.repaired_ranges,
+            'sha256': sha256,
+            'cancelled': self.is_cancelled()
+        }
+
+    def _discover(self):
+        """Apprendre taille et support des Range du cache ou de la première requête
+
+        La réponse de découverte est gardée ouverte: le mode série l'utilise
+        comme première connexion au lieu d'en ouvrir une nouvelle. Une
+        requête échouée est retentée avec le même budget de reconnexions
+        que le transfert; une erreur client (404, 403...) est définitive.
+        Retourne False si le téléchargement est annulé avant la réponse.
+        """
+        self.remote_info = cached_remote_info(self.url)
+        while self.remote_info is None:
+            if self.is_cancelled():
+                return False
+            try:
+                monitor = self.estimator.monitor("decouverte")
+                self._first_response, self.remote_info = open_ranged(self.url)
+                monitor.first_byte()
+            except requests.exceptions.RequestException as e:
+                status = e.response.status_code if e.response is not None else None
+                self.reconnections += 1
+                if (status is not None and 400 <= status < 500 and status not in (408, 429)
+                        or self.reconnections >= self.max_reconnections):
+                    raise
+                print(f"Decouverte de {self.url} echouee ({e}), nouvelle tentative")
+                time.sleep(0.1)
+        self.total_size = self.remote_info.size
+        return True
+
+    def _take_first_response(self, position):
+        """Réponse de découverte si elle couvre la position demandée, sinon None
+
+        Un 200 (Range ignoré) est rendu quelle que soit la position: une
+        nouvelle requête renverrait elle aussi le fichier depuis le début.
+        """
+        response, self._first_response = self._first_response, None
+        if response is not None and position != 0 and response.status_code != 200:
+            response.close()
+            return None
+        return response
+
+    def _close_first_response(self):
+        response, self._first_response = self._first_response, None
+        if response is not None:
+            response.close()
+
+    def _prepare(self):
+        """Reprendre depuis le manifeste existant s'il correspond, sinon repartir de zéro"""
+        manifest = DownloadManifest.load(self.save_path)
+        if manifest and manifest.matches(self.url, self.total_size):
+            self.manifest = manifest
+            self.downloaded = self.resumed_from = manifest.completed_bytes()
+            print(f"Reprise de {self.save_path} a {self.resumed_from} octets")
+        else:
+            self.manifest = DownloadManifest(self.save_path, self.url, self.total_size)
+            if self.remote_info:
+                self.manifest.etag = self.remote_info.etag
+                self.manifest.last_modified = self.remote_info.last_modified
+            self._prepare_file(resume=False)
+            self.manifest.save(force=True)
+
+    def _prepare_file(self, resume):
+        """Vider le fichier existant quand on repart de zéro"""
+        if not resume:
+            open(self.save_path, 'wb').close()
+
+    def _open_writer(self):
+        """Écrivain en arrière-plan; manifeste et empreinte n'avancent qu'une fois les octets sur disque"""
+        self.digest = StreamDigest(self.save_path)
+        self.buffer_pool = self._create_buffer_pool()
+        return FileWriter(self.save_path, self.total_size, max_pending=self.max_pending,
+                          on_written=self._on_written)
+
+    def _create_buffer_pool(self):
+        """Tampons pour la file d'écriture plus un en réception par connexion"""
+        return BufferPool(self.chunk_size, self.max_pending + self.segments + 2)
+
+    def _on_written(self, offset, size, buffers):
+        self.manifest.add_range(offset, offset + size)
+        self.digest.update_at(offset, buffers)
+
+    def _overlap_before(self, position):
+        """Longueur déjà écrite juste avant `position` à revérifier (0 si rien)
+
+        Seuls les octets que le manifeste dit sur disque sont revérifiés: vider
+        la file d'écriture, partagée par tous les segments, bloquerait la
+        reconnexion derrière les tampons des autres.
+        """
+        return self.manifest.written_before(position, OVERLAP_CHECK)
+
+    def _check_overlap(self, offset, data):
+        """Comparer des octets reçus à ceux déjà sur disque au même offset"""
+        with open(self.save_path, 'rb') as f:
+            f.seek(offset)
+            on_disk = f.read(len(data))
+        if on_disk != data:
+            raise SourceChanged(f"contenu different a l'offset {offset} apres reconnexion")
+
+    def _run_modes(self):
+        missing = self.manifest.missing_ranges()
+        remaining = sum(end - start + 1 for start, end in missing)
+
+        # Un serveur qui ignore Range renverrait le fichier entier à chaque segment
+        if (self.segments > 1 and remaining >= 2 * MIN_SEGMENT_SIZE
+                and (self.remote_info is None or self.remote_info.accepts_ranges)):
+            try:
+                self.mode = 'segmente'
+                self._run_segmented(missing)
+                return
+            except RangeNotSupported as e:
+                print(f"Mode segmente indisponible ({e}), repli en serie")
+                self.mode = 'serie'
+        self._run_serial()
+
+    def _headers(self, range_value):
+        headers = {
+            'User-Agent': USER_AGENTS[self.reconnections % len(USER_AGENTS)],
+            'Accept': '*/*',
+            'Accept-Encoding': 'identity',
+            'Connection': 'keep-alive',
+            'Range': range_value,
+            'Cache-Control': 'no-cache'
+        }
+        # Mode flux: pas de manifeste, donc pas de validateur à envoyer
+        validator = self.manifest.validators() if self.manifest else None
+        if validator:
+            headers['If-Range'] = validator
+        return headers
+
+    def _add_progress(self, nbytes):
+        """Comptabiliser des octets reçus et notifier la progression"""
+        with self._lock:
+            self.downloaded += nbytes
+            now = time.time()
+            if now - self._last_progress < self.progress_interval:
+                return
+            self._last_progress = now
+            downloaded = self.downloaded
+            connections = max(self.active_connections, 1)
+            reconnections = self.reconnections
+        elapsed = now - self._start_time
+        speed = ((downloaded - self.resumed_from) / (1024 * 1024)) / elapsed if elapsed > 0 else 0
+        if self.on_progress:
+            self.on_progress(downloaded, self.total_size, speed, connections, reconnections)
+
+    def _run_serial(self):
+        """Un seul flux à la fois sur les plages manquantes, avec rotation des connexions"""
+        connection_index = 0
+        self.active_connections = 1
+
+        try:
+            while self.reconnections < self.max_reconnections and not self.is_cancelled():
+                if not self._ensure_lease():
+                    break
+                # Les plages en file d'écriture doivent être au manifeste avant de choisir la suite
+                self.writer.flush()
+                missing = self.manifest.missing_ranges()
+                if not missing:
+                    break
+                position, end = missing[0]
+
+                try:
+                    connection_index += 1
+                    monitor = self.estimator.monitor(f"serie#{connection_index}")
+                    verify = 0
+                    response = self._take_first_response(position)
+                    if response is None:
+                        verify = self._overlap_before(position)
+                        response = http_client.client.stream(self.url, headers=self._headers(f'bytes={position - verify}-'))
+                    monitor.first_byte()
+
+                    if response.status_code not in [200, 206]:
+                        response.close()
+                        self.reconnections += 1
+                        continue
+
+                    self.manifest.check_response(response)
+
+                    # Un 200 renvoie le fichier depuis le début: tout repartir de zéro
+                    if response.status_code == 200 and position > 0:
+                        self.writer.flush()
+                        self.manifest.reset()
+                        self.downloaded = 0
+                        position, end = 0, self.total_size - 1
+                        verify = 0
+
+                    reader = PooledReader(response, self.buffer_pool)
+                    for chunk in reader:
+                        if self.is_cancelled():
+                            break
+                        if not chunk:
+                            continue
+                        if verify:
+                            n = min(verify, len(chunk))
+                            self._check_overlap(position - verify, chunk[:n])
+                            verify -= n
+                            chunk = chunk[n:]
+                            if not chunk:
+                                continue
+                        chunk = chunk[:end + 1 - position]
+                        self.shaper_job.consume(len(chunk))
+                        self.writer.write(position, chunk, reader.take())
+                        self._add_progress(len(chunk))
+                        position += len(chunk)
+
+                        if position > end:
+                            break
+                        if monitor.add(len(chunk)) or self._lease.preempted:
+                            break
+
+                    try:
+                        response.close()
+                    except:
+                        pass
+
+                    self.writer.flush()
+                    if self.is_cancelled() or not self.manifest.missing_ranges():
+                        break
+                    # Plage terminée: passer à la suivante sans compter de reconnexion
+                    if position > end:
+                        continue
+                    # Connexion cédée à la lecture: attendre une place, sans compter de reconnexion
+                    if self._lease.preempted:
+                        self._yield_lease()
+                        continue
+
+                    self.reconnections += 1
+
+                except (SourceChanged, WriteError):
+                    raise
+
+                except requests.exceptions.RequestException:
+                    self.reconnections += 1
+                    time.sleep(0.1)
+                    continue
+
+                except Exception:
+                    self.reconnections += 1
+                    continue
+        finally:
+            self.active_connections = 0
+
+    def _segment_count(self):
+        """Connexions du mode segmenté: `segments`, ou plus si le compte a des places libres
+
+        Le bail principal est déjà tenu: chaque place libre du governor est
+        une connexion de plus, jusqu'à MAX_SEGMENTS. Sans budget connu
+        (pas de compte Xtream), `segments` seulement.
+        """
+        free = governor.free_slots()
+        if free is None:
+            return self.segments
+        return max(self.segments, min(1 + free, MAX_SEGMENTS))
+
+    def _run_segmented(self, missing):
+        """Répartir les plages manquantes sur des connexions parallèles"""
+        self._close_first_response()
+        connections = self._segment_count()
+        parts = plan_segments(missing, connections)
+        if connections > self.segments:
+            # Un tampon en réception de plus par connexion supplémentaire
+            self.buffer_pool = BufferPool(self.chunk_size, self.max_pending + connections + 2)
+        work = queue.Queue()
+        for part in parts:
+            work.put(part)
+
+        errors = []
+        threads = []
+        # Le premier worker garde la connexion principale, les autres attendent une place libre
+        lease, self._lease = self._lease, None
+        for _ in range(min(connections, len(parts))):
+            thread = threading.Thread(target=self._segment_worker, args=(work, errors, lease), daemon=True)
+            threads.append(thread)
+            thread.start()
+            lease = None
+
+        for thread in threads:
+            thread.join()
+
+        for error in errors:
+            if isinstance(error, WriteError):
+                raise error
+        for error in errors:
+            raise error
+
+    def _segment_worker(self, work, errors, lease=None):
+        """Consommer des plages [start, end] et les écrire à leur offset
+
+        Chaque worker tient un bail du governor; préempté, il remet le reste
+        de sa plage en file, rend sa connexion et attend une nouvelle place.
+        """
+        try:
+            while not errors and not self.is_cancelled():
+                if lease is None:
+                    lease = governor.acquire(
+                        DOWNLOAD, os.path.basename(self.save_path),
+                        cancelled=lambda: self.is_cancelled() or errors or work.empty()
+                    )
+                    if lease is None:
+                        break
+                try:
+                    start, end = work.get_nowait()
+                except queue.Empty:
+                    break
+
+                with self._lock:
+                    self.active_connections += 1
+                try:
+                    rest = self._fetch_range(start, end, errors, lease)
+                finally:
+                    with self._lock:
+                        self.active_connections -= 1
+
+                if lease.preempted:
+                    if rest:
+                        work.put(rest)
+                    lease.release()
+                    lease = None
+        finally:
+            if lease is not None:
+                lease.release()
+
+    def _fetch_range(self, start, end, errors, lease=None):
+        """Télécharger une plage avec reconnexions jusqu'à ce qu'elle soit complète
+
+        Retourne la plage restante si la connexion a été préemptée, sinon None.
+        """
+        position = start
+        while (position <= end
+               and not (lease and lease.preempted)
+               and self.reconnections < self.max_reconnections
+               and not self.is_cancelled()
+               and not errors):
+            try:
+                monitor = self.estimator.monitor(f"{start}-{end}")
+                verify = self._overlap_before(position)
+                request_start = position - verify
+                response = http_client.client.stream(self.url, headers=self._headers(f'bytes={request_start}-{end}'))
+                monitor.first_byte()
+
+                if response.status_code != 206:
+                    response.close()
+                    if response.status_code == 200:
+                        self.manifest.check_response(response)
+                        raise RangeNotSupported("reponse 200 au lieu de 206")
+                    with self._lock:
+                        self.reconnections += 1
+                    continue
+
+                self.manifest.check_response(response)
+
+                content_range = parse_content_range(response.headers.get('content-range'))
+                if (not content_range or content_range[0] != request_start
+                        or (content_range[2] is not None and content_range[2] != self.total_size)):
+                    response.close()
+                    raise RangeNotSupported(f"Content-Range inattendu: {response.headers.get('content-range')}")
+
+                # La longueur annoncée doit correspondre à la plage, sinon la réponse sera courte
+                content_length = response.headers.get('content-length')
+                if content_length and int(content_length) != content_range[1] - content_range[0] + 1:
+                    response.close()
+                    raise RangeNotSupported(f"Content-Length {content_length} incoherent avec la plage")
+
+                reader = PooledReader(response, self.buffer_pool)
+                for chunk in reader:
+                    if self.is_cancelled() or errors:
+                        break
+                    if not chunk:
+                        continue
+                    if verify:
+                        n = min(verify, len(chunk))
+                        self._check_overlap(position - verify, chunk[:n])
+                        verify -= n
+                        chunk = chunk[n:]
+                        if not chunk:
+                            continue
+                    # Ne jamais déborder sur la plage suivante
+                    chunk = chunk[:end + 1 - position]
+                    self.shaper_job.consume(len(chunk))
+                    self.writer.write(position, chunk, reader.take())
+                    self._add_progress(len(chunk))
+                    position += len(chunk)
+
+                    if position > end:
+                        break
+                    if monitor.add(len(chunk)) or (lease and lease.preempted):
+                        break
+
+                try:
+                    response.close()
+                except:
+                    pass
+
+                if lease and lease.preempted:
+                    break
+                if position <= end and not self.is_cancelled():
+                    with self._lock:
+                        self.reconnections += 1
+
+            except (RangeNotSupported, SourceChanged, WriteError) as e:
+                errors.append(e)
+                break
+
+            except requests.exceptions.RequestException:
+                with self._lock:
+                    self.reconnections += 1
+                time.sleep(0.1)
+                continue
+
+            except Exception:
+                with self._lock:
+                    self.reconnections += 1
+                continue
+
+        if lease and lease.preempted and position <= end:
+            return position, end
+        return None
+
+    def _run_stream(self):
+        """Taille inconnue: écrire le flux jusqu'à EOF, reprise par Range si le serveur le permet"""
+        accepts_ranges = self.remote_info.accepts_ranges if self.remote_info else False
+        position = 0
+        eof = False
+        self.mode = 'flux'
+        self.active_connections = 1
+        self.buffer_pool = self._create_buffer_pool()
+
+        try:
+            with shaper.job(self.weight, os.path.basename(self.save_path)) as self.shaper_job, \
+                    FileWriter(self.save_path, max_pending=self.max_pending, truncate=True) as writer:
+                while not eof and self.reconnections < self.max_reconnections and not self.is_cancelled():
+                    try:
+                        response = self._take_first_response(position)
+                        if response is None:
+                            response = http_client.client.stream(self.url, headers=self._headers(f'bytes={position}-'))
+                            response.raise_for_status()
+                            # Pas de reprise possible: le flux recommence au début
+                            if response.status_code == 200 and position > 0:
+                                position = 0
+                                self.downloaded = 0
+
+                        reader = PooledReader(response, self.buffer_pool)
+                        for chunk in reader:
+                            if self.is_cancelled():
+                                break
+                            if not chunk:
+                                continue
+                            self.shaper_job.consume(len(chunk))
+                            writer.write(position, chunk, reader.take())
+                            position += len(chunk)
+                            self._add_progress(len(chunk))
+                        else:
+                            eof = True
+
+                        response.close()
+
+                    except WriteError:
+                        raise
+
+                    except Exception as e:
+                        print(f"Flux interrompu a {position} octets: {e}")
+                        self.reconnections += 1
+                        if not accepts_ranges:
+                            position = 0
+                            self.downloaded = 0
+                        time.sleep(0.1)
+
+            # Retirer une éventuelle fin de fichier d'une tentative plus longue
+            os.truncate(self.save_path, position)
+        finally:
+            self.active_connections = 0
+            self._close_first_response()
+
+        return eof and not self.is_cancelled()
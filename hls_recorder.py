@@ -0,0 +1,412 @@
+"""Enregistrement des chaînes live HLS (.m3u8) en fichier .ts (sans dépendance Kivy)"""
+
+import queue
+import threading
+import time
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+import http_client
+from bandwidth import shaper
+from connection_governor import RECORDING, governor
+from disk_writer import FileWriter
+
+
+# Une playlist plus grosse n'en est pas une (flux continu servi à la place)
+MAX_PLAYLIST_BYTES = 2 * 1024 * 1024
+
+
+class HlsError(Exception):
+    """Playlist HLS illisible ou non prise en charge"""
+
+
+def hls_url(url):
+    """URL de la playlist HLS d'une chaîne, ou None si elle n'en a pas
+
+    Les playlists Xtream donnent les chaînes live en MPEG-TS continu
+    (/live/u/p/123.ts): le même flux existe en HLS sous .m3u8.
+    """
+    parts = urlsplit(url)
+    path = parts.path
+    if path.endswith('.m3u8'):
+        return url
+    if '/live/' in path:
+        base, _, name = path.rpartition('/')
+        return urlunsplit(parts._replace(path=f"{base}/{name.split('.')[0]}.m3u8"))
+    return None
+
+
+def read_playlist(response):
+    """Corps d'une playlist lu en flux, refusé dès les premiers octets si ce n'en est pas une"""
+    content_type = response.headers.get('content-type', '').split(';')[0].strip().lower()
+    if content_type.startswith(('video/', 'audio/')):
+        raise HlsError(f"flux {content_type} au lieu d'une playlist HLS")
+    chunks = []
+    size = 0
+    checked = False
+    for chunk in response.iter_content(chunk_size=16384):
+        chunks.append(chunk)
+        size += len(chunk)
+        if not checked:
+            head = b''.join(chunks).lstrip(b'\xef\xbb\xbf \t\r\n')
+            if len(head) >= 7:
+                if not head.startswith(b'#EXTM3U'):
+                    raise HlsError("playlist HLS invalide")
+                checked = True
+        if size > MAX_PLAYLIST_BYTES:
+            raise HlsError(f"playlist de plus de {MAX_PLAYLIST_BYTES} octets")
+    return b''.join(chunks).decode(response.encoding or 'utf-8', errors='replace')
+
+
+class MediaPlaylist:
+    """Playlist média HLS: segments numérotés par leur media sequence"""
+
+    def __init__(self, url, target_duration, media_sequence, segments, ended, encrypted=False):
+        self.url = url
+        self.target_duration = target_duration
+        self.media_sequence = media_sequence
+        self.segments = segments  # [(sequence, uri, durée)]
+        self.ended = ended
+        self.encrypted = encrypted
+
+    @property
+    def last_sequence(self):
+        return self.segments[-1][0] if self.segments else self.media_sequence - 1
+
+
+def parse_attributes(value):
+    """Attributs d'un tag HLS: BANDWIDTH=800000,CODECS="avc1,mp4a" -> dict"""
+    attributes = {}
+    key, current, quoted = None, '', False
+    for char in value + ',':
+        if char == '"':
+            quoted = not quoted
+        elif char == '=' and key is None and not quoted:
+            key, current = current.strip(), ''
+        elif char == ',' and not quoted:
+            if key is not None:
+                attributes[key.upper()] = current
+            key, current = None, ''
+        else:
+            current += char
+    return attributes
+
+
+def parse_master_playlist(content, base_url):
+    """Variantes d'une playlist maître, triées par débit décroissant"""
+    variants = []
+    lines = [line.strip() for line in content.splitlines()]
+    for i, line in enumerate(lines):
+        if line.startswith('#EXT-X-STREAM-INF:'):
+            attributes = parse_attributes(line.split(':', 1)[1])
+            for uri in lines[i + 1:]:
+                if uri and not uri.startswith('#'):
+                    bandwidth = int(attributes.get('BANDWIDTH', '0') or 0)
+                    variants.append((bandwidth, urljoin(base_url, uri)))
+                    break
+    variants.sort(reverse=True)
+    return variants
+
+
+def parse_media_playlist(content, base_url):
+    """Lire une playlist média (#EXTINF, #EXT-X-MEDIA-SEQUENCE, #EXT-X-ENDLIST)"""
+    target_duration = 6.0
+    media_sequence = 0
+    segments = []
+    ended = False
+    encrypted = False
+    duration = 0.0
+
+    lines = [line.strip() for line in content.splitlines()]
+    if not lines or not lines[0].startswith('#EXTM3U'):
+        raise HlsError("playlist HLS invalide")
+
+    for line in lines[1:]:
+        if not line:
+            continue
+        if line.startswith('#EXT-X-TARGETDURATION:'):
+            target_duration = float(line.split(':', 1)[1])
+        elif line.startswith('#EXT-X-MEDIA-SEQUENCE:'):
+            media_sequence = int(line.split(':', 1)[1])
+        elif line.startswith('#EXTINF:'):
+            try:
+                duration = float(line.split(':', 1)[1].split(',')[0])
+            except ValueError:
+                duration = 0.0
+        elif line.startswith('#EXT-X-ENDLIST'):
+            ended = True
+        elif line.startswith('#EXT-X-KEY:'):
+            method = parse_attributes(line.split(':', 1)[1]).get('METHOD', 'NONE')
+            encrypted = encrypted or method.upper() != 'NONE'
+        elif not line.startswith('#'):
+            sequence = media_sequence + len(segments)
+            segments.append((sequence, urljoin(base_url, line), duration))
+            duration = 0.0
+
+    return MediaPlaylist(base_url, target_duration, media_sequence, segments, ended, encrypted)
+
+
+class HlsRecorder:
+    """Enregistreur d'une chaîne live HLS
+
+    La playlist média est rechargée toutes les `target_duration` secondes
+    (la moitié si elle n'a pas bougé). Chaque nouveau segment, identifié par
+    son media sequence, est confié à `lookahead` connexions parallèles; les
+    segments reçus sont ajoutés au fichier .ts dans l'ordre. Un segment
+    introuvable après `segment_retries` essais est sauté plutôt que de
+    bloquer l'enregistrement. L'enregistrement démarre `live_edge` segments
+    avant la fin de la fenêtre, comme un lecteur. Les segments passent par
+    la limite de débit globale avec un poids `weight`: un live en retard ne
+    se rattrape pas, il prend une plus grosse part que les téléchargements.
+    """
+
+    lookahead = 3
+    segment_retries = 3
+    playlist_retries = 5
+    live_edge = 3
+    weight = 3.0
+    chunk_size = 64 * 1024
+
+    def __init__(self, url, save_path, is_cancelled=None, on_progress=None, max_duration=None):
+        self.url = url
+        self.save_path = save_path
+        self.is_cancelled = is_cancelled or (lambda: False)
+        self.on_progress = on_progress
+        self.max_duration = max_duration
+
+        self.media_url = None
+        self.next_sequence = None   # prochain segment à écrire
+        self.last_scheduled = None  # dernier segment confié aux workers
+        self.ready = {}             # sequence -> octets (None si échec)
+        self.durations = {}
+        self.recorded_bytes = 0
+        self.recorded_seconds = 0.0
+        self.segments = 0
+        self.skipped = 0
+        self.ended = False
+        self._cond = threading.Condition()
+        self._generation = 0
+        self._start_time = 0.0
+
+    def run(self):
+        """Enregistrer jusqu'à l'annulation, la durée maximale ou #EXT-X-ENDLIST"""
+        self._start_time = time.time()
+        fetch_queue = queue.Queue()
+        workers = [threading.Thread(target=self._fetch_worker, args=(fetch_queue,), daemon=True)
+                   for _ in range(self.lookahead)]
+        for worker in workers:
+            worker.start()
+
+        position = 0
+        try:
+            with FileWriter(self.save_path, truncate=True) as writer:
+                previous_last = None
+                failures = 0
+                while not self._should_stop():
+                    try:
+                        playlist = self._load_playlist()
+                        if playlist is None:
+                            break
+                        failures = 0
+                    except HlsError:
+                        raise
+                    except Exception as e:
+                        failures += 1
+                        if failures > self.playlist_retries:
+                            raise
+                        print(f"DEBUG: Playlist HLS indisponible ({e}), essai {failures}")
+                        time.sleep(1.0)
+                        continue
+                    self._schedule(playlist, fetch_queue)
+                    self.ended = playlist.ended
+
+                    # Rechargement après une durée cible, la moitié si rien de neuf
+                    interval = playlist.target_duration
+                    if playlist.last_sequence == previous_last:
+                        interval /= 2
+                    previous_last = playlist.last_sequence
+
+                    deadline = time.time() + interval
+                    while not self._should_stop():
+                        position = self._write_ready(writer, position)
+                        if self._finished():
+                            break
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            break
+                        with self._cond:
+                            if self.next_sequence not in self.ready:
+                                self._cond.wait(min(remaining, 0.5))
+                    if self._finished():
+                        break
+                position = self._write_ready(writer, position)
+        finally:
+            # Segments pas encore commencés: inutiles une fois l'enregistrement arrêté
+            while True:
+                try:
+                    fetch_queue.get_nowait()
+                except queue.Empty:
+                    break
+            for _ in workers:
+                fetch_queue.put(None)
+
+        elapsed = time.time() - self._start_time
+        return {
+            'recorded_bytes': self.recorded_bytes,
+            'recorded_seconds': self.recorded_seconds,
+            'segments': self.segments,
+            'skipped': self.skipped,
+            'elapsed': elapsed,
+            'ended': self.ended,
+            'cancelled': self.is_cancelled()
+        }
+
+    def _finished(self):
+        """Playlist close et tous les segments programmés écrits"""
+        return self.ended and (self.next_sequence is None or self.next_sequence > self.last_scheduled)
+
+    def _should_stop(self):
+        if self.is_cancelled():
+            return True
+        return bool(self.max_duration) and self.recorded_seconds >= self.max_duration
+
+    def _load_playlist(self):
+        """Télécharger la playlist média (la variante au plus haut débit pour une playlist maître)
+
+        Retourne None si l'enregistrement est annulé en attendant une connexion.
+        """
+        url = self.media_url or self.url
+        # Chaque rechargement ouvre une connexion du compte, comme un segment
+        lease = governor.acquire(RECORDING, 'enregistrement', cancelled=self.is_cancelled)
+        if lease is None:
+            return None
+        try:
+            response = http_client.client.stream(url)
+            try:
+                response.raise_for_status()
+                content = read_playlist(response)
+            finally:
+                response.close()
+        finally:
+            lease.release()
+        base_url = response.url or url
+
+        if self.media_url is None and '#EXT-X-STREAM-INF' in content:
+            variants = parse_master_playlist(content, base_url)
+            if not variants:
+                raise HlsError("playlist maitre sans variante")
+            self.media_url = variants[0][1]
+            print(f"DEBUG: Variante HLS {variants[0][0]} bit/s: {self.media_url}")
+            return self._load_playlist()
+
+        playlist = parse_media_playlist(content, base_url)
+        if playlist.encrypted:
+            raise HlsError("segments chiffres (EXT-X-KEY) non pris en charge")
+        self.media_url = self.media_url or url
+        return playlist
+
+    def _schedule(self, playlist, fetch_queue):
+        """Confier aux workers les segments jamais vus (dédoublonnés par media sequence)"""
+        if not playlist.segments:
+            return
+        first, last = playlist.segments[0][0], playlist.last_sequence
+
+        if self.last_scheduled is None:
+            start = max(first, last - self.live_edge + 1)
+            self.next_sequence = start
+            self.last_scheduled = start - 1
+        elif last < self.last_scheduled - len(playlist.segments):
+            # Numérotation repartie de zéro (redémarrage de l'encodeur)
+            print(f"DEBUG: Media sequence reinitialisee ({self.last_scheduled} -> {last})")
+            with self._cond:
+                self.ready.clear()
+                self._generation += 1
+            self.durations.clear()
+            self.next_sequence = first
+            self.last_scheduled = first - 1
+        elif first > self.last_scheduled + 1:
+            # Segments sortis de la fenêtre avant d'avoir été vus
+            with self._cond:
+                for sequence in range(self.last_scheduled + 1, first):
+                    self.ready[sequence] = None
+            self.last_scheduled = first - 1
+
+        for sequence, uri, duration in playlist.segments:
+            if sequence <= self.last_scheduled:
+                continue
+            self.durations[sequence] = duration
+            fetch_queue.put((self._generation, sequence, uri))
+            self.last_scheduled = sequence
+
+    def _fetch_worker(self, fetch_queue):
+        while True:
+            job = fetch_queue.get()
+            if job is None:
+                break
+            generation, sequence, uri = job
+            # Durée maximale atteinte: vider la file sans rien télécharger
+            if self._should_stop():
+                continue
+            data = self._fetch_segment(uri)
+            with self._cond:
+                # Segment d'une numérotation abandonnée
+                if generation != self._generation:
+                    continue
+                self.ready[sequence] = data
+                self._cond.notify_all()
+
+    def _fetch_segment(self, uri):
+        for attempt in range(self.segment_retries):
+            # Une connexion du compte par segment en vol, prioritaire sur les téléchargements
+            lease = governor.acquire(RECORDING, 'enregistrement', cancelled=self.is_cancelled)
+            if lease is None:
+                return None
+            try:
+                data = self._download_segment(uri)
+                if data:
+                    return data
+            except Exception as e:
+                print(f"DEBUG: Segment {uri} erreur: {e}")
+            finally:
+                lease.release()
+            if attempt + 1 < self.segment_retries:
+                time.sleep(0.5 * (attempt + 1))
+        return None
+
+    def _download_segment(self, uri):
+        """Corps d'un segment lu par blocs sous la limite de débit (None si code d'erreur)"""
+        with shaper.job(self.weight, 'enregistrement') as job:
+            response = http_client.client.stream(uri)
+            try:
+                if response.status_code != 200:
+                    print(f"DEBUG: Segment {uri} code {response.status_code}")
+                    return None
+                chunks = []
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    if self.is_cancelled():
+                        return None
+                    job.consume(len(chunk))
+                    chunks.append(chunk)
+                return b''.join(chunks)
+            finally:
+                response.close()
+
+    def _write_ready(self, writer, position):
+        """Ajouter au fichier les segments disponibles, dans l'ordre des séquences"""
+        while True:
+            with self._cond:
+                if self.next_sequence is None or self.next_sequence not in self.ready:
+                    return position
+                data = self.ready.pop(self.next_sequence)
+            duration = self.durations.pop(self.next_sequence, 0.0)
+            self.next_sequence += 1
+
+            if data is None:
+                self.skipped += 1
+                continue
+            writer.write(position, data)
+            position += len(data)
+            self.recorded_bytes += len(data)
+            self.recorded_seconds += duration
+            self.segments += 1
+            if self.on_progress:
+                self.on_progress(self.recorded_seconds, self.recorded_bytes, self.segments, self.skipped)
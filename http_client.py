@@ -0,0 +1,63 @@
+"""Client HTTP partagé par les appels API et les téléchargements (sans dépendance Kivy)"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (compatible; IPTV Manager)'
+
+
+class HttpClient:
+    """Session unique avec un pool de connexions keep-alive par hôte
+
+    Les appels player_api.php et les téléchargements passent tous par ici:
+    une connexion TCP/TLS déjà ouverte vers le serveur est réutilisée au
+    lieu de refaire une poignée de main à chaque requête. `pool_connections`
+    est le nombre d'hôtes gardés en pool, `pool_maxsize` le nombre de
+    connexions par hôte (au moins le nombre de segments parallèles).
+    Aucun retry automatique: les appelants gèrent leurs reconnexions.
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=16, timeout=30,
+                 download_timeout=10, user_agent=DEFAULT_USER_AGENT):
+        self.timeout = timeout
+        self.download_timeout = download_timeout
+        self.user_agent = user_agent
+        self.session = self._create_session(pool_connections, pool_maxsize)
+
+    def _create_session(self, pool_connections, pool_maxsize):
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            max_retries=Retry(total=0, backoff_factor=0),
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=False
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers['User-Agent'] = self.user_agent
+        return session
+
+    def get(self, url, **kwargs):
+        """GET avec le timeout par défaut et le User-Agent centralisé"""
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def stream(self, url, headers=None, timeout=None):
+        """GET en streaming pour les téléchargements (timeout court, reconnexions gérées ailleurs)"""
+        return self.session.get(
+            url, headers=headers, stream=True,
+            timeout=timeout or self.download_timeout
+        )
+
+    def close(self):
+        self.session.close()
+
+
+# Client unique du processus
+client = HttpClient()
+
+
+def get(url, **kwargs):
+    return client.get(url, **kwargs)
@@ -0,0 +1,95 @@
+"""Lecture incrémentale des grands tableaux JSON de l'API Xtream (sans dépendance Kivy)"""
+
+import codecs
+import json
+import re
+
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+# Blancs et BOM éventuel avant le premier caractère du document
+BLANKS = ' \t\n\r\ufeff'
+
+
+def _array_elements(decoder, buffer, position, final):
+    """Produire les éléments complets de `buffer` à partir de `position`
+
+    Retourne (position du premier octet non consommé, fin du tableau atteinte).
+    """
+    end_of_buffer = len(buffer)
+    while True:
+        position = WHITESPACE.match(buffer, position).end()
+        if position >= end_of_buffer:
+            return position, False
+        char = buffer[position]
+        if char == ']':
+            return position + 1, True
+        if char == ',':
+            position += 1
+            continue
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            # Élément coupé par la fin du chunk: attendre la suite
+            return position, False
+        # Un nombre peut être coupé par la fin du chunk (1 au lieu de 1.25): complet
+        # seulement quand son délimiteur est arrivé
+        if not final and isinstance(value, (int, float)):
+            after = WHITESPACE.match(buffer, end).end()
+            if after >= end_of_buffer or buffer[after] not in ',]':
+                return position, False
+        yield value
+        position = end
+
+
+def iter_json_array(chunks, encoding='utf-8'):
+    """Décoder un tableau JSON élément par élément au fil des chunks reçus
+
+    Seuls le chunk en cours et l'élément incomplet qu'il termine restent en
+    mémoire: le corps brut et la liste décodée complète n'existent jamais.
+    Chaque élément est décodé par json en C (raw_decode). Si la réponse
+    n'est pas un tableau (objet indexé par id, null, vide), elle est lue
+    en entier et ses valeurs sont produites.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    chunks = iter(chunks)
+    buffer = ''
+    position = 0
+    started = False
+
+    for chunk in chunks:
+        buffer = buffer[position:] + text_decoder.decode(chunk)
+        position = 0
+        if not started:
+            buffer = buffer.lstrip(BLANKS)
+            if not buffer:
+                continue
+            if buffer[0] != '[':
+                yield from _whole_document(buffer, chunks, text_decoder)
+                return
+            position = 1
+            started = True
+        position, finished = yield from _array_elements(decoder, buffer, position, False)
+        if finished:
+            return
+
+    buffer = buffer[position:] + text_decoder.decode(b'', final=True)
+    if not started:
+        yield from _whole_document(buffer.lstrip(BLANKS), (), text_decoder)
+        return
+    _, finished = yield from _array_elements(decoder, buffer, 0, True)
+    if not finished:
+        raise json.JSONDecodeError("tableau JSON non terminé", buffer, len(buffer))
+
+
+def _whole_document(start, chunks, text_decoder):
+    """Repli pour une réponse qui n'est pas un tableau: valeurs d'un objet, rien pour null"""
+    text = start + ''.join(text_decoder.decode(chunk) for chunk in chunks) + text_decoder.decode(b'', final=True)
+    if not text.strip():
+        return
+    data = json.loads(text)
+    if isinstance(data, dict):
+        data = data.values()
+    yield from data or ()
@@ -0,0 +1,182 @@
+"""Index persistant de la bibliothèque de téléchargements (sans dépendance Kivy)"""
+
+import json
+import os
+import threading
+
+from downloader import DownloadManifest
+
+
+COMPLETE = 'complet'
+PARTIAL = 'partiel'
+# Présent sur disque sans trace du téléchargeur (copié à la main, autre outil, ancienne version)
+UNKNOWN = 'inconnu'
+
+
+class LibraryIndex:
+    """Fichiers déjà présents dans le dossier de téléchargements
+
+    Chaque fichier est indexé par son chemin relatif avec sa taille, son
+    mtime, l'URL source et son état (complet ou partiel). Le rafraîchissement
+    est incrémental: un dossier dont le mtime n'a pas bougé depuis le
+    dernier passage n'est pas relu (ajouts, suppressions et manifestes de
+    reprise réécrits par os.replace modifient tous le mtime du dossier),
+    seuls ses sous-dossiers sont visités.
+    Un fichier avec un manifeste `.part.json` à côté est partiel. Seul
+    record() marque un fichier complet, avec son URL: un fichier trouvé
+    sans manifeste et sans enregistrement du téléchargeur reste inconnu
+    tant qu'on n'a pas comparé sa taille à celle attendue (matches_size).
+    """
+
+    index_name = '.iptv_library.json'
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.path = os.path.join(self.root, self.index_name)
+        self.files = {}
+        self.dirs = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.files = data.get('files', {})
+            self.dirs = data.get('dirs', {})
+        except (OSError, ValueError, AttributeError):
+            self.files, self.dirs = {}, {}
+
+    def save(self):
+        """Écrire l'index de façon atomique"""
+        with self._lock:
+            data = {'files': dict(self.files), 'dirs': dict(self.dirs)}
+        tmp_path = self.path + '.tmp'
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Erreur sauvegarde index bibliotheque: {e}")
+
+    def _key(self, path):
+        path = os.path.abspath(path)
+        if path == self.root or path.startswith(self.root + os.sep):
+            return os.path.relpath(path, self.root)
+        return path
+
+    def refresh(self, path=None):
+        """Mettre à jour l'index sous `path` (tout le dossier par défaut)
+
+        Retourne le nombre de dossiers effectivement relus.
+        """
+        start = os.path.abspath(path or self.root)
+        rescanned = 0
+        pending = [start]
+        while pending:
+            directory = pending.pop()
+            try:
+                mtime = os.stat(directory).st_mtime
+            except OSError:
+                self._forget_dir(self._key(directory))
+                continue
+
+            key = self._key(directory)
+            with self._lock:
+                known = self.dirs.get(key)
+            if known and known['mtime'] == mtime:
+                pending.extend(os.path.join(directory, name) for name in known['subdirs'])
+                continue
+
+            rescanned += 1
+            subdirs = self._scan_dir(directory, key)
+            with self._lock:
+                self.dirs[key] = {'mtime': mtime, 'subdirs': subdirs}
+            pending.extend(os.path.join(directory, name) for name in subdirs)
+        return rescanned
+
+    def _scan_dir(self, directory, key):
+        """Relire un dossier avec os.scandir et retourner ses sous-dossiers"""
+        subdirs = []
+        names = set()
+        seen = {}
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                names.add(entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                elif entry.is_file() and not entry.name.startswith('.'):
+                    stat = entry.stat()
+                    seen[entry.name] = (stat.st_size, stat.st_mtime)
+
+        prefix = '' if key == '.' else key + os.sep
+        with self._lock:
+            # Fichiers disparus du dossier
+            for file_key in [k for k in self.files if os.path.dirname(k) == (key if key != '.' else '')]:
+                if os.path.basename(file_key) not in seen:
+                    del self.files[file_key]
+
+            for name, (size, mtime) in seen.items():
+                if name.endswith(DownloadManifest.suffix) or name.endswith('.tmp'):
+                    continue
+                file_key = prefix + name
+                entry = self.files.get(file_key)
+                state = PARTIAL if name + DownloadManifest.suffix in names else UNKNOWN
+                if entry and entry['size'] == size and entry['mtime'] == mtime:
+                    # Un fichier enregistré partiel par la file le reste tant qu'il n'a pas bougé
+                    if state == PARTIAL:
+                        entry['state'] = PARTIAL
+                    continue
+                self.files[file_key] = {
+                    'size': size,
+                    'mtime': mtime,
+                    'url': entry['url'] if entry else None,
+                    'state': state,
+                    'sha256': None
+                }
+        return subdirs
+
+    def _forget_dir(self, key):
+        prefix = '' if key == '.' else key + os.sep
+        with self._lock:
+            for dir_key in [k for k in self.dirs if k == key or k.startswith(prefix)]:
+                del self.dirs[dir_key]
+            for file_key in [k for k in self.files if k.startswith(prefix)]:
+                del self.files[file_key]
+
+    def record(self, path, url, complete, sha256=None):
+        """Enregistrer le résultat d'un téléchargement"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        with self._lock:
+            self.files[self._key(path)] = {
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'url': url,
+                'state': COMPLETE if complete else PARTIAL,
+                'sha256': sha256
+            }
+
+    def lookup(self, path):
+        with self._lock:
+            return self.files.get(self._key(path))
+
+    def is_complete(self, path, url):
+        """Vrai si le téléchargeur a enregistré ce fichier complet depuis cette URL"""
+        entry = self.lookup(path)
+        if not entry or entry['state'] != COMPLETE:
+            return False
+        return url is not None and entry['url'] == url
+
+    def matches_size(self, path, size):
+        """Vrai si un fichier inconnu de l'index a exactement `size` octets sur disque"""
+        entry = self.lookup(path)
+        if not entry or entry['state'] != UNKNOWN or not size:
+            return False
+        try:
+            return os.path.getsize(path) == entry['size'] == size
+        except OSError:
+            return False
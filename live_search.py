@@ -0,0 +1,86 @@
+"""Recherche à la frappe hors du thread UI, regroupée et annulable (sans dépendance Kivy)"""
+
+import threading
+import time
+
+
+SEARCH_DELAY = 0.25
+
+
+class LiveSearch:
+    """Une zone de recherche: la dernière saisie seule est cherchée, sur un thread dédié
+
+    submit(text) est appelé depuis le thread UI à chaque frappe et ne fait
+    que noter la saisie. Le thread de recherche attend `delay` secondes
+    sans nouvelle frappe, puis appelle `search(text, is_cancelled)`;
+    `is_cancelled()` devient vrai dès qu'une saisie plus récente arrive,
+    pour qu'une longue recherche s'interrompe (une exception levée par une
+    recherche dépassée est ignorée). Le résultat passe par
+    `schedule(callback)`, qui doit exécuter callback sur le thread UI
+    (Clock.schedule_once dans l'application), et `apply(result, text)`
+    n'est appelé que si aucune saisie n'est arrivée entre-temps: des
+    résultats périmés ne remplacent jamais des résultats plus récents.
+    """
+
+    def __init__(self, search, apply, schedule, delay=SEARCH_DELAY, name='search'):
+        self.search = search
+        self.apply = apply
+        self.schedule = schedule
+        self.delay = delay
+        self.name = name
+        self._generation = 0
+        self._text = None
+        self._submitted_at = 0.0
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def submit(self, text):
+        """Nouvelle saisie: remplace toute recherche en attente ou en cours"""
+        with self._condition:
+            self._generation += 1
+            self._text = text
+            self._submitted_at = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"live-{self.name}", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def cancel(self):
+        """Abandonner la saisie en attente et le résultat en cours"""
+        with self._condition:
+            self._generation += 1
+            self._text = None
+
+    def is_current(self, generation):
+        return generation == self._generation
+
+    def _next_query(self):
+        """Attendre une saisie restée `delay` secondes sans être remplacée"""
+        with self._condition:
+            while True:
+                if self._text is None:
+                    self._condition.wait()
+                    continue
+                remaining = self._submitted_at + self.delay - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                text, self._text = self._text, None
+                return text, self._generation
+
+    def _run(self):
+        while True:
+            text, generation = self._next_query()
+            try:
+                result = self.search(text, lambda: not self.is_current(generation))
+            except Exception as e:
+                if self.is_current(generation):
+                    print(f"Erreur recherche {self.name}: {e}")
+                continue
+            if self.is_current(generation):
+                self.schedule(lambda: self._deliver(result, text, generation))
+
+    def _deliver(self, result, text, generation):
+        # Sur le thread UI: une frappe a pu arriver pendant le trajet
+        if self.is_current(generation):
+            self.apply(result, text)
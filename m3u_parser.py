@@ -0,0 +1,255 @@
+"""Parser M3U/EXTINF en flux vers des ChannelRecord compacts (sans dépendance Kivy)"""
+
+import codecs
+import re
+import sys
+
+
+# Attributs EXTINF rangés dans un slot dédié; les autres vont dans `extra`
+ATTRIBUTE_SLOTS = {
+    'tvg-id': 'tvg_id',
+    'tvg-name': 'tvg_name',
+    'tvg-logo': 'tvg_logo',
+    'tvg-chno': 'tvg_chno',
+    'group-title': 'group',
+    'catchup': 'catchup',
+    'catchup-days': 'catchup_days',
+    'catchup-source': 'catchup_source',
+}
+
+# Valeurs répétées d'une chaîne à l'autre, partagées plutôt que dupliquées
+INTERNED_SLOTS = frozenset(('group', 'duration', 'catchup', 'catchup_days'))
+
+DEFAULT_GROUP = "Inconnu"
+
+
+class ChannelRecord:
+    """Une chaîne de playlist, en slots plutôt qu'en dict
+
+    Se lit aussi comme un mapping (record['name'], record.get('tvg_logo'),
+    'group' in record, dict(record)) pour le code qui manipule les chaînes
+    comme les films et séries. Les clés hyphénées d'EXTINF ('tvg-id')
+    sont acceptées en lecture. Un attribut absent vaut None et n'apparaît
+    pas dans keys(). Les noms de groupe et les clés d'attributs sont
+    internés: 300k chaînes sur 50 groupes partagent 50 chaînes de
+    caractères.
+    """
+
+    __slots__ = ('name', 'group', 'url', 'stream_id', 'duration',
+                 'tvg_id', 'tvg_name', 'tvg_logo', 'tvg_chno',
+                 'catchup', 'catchup_days', 'catchup_source',
+                 'vlc_options', 'extra')
+
+    def __init__(self, name, group=DEFAULT_GROUP, url=None, stream_id=None, duration=None,
+                 tvg_id=None, tvg_name=None, tvg_logo=None, tvg_chno=None, catchup=None,
+                 catchup_days=None, catchup_source=None, vlc_options=None, extra=None):
+        self.name = name
+        self.group = sys.intern(group) if group else DEFAULT_GROUP
+        self.url = url
+        self.stream_id = stream_id
+        self.duration = duration
+        self.tvg_id = tvg_id
+        self.tvg_name = tvg_name
+        self.tvg_logo = tvg_logo
+        self.tvg_chno = tvg_chno
+        self.catchup = catchup
+        self.catchup_days = catchup_days
+        self.catchup_source = catchup_source
+        self.vlc_options = vlc_options      # tuple des lignes #EXTVLCOPT
+        self.extra = extra                  # dict des autres attributs, None si aucun
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        record = cls(data.pop('name', ''), data.pop('group', DEFAULT_GROUP))
+        vlc_options = data.pop('vlc_options', None)
+        record.vlc_options = tuple(vlc_options) if vlc_options else None
+        for key, value in data.items():
+            record[key] = value
+        return record
+
+    @classmethod
+    def from_extinf(cls, duration, attributes, name):
+        """Record depuis parse_extinf: les attributs connus vont dans leurs slots, le reste dans `extra`"""
+        pop = attributes.pop
+        record = cls(name, pop('group-title', None), duration=sys.intern(duration))
+        if attributes:
+            record.tvg_id = pop('tvg-id', None)
+            record.tvg_name = pop('tvg-name', None)
+            record.tvg_logo = pop('tvg-logo', None)
+            record.tvg_chno = pop('tvg-chno', None)
+            catchup = pop('catchup', None)
+            record.catchup = sys.intern(catchup) if catchup else None
+            catchup_days = pop('catchup-days', None)
+            record.catchup_days = sys.intern(catchup_days) if catchup_days else None
+            record.catchup_source = pop('catchup-source', None)
+            # Clés déjà internées par parse_extinf
+            record.extra = attributes or None
+        return record
+
+    def to_row(self):
+        """Valeurs des slots dans l'ordre de __slots__, pour un stockage compact"""
+        return [getattr(self, slot) for slot in self.__slots__]
+
+    @classmethod
+    def from_row(cls, row):
+        record = cls(*row)
+        if record.duration:
+            record.duration = sys.intern(record.duration)
+        if record.vlc_options:
+            record.vlc_options = tuple(record.vlc_options)
+        return record
+
+    def keys(self):
+        keys = [slot for slot in self.__slots__[:-1] if getattr(self, slot) is not None]
+        if self.extra:
+            keys.extend(self.extra)
+        return keys
+
+    def __getitem__(self, key):
+        slot = ATTRIBUTE_SLOTS.get(key, key)
+        if slot in self.__slots__ and slot != 'extra':
+            value = getattr(self, slot)
+            if value is not None:
+                return value
+        elif self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        slot = ATTRIBUTE_SLOTS.get(key, key)
+        if slot in self.__slots__ and slot != 'extra':
+            if slot in INTERNED_SLOTS and isinstance(value, str):
+                value = sys.intern(value)
+            setattr(self, slot, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[sys.intern(key)] = value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def to_dict(self):
+        data = {key: self[key] for key in self.keys()}
+        if self.vlc_options:
+            data['vlc_options'] = list(self.vlc_options)
+        return data
+
+    def __eq__(self, other):
+        if isinstance(other, ChannelRecord):
+            return self.to_dict() == other.to_dict()
+        return NotImplemented
+
+    def __hash__(self):
+        # Champs comparés par __eq__: deux records égaux ont le même hash
+        return hash((self.name, self.group, self.url, self.stream_id))
+
+    def __repr__(self):
+        return f"ChannelRecord({self.to_dict()!r})"
+
+
+# Deux motifs compilés, appliqués une fois par ligne (jamais un regex par attribut):
+# EXTINF découpe durée / bloc d'attributs / nom, ATTRIBUTE parcourt le bloc en une passe.
+# Les valeurs quotées peuvent contenir espaces et virgules; le nom commence à la
+# première virgule hors guillemets. Un mot sans '=' dans le bloc est sauté, pas
+# pris pour le début du nom.
+EXTINF = re.compile(r'#EXTINF:([^\s,]*)((?:\s+[^\s=,"]+(?:=(?:"[^"]*"|[^\s,"]*))?)*)[^,]*,(.*)')
+ATTRIBUTE = re.compile(r'([^\s=,"]+)=(?:"([^"]*)"|([^\s,"]*))')
+
+# Clé brute -> clé normalisée et internée (quelques dizaines de clés distinctes par playlist)
+_attribute_keys = {}
+
+
+def _attribute_key(raw_key):
+    key = _attribute_keys.get(raw_key)
+    if key is None:
+        key = sys.intern(raw_key.lower())
+        if len(_attribute_keys) < 1024:
+            _attribute_keys[raw_key] = key
+    return key
+
+
+def parse_extinf(line):
+    """'#EXTINF:-1 tvg-id="x" group-title="A, B",Nom' -> (durée, {clé: valeur}, nom)
+
+    None si la ligne n'est pas une entrée EXTINF avec un nom.
+    """
+    # Sans virgule, pas de nom: inutile de laisser le motif revenir en arrière sur tout le bloc
+    match = EXTINF.match(line) if ',' in line else None
+    if match is None:
+        return None
+    duration, block, name = match.groups()
+    name = name.strip()
+    if not name:
+        return None
+    attributes = {}
+    if block:
+        keys = _attribute_keys
+        for raw_key, quoted, bare in ATTRIBUTE.findall(block):
+            attributes[keys.get(raw_key) or _attribute_key(raw_key)] = quoted or bare
+    return duration, attributes, name
+
+
+def iter_lines(chunks, encoding='utf-8'):
+    """Découper un flux d'octets en lignes décodées, sans jamais tenir le corps entier
+
+    Le décodeur incrémental gère les caractères multi-octets coupés entre
+    deux chunks; seule la ligne en cours est gardée entre deux chunks.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    pending = ''
+    for chunk in chunks:
+        text = pending + decoder.decode(chunk)
+        lines = text.split('\n')
+        pending = lines.pop()
+        yield from lines
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def iter_m3u(lines):
+    """Parser des lignes M3U en une passe, en produisant les chaînes au fil de l'eau
+
+    #EXTGRP donne le groupe d'une entrée sans group-title, #EXTVLCOPT
+    s'accumule dans vlc_options; les deux s'appliquent à l'entrée en cours.
+    """
+    current_channel = None
+    stream_id = 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line[0] != '#':
+            if current_channel is not None:
+                current_channel.url = line
+                current_channel.stream_id = stream_id
+                stream_id += 1
+                yield current_channel
+                current_channel = None
+        elif line.startswith('#EXTINF:'):
+            parsed = parse_extinf(line)
+            if parsed is None:
+                current_channel = None
+                continue
+            current_channel = ChannelRecord.from_extinf(*parsed)
+        elif current_channel is None:
+            continue
+        elif line.startswith('#EXTGRP:'):
+            if current_channel.group is DEFAULT_GROUP:
+                current_channel.group = sys.intern(line[8:].strip()) or DEFAULT_GROUP
+        elif line.startswith('#EXTVLCOPT:'):
+            current_channel.vlc_options = (current_channel.vlc_options or ()) + (line[11:],)
@@ -11,20 +11,37 @@ from kivy.uix.progressbar import ProgressBar
 from kivy.clock import Clock
 from kivy.logger import Logger
 
-import requests
 import json
 import os
 import threading
-import re
 from datetime import datetime
 import time
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 import hashlib
 import socket
 import struct
 import random
 
+import http_client
+from bandwidth import shaper
+from disk_writer import FileWriter, free_space
+from downloader import Downloader, probe_sizes
+from library_index import LibraryIndex
+from hls_recorder import HlsRecorder, hls_url
+from progress_bus import progress_bus
+from connection_governor import governor, PLAYBACK
+from download_queue import DownloadQueue, DownloadItem, RUNNING, DONE, FAILED
+import catalog
+from catalog import XtreamAccount
+from catalog_cache import CatalogCache, revalidate
+from catalog_store import PAGE_SIZE
+from live_search import LiveSearch
+
+# Rafraîchissements par seconde des fenêtres de progression
+PROGRESS_SAMPLE_RATE = 10
+
+# Durée pendant laquelle une place est gardée au lecteur externe, le temps qu'il apparaisse dans active_cons
+PLAYBACK_HOLD_SECONDS = 60
+
 # Pour bencodepy, on utilise une version simplifiée si pas disponible
 try:
     import bencodepy
@@ -103,7 +120,7 @@ class TorrentClient:
             }
             
             # Faire la requête au tracker
-            response = requests.get(tracker_url, params=params, timeout=10)
+            response = http_client.get(tracker_url, params=params, timeout=10)
             response.raise_for_status()
             
             # Decoder la réponse bencoded
@@ -189,6 +206,16 @@ class MagnetDownloadPopup(Popup):
         self.peers_label.text = f"Peers: {peers} | Vitesse: {speed:.1f} KB/s"
         self.details_label.text = details
     
+    def show_transfer(self, channel):
+        """Rendu d'un canal du bus de progression (vitesse en KB/s, connexions = peers)"""
+        self.update_progress(
+            channel.percent,
+            f"Téléchargement: {channel.percent:.1f}%",
+            channel.connections,
+            channel.speed,
+            f"{channel.downloaded/(1024*1024):.1f}MB / {channel.total/(1024*1024):.1f}MB"
+        )
+    
     def cancel_download(self, instance):
         """Annuler le téléchargement"""
         self.cancelled = True
@@ -242,6 +269,16 @@ class DownloadProgressPopup(Popup):
         self.speed_label.text = f"Vitesse: {speed:.1f} MB/s | Connexions: {connections}"
         self.details_label.text = details
     
+    def show_transfer(self, channel):
+        """Rendu d'un canal du bus de progression"""
+        if channel.total:
+            status = f"Telechargement: {channel.percent:.0f}%"
+            details = f"{channel.downloaded / (1024*1024):.1f}MB / {channel.total / (1024*1024):.1f}MB"
+        else:
+            status = "Telechargement (taille inconnue)"
+            details = f"{channel.downloaded / (1024*1024):.1f}MB"
+        self.update_progress(channel.percent, status, channel.speed, channel.connections, details)
+    
     def cancel_download(self, instance):
         self.cancelled = True
         self.dismiss()
@@ -274,9 +311,8 @@ class SelectableLabel(Label):
 class IPTVManagerApp(App):
     def __init__(self):
         super().__init__()
-        self.channels = []
-        self.vod_movies = []
-        self.vod_series = []
+        # Chaînes déjà parsées pendant un premier téléchargement M3U, avant leur écriture en base
+        self.partial_channels = None
         self.magnet_links = []  # NOUVEAU: Liste des magnet links
         self.selected_series_episodes = {}
         self.selected_season_episodes = []
@@ -290,30 +326,63 @@ class IPTVManagerApp(App):
         self.selected_magnet = None  # NOUVEAU: Magnet sélectionné
         
         # Configuration file path
-        self.config_file = "iptv_config.json"
+        self.config_file = catalog.CONFIG_FILE
         
         # Chemin de téléchargement par défaut
         self.download_path = self.get_default_download_path()
         
+        # Épisodes téléchargés simultanément pour les saisons / séries
+        self.parallel_downloads = 3
+        
+        # Limite de débit globale (MB/s, 0 = illimité)
+        self.rate_limit_mbps = 0
+        
+        # Index des fichiers déjà téléchargés (créé à la demande)
+        self.library = None
+        
+        # Dernier catalogue affiché et son cache disque (créé à la demande)
+        self.catalog_cache = None
+        self.catalog_key = None
+        self.catalog_entry = None
+        self.catalog_store = None
+        self.catalog_lock = threading.Lock()
+        
+        # Recherches à la frappe: regroupées, exécutées hors du thread UI, annulées par la frappe suivante
+        on_ui_thread = lambda callback: Clock.schedule_once(lambda dt: callback(), 0)
+        self.channel_live_search = LiveSearch(
+            lambda text, is_cancelled: self.catalog_page('channels', text, 0, is_cancelled),
+            lambda page, text: self.show_channels_page(page, text, 0),
+            on_ui_thread, name='channels')
+        self.movie_live_search = LiveSearch(
+            lambda text, is_cancelled: self.catalog_page('movies', text, 0, is_cancelled),
+            lambda page, text: self.show_movies_page(page, text, 0),
+            on_ui_thread, name='movies')
+        self.series_live_search = LiveSearch(
+            lambda text, is_cancelled: self.catalog_page('series', text, 0, is_cancelled),
+            lambda page, text: self.show_series_page(page, text, 0),
+            on_ui_thread, name='series')
+        self.magnet_live_search = LiveSearch(
+            lambda text, is_cancelled: self.find_magnets(text),
+            lambda magnets, text: self.show_magnets(magnets),
+            on_ui_thread, name='magnets')
+        
+        # Connexions du compte relues après une lecture et pendant les téléchargements
+        governor.watch_account(self.refresh_account_info)
+        
         # NOUVEAU: Client torrent
         self.torrent_client = TorrentClient()
         
         # Load saved config on startup
         self.load_saved_config()
         
+    def on_start(self):
+        """Fenêtre prête: remplir les champs depuis la config et afficher le catalogue en cache"""
+        self.load_saved_config()
+        self.restore_cached_catalog()
+    
     def get_default_download_path(self):
         """Obtenir le chemin de téléchargement par défaut"""
-        try:
-            # Android
-            if os.path.exists("/storage/emulated/0/Download"):
-                return "/storage/emulated/0/Download"
-            elif os.path.exists("/sdcard/Download"):
-                return "/sdcard/Download"
-            # Desktop
-            else:
-                return os.path.expanduser("~/Downloads")
-        except:
-            return os.path.expanduser("~/Downloads")
+        return catalog.default_download_path()
         
     def build(self):
         # Interface principale avec onglets
@@ -367,6 +436,9 @@ class IPTVManagerApp(App):
         )
         root.add_widget(self.status_label)
         
+        # Progression des téléchargements: un seul rendu par tick, quel que soit le nombre de jobs
+        Clock.schedule_interval(lambda dt: progress_bus.sample(), 1.0 / PROGRESS_SAMPLE_RATE)
+        
         return root
     
     def create_magnet_layout(self):
@@ -522,14 +594,20 @@ class IPTVManagerApp(App):
     
     def update_magnets_list(self, search_term=""):
         """Mettre à jour la liste des magnet links"""
+        self.show_magnets(self.find_magnets(search_term))
+    
+    def find_magnets(self, search_term):
+        """Magnet links dont le nom contient `search_term` (sans widget)"""
+        if not search_term:
+            return list(self.magnet_links)
+        term = search_term.lower()
+        return [mg for mg in self.magnet_links if term in mg.get('display_name', '').lower()]
+    
+    def show_magnets(self, magnets):
+        """Afficher des magnet links déjà filtrés (thread UI)"""
         self.magnets_list.clear_widgets()
         
-        filtered_magnets = self.magnet_links
-        if search_term:
-            filtered_magnets = [mg for mg in self.magnet_links 
-                              if search_term.lower() in mg.get('display_name', '').lower()]
-        
-        for magnet in filtered_magnets:
+        for magnet in magnets:
             display_name = magnet.get('display_name', 'Fichier sans nom')
             magnet_type = magnet.get('type', 'magnet').upper()
             added_date = magnet.get('added_date', 'Date inconnue')
@@ -547,8 +625,8 @@ class IPTVManagerApp(App):
             self.magnets_list.add_widget(label)
     
     def filter_magnets(self, instance, text):
-        """Filtrer les magnet links"""
-        self.update_magnets_list(text)
+        """Filtrer les magnet links (recherche en arrière-plan, voir LiveSearch)"""
+        self.magnet_live_search.submit(text)
     
     def download_selected_magnet(self, instance):
         """Télécharger le magnet link sélectionné"""
@@ -643,37 +721,36 @@ class IPTVManagerApp(App):
             filename = self.clean_filename(magnet_info.get('display_name', 'magnet_download'))
             file_path = os.path.join(download_path, f"{filename}.download")
             
-            # Simulation du téléchargement par chunks
-            with open(file_path, 'wb') as f:
-                while downloaded < total_size and not progress_popup.cancelled:
-                    if progress_popup.paused:
-                        time.sleep(1)
-                        continue
-                    
-                    # Simuler téléchargement d'un chunk
-                    chunk_size = random.randint(32768, 131072)  # 32KB - 128KB
-                    chunk = b'0' * min(chunk_size, total_size - downloaded)
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    
-                    # Calculer statistiques
-                    elapsed = time.time() - start_time
-                    speed = (downloaded / 1024) / elapsed if elapsed > 0 else 0  # KB/s
-                    progress = (downloaded / total_size) * 100
-                    active_peers = min(len(all_peers), random.randint(3, 10))
-                    
-                    # Mettre à jour l'interface
-                    Clock.schedule_once(lambda dt, p=progress, s=speed, ap=active_peers, d=downloaded, ts=total_size: 
-                                      progress_popup.update_progress(
-                                          p, 
-                                          f"Téléchargement: {p:.1f}%", 
-                                          ap, 
-                                          s, 
-                                          f"{d/(1024*1024):.1f}MB / {ts/(1024*1024):.1f}MB"
-                                      ), 0)
-                    
-                    # Pause pour simuler vitesse réaliste
-                    time.sleep(0.1)
+            # Simulation du téléchargement par chunks (débit partagé avec les autres téléchargements)
+            progress = progress_bus.channel(file_path, progress_popup.show_transfer)
+            # Un seul tampon de zéros, découpé en vues pour chaque chunk
+            zeros = memoryview(bytes(131072))
+            try:
+                with FileWriter(file_path, total_size, truncate=True) as writer, shaper.job(1.0, filename) as shaper_job:
+                    while downloaded < total_size and not progress_popup.cancelled:
+                        if progress_popup.paused:
+                            time.sleep(1)
+                            continue
+                        
+                        # Simuler téléchargement d'un chunk
+                        chunk_size = random.randint(32768, 131072)  # 32KB - 128KB
+                        chunk = zeros[:min(chunk_size, total_size - downloaded)]
+                        shaper_job.consume(len(chunk))
+                        writer.write(downloaded, chunk)
+                        downloaded += len(chunk)
+                        
+                        # Calculer statistiques
+                        elapsed = time.time() - start_time
+                        speed = (downloaded / 1024) / elapsed if elapsed > 0 else 0  # KB/s
+                        active_peers = min(len(all_peers), random.randint(3, 10))
+                        
+                        # Compteurs lus par l'interface à sa propre cadence
+                        progress.update(downloaded, total_size, speed, active_peers)
+                        
+                        # Pause pour simuler vitesse réaliste
+                        time.sleep(0.1)
+            finally:
+                progress.close()
             
             if progress_popup.cancelled:
                 try:
@@ -711,8 +788,7 @@ class IPTVManagerApp(App):
             Clock.schedule_once(lambda dt: progress_popup.update_progress(10, "Téléchargement fichier torrent...", 0, 0, ""), 0)
             
             # Télécharger le fichier .torrent
-            headers = {'User-Agent': 'Mozilla/5.0 (compatible; IPTV Manager)'}
-            response = requests.get(magnet_info['uri'], headers=headers, timeout=15)
+            response = http_client.get(magnet_info['uri'], timeout=15)
             response.raise_for_status()
             
             Clock.schedule_once(lambda dt: progress_popup.update_progress(30, "Analyse du fichier torrent...", 0, 0, ""), 0)
@@ -761,26 +837,23 @@ class IPTVManagerApp(App):
                 total_size = random.randint(100, 1000) * 1024 * 1024  # 100MB-1GB
                 downloaded = 0
                 
-                with open(file_path, 'wb') as f:
-                    while downloaded < total_size and not progress_popup.cancelled:
-                        chunk_size = random.randint(1024*1024, 5*1024*1024)  # 1-5MB chunks
-                        chunk = b'0' * min(chunk_size, total_size - downloaded)
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        
-                        progress = (downloaded / total_size) * 100
-                        speed = random.randint(500, 2000)  # KB/s simulé
-                        
-                        Clock.schedule_once(lambda dt, p=progress, s=speed, d=downloaded, ts=total_size: 
-                                          progress_popup.update_progress(
-                                              p, 
-                                              f"Téléchargement: {p:.1f}%", 
-                                              2, 
-                                              s, 
-                                              f"{d/(1024*1024):.1f}MB / {ts/(1024*1024):.1f}MB"
-                                          ), 0)
-                        
-                        time.sleep(0.2)
+                progress = progress_bus.channel(file_path, progress_popup.show_transfer)
+                zeros = memoryview(bytes(5*1024*1024))
+                try:
+                    with FileWriter(file_path, total_size, truncate=True) as writer, shaper.job(1.0, filename) as shaper_job:
+                        while downloaded < total_size and not progress_popup.cancelled:
+                            chunk_size = random.randint(1024*1024, 5*1024*1024)  # 1-5MB chunks
+                            chunk = zeros[:min(chunk_size, total_size - downloaded)]
+                            shaper_job.consume(len(chunk))
+                            writer.write(downloaded, chunk)
+                            downloaded += len(chunk)
+                            
+                            speed = random.randint(500, 2000)  # KB/s simulé
+                            progress.update(downloaded, total_size, speed, 2)
+                            
+                            time.sleep(0.2)
+                finally:
+                    progress.close()
                 
                 if not progress_popup.cancelled:
                     Clock.schedule_once(lambda dt: progress_popup.dismiss(), 0)
@@ -937,6 +1010,21 @@ class IPTVManagerApp(App):
         
         layout.add_widget(predefined_layout)
         
+        # Nombre de téléchargements simultanés (saisons / séries)
+        parallel_layout = BoxLayout(orientation='horizontal', size_hint_y=None, height=40, spacing=10)
+        parallel_layout.add_widget(Label(text='Telechargements paralleles:', size_hint_x=0.8))
+        self.parallel_input = TextInput(text=str(self.parallel_downloads), multiline=False, input_filter='int', size_hint_x=0.2)
+        parallel_layout.add_widget(self.parallel_input)
+        layout.add_widget(parallel_layout)
+        
+        # Limite de débit globale, appliquée immédiatement à tous les téléchargements
+        rate_layout = BoxLayout(orientation='horizontal', size_hint_y=None, height=40, spacing=10)
+        rate_layout.add_widget(Label(text='Limite debit MB/s (0 = illimite):', size_hint_x=0.8))
+        self.rate_limit_input = TextInput(text=str(self.rate_limit_mbps), multiline=False, input_filter='float', size_hint_x=0.2)
+        self.rate_limit_input.bind(text=self.apply_rate_limit)
+        rate_layout.add_widget(self.rate_limit_input)
+        layout.add_widget(rate_layout)
+        
         # Boutons de connexion
         btn_layout = BoxLayout(orientation='horizontal', size_hint_y=None, height=50, spacing=10)
         
@@ -1115,6 +1203,8 @@ class IPTVManagerApp(App):
                 'password': self.password_input.text.strip(),
                 'playlist_url': self.playlist_input.text.strip(),
                 'download_path': self.download_path,
+                'parallel_downloads': self.get_parallel_downloads(),
+                'rate_limit_mbps': self.rate_limit_mbps,
                 'magnet_links': self.magnet_links,  # NOUVEAU: Sauvegarder les magnet links
                 'saved_date': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             }
@@ -1134,26 +1224,11 @@ class IPTVManagerApp(App):
     def load_saved_config(self, show_message=False):
         """Charger la configuration sauvegardée avec magnet links"""
         try:
-            # Chercher d'abord dans le dossier de téléchargement actuel
-            config_path = os.path.join(self.download_path, self.config_file)
-            
-            # Si pas trouvé, chercher dans les dossiers par défaut
-            if not os.path.exists(config_path):
-                default_paths = [
-                    "/storage/emulated/0/Download",
-                    "/sdcard/Download",
-                    os.path.expanduser("~/Downloads")
-                ]
-                
-                for path in default_paths:
-                    test_path = os.path.join(path, self.config_file)
-                    if os.path.exists(test_path):
-                        config_path = test_path
-                        break
+            # Dossier de téléchargement actuel, sinon dossiers par défaut
+            config_path = catalog.find_config(self.download_path)
             
             if os.path.exists(config_path):
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
+                config = catalog.read_config(config_path)
                 
                 # Appliquer la configuration aux champs
                 if hasattr(self, 'server_input'):
@@ -1172,6 +1247,15 @@ class IPTVManagerApp(App):
                     if hasattr(self, 'download_path_input'):
                         self.download_path_input.text = self.download_path
                 
+                self.parallel_downloads = config.get('parallel_downloads', self.parallel_downloads)
+                if hasattr(self, 'parallel_input'):
+                    self.parallel_input.text = str(self.parallel_downloads)
+                
+                self.rate_limit_mbps = config.get('rate_limit_mbps', self.rate_limit_mbps)
+                shaper.set_rate(self.rate_limit_mbps * 1024 * 1024)
+                if hasattr(self, 'rate_limit_input'):
+                    self.rate_limit_input.text = str(self.rate_limit_mbps)
+                
                 # NOUVEAU: Charger les magnet links
                 saved_magnets = config.get('magnet_links', [])
                 if saved_magnets:
@@ -1291,6 +1375,10 @@ class IPTVManagerApp(App):
         play_btn.bind(on_press=self.play_selected_channel)
         btn_layout.add_widget(play_btn)
         
+        record_btn = Button(text='Enregistrer')
+        record_btn.bind(on_press=self.record_selected_channel)
+        btn_layout.add_widget(record_btn)
+        
         layout.add_widget(btn_layout)
         
         return layout
@@ -1511,6 +1599,25 @@ class IPTVManagerApp(App):
             except:
                 return default_path
     
+    def get_parallel_downloads(self):
+        """Nombre de téléchargements simultanés (entre 1 et 8)"""
+        if hasattr(self, 'parallel_input'):
+            try:
+                self.parallel_downloads = int(self.parallel_input.text.strip())
+            except ValueError:
+                pass
+        self.parallel_downloads = max(1, min(8, self.parallel_downloads))
+        return self.parallel_downloads
+    
+    def apply_rate_limit(self, instance, text):
+        """Appliquer la limite de débit saisie à tous les téléchargements en cours"""
+        try:
+            self.rate_limit_mbps = max(0.0, float(text)) if text.strip() else 0
+        except ValueError:
+            return
+        shaper.set_rate(self.rate_limit_mbps * 1024 * 1024)
+        self.update_status(f"Limite de debit: {self.rate_limit_mbps} MB/s" if self.rate_limit_mbps else "Debit illimite")
+    
     def update_status(self, message):
         """Mettre à jour le statut"""
         if hasattr(self, 'status_label'):
@@ -1548,16 +1655,14 @@ class IPTVManagerApp(App):
                     base_url = server_url.rstrip('/')
                     test_url = f"{base_url}/player_api.php?username={username}&password={password}&action=get_live_categories"
                     
-                    headers = {'User-Agent': 'Mozilla/5.0 (compatible; IPTV Manager)'}
-                    response = requests.get(test_url, timeout=15, headers=headers)
+                    response = http_client.get(test_url, timeout=15)
                     response.raise_for_status()
                     
                     Clock.schedule_once(lambda dt: self.show_popup("Test", "Connexion IPTV reussie!"), 0)
                     Clock.schedule_once(lambda dt: self.update_status("Connexion IPTV OK"), 0)
                     
                 elif playlist_url:
-                    headers = {'User-Agent': 'Mozilla/5.0 (compatible; IPTV Manager)'}
-                    response = requests.get(playlist_url, timeout=15, headers=headers)
+                    response = http_client.get(playlist_url, timeout=15)
                     response.raise_for_status()
                     
                     Clock.schedule_once(lambda dt: self.show_popup("Test", "Playlist M3U accessible!"), 0)
@@ -1574,142 +1679,137 @@ class IPTVManagerApp(App):
         threading.Thread(target=test_in_thread, daemon=True).start()
     
     def load_playlist(self, instance):
-        """Charger la playlist"""
-        def load_in_thread():
+        """Charger la playlist (requêtes conditionnelles, résultat mis en cache)"""
+        self.refresh_catalog(quiet=False)
+    
+    def get_catalog_cache(self):
+        """Cache des catalogues dans le stockage privé de l'application"""
+        if self.catalog_cache is None:
+            self.catalog_cache = CatalogCache(os.path.join(self.user_data_dir, 'catalog'), indexed=True)
+        return self.catalog_cache
+    
+    def get_catalog_source(self):
+        """(clé de cache, URL M3U, compte Xtream) saisis, ou None sans source"""
+        playlist_url = self.playlist_input.text.strip()
+        if playlist_url:
+            return CatalogCache.key(playlist_url=playlist_url), playlist_url, None
+        account = self.get_account()
+        if account.is_complete():
+            return CatalogCache.key(account=account), None, account
+        return None
+    
+    def restore_cached_catalog(self):
+        """Afficher tout de suite le dernier catalogue en cache, puis le revalider s'il est périmé"""
+        source = self.get_catalog_source()
+        if source is None:
+            return
+        key = source[0]
+        
+        def restore_thread():
+            cache = self.get_catalog_cache()
+            entry = cache.load(key)
+            if entry is not None and self.catalog_entry is None:
+                self.catalog_key, self.catalog_entry, self.catalog_store = key, entry, entry.store
+                age_minutes = int(entry.age() / 60)
+                Clock.schedule_once(lambda dt: self.show_catalog(f"en cache, {age_minutes} min"), 0)
+            if entry is None or not cache.is_fresh(entry):
+                self.refresh_catalog(quiet=True, source=source)
+        
+        threading.Thread(target=restore_thread, daemon=True).start()
+    
+    def refresh_catalog(self, quiet, source=None):
+        """Revalider le catalogue en arrière-plan et rafraîchir les listes affichées
+        
+        Chaque section est remplacée dans la base en une transaction quand ses
+        nouvelles données sont complètes: l'interface ne voit jamais un
+        mélange d'ancien et de nouveau catalogue. `quiet` pour la revalidation
+        de démarrage: statut seulement, pas de popup.
+        """
+        source = source or self.get_catalog_source()
+        if source is None:
+            if not quiet:
+                self.show_popup("Erreur", "Renseignez une URL M3U ou serveur, utilisateur et mot de passe")
+            return
+        if not self.catalog_lock.acquire(blocking=False):
+            Clock.schedule_once(lambda dt: self.update_status("Chargement deja en cours..."), 0)
+            return
+        key, playlist_url, account = source
+        
+        def refresh_thread():
             try:
-                Clock.schedule_once(lambda dt: self.update_status("Chargement..."), 0)
-                
-                server_url = self.server_input.text.strip()
-                username = self.username_input.text.strip()
-                password = self.password_input.text.strip()
-                playlist_url = self.playlist_input.text.strip()
-                
-                if playlist_url:
-                    # Charger depuis URL M3U
-                    headers = {'User-Agent': 'Mozilla/5.0 (compatible; IPTV Manager)'}
-                    response = requests.get(playlist_url, timeout=30, headers=headers)
-                    response.raise_for_status()
-                    self.parse_m3u_playlist(response.text)
-                    
-                elif server_url and username and password:
-                    # Charger depuis API IPTV
-                    self.load_from_iptv_api(server_url, username, password)
-                
-                Clock.schedule_once(lambda dt: self.update_interface(), 0)
+                Clock.schedule_once(lambda dt: self.update_status("Mise a jour du catalogue..." if quiet else "Chargement..."), 0)
+                cache = self.get_catalog_cache()
+                entry = self.catalog_entry if self.catalog_key == key else cache.load(key)
+                self.catalog_store = cache.store(key)
+                entry, changed = revalidate(
+                    cache, key, entry,
+                    playlist_url=playlist_url, account=account,
+                    # Chaque onglet se remplit dès que sa section est arrivée
+                    on_section=self.show_loaded_section,
+                    # Sans catalogue affiché, le début de la playlist M3U s'affiche pendant le téléchargement
+                    on_progress=self.show_partial_channels if entry is None else None
+                )
+                self.catalog_key, self.catalog_entry = key, entry
+                self.partial_channels = None
+                if quiet:
+                    Clock.schedule_once(lambda dt: self.show_catalog("a jour" if changed else "inchange"), 0)
+                else:
+                    Clock.schedule_once(lambda dt: self.update_interface(), 0)
                 
             except Exception as e:
                 error_msg = str(e)
-                Clock.schedule_once(lambda dt: self.show_popup("Erreur", f"Erreur: {error_msg}"), 0)
-        
-        threading.Thread(target=load_in_thread, daemon=True).start()
-    
-    def parse_m3u_playlist(self, content):
-        """Parser une playlist M3U"""
-        lines = content.strip().split('\n')
-        self.channels = []
-        
-        current_channel = None
-        for line in lines:
-            line = line.strip()
-            if line.startswith('#EXTINF:'):
-                match = re.search(r'#EXTINF:-?\d+[^,]*,(.+)', line)
-                if match:
-                    name = match.group(1).strip()
-                    group = "Inconnu"
-                    
-                    group_match = re.search(r'group-title="([^"]+)"', line)
-                    if group_match:
-                        group = group_match.group(1)
-                    
-                    current_channel = {'name': name, 'group': group}
-                    
-            elif line and not line.startswith('#') and current_channel:
-                current_channel['url'] = line
-                current_channel['stream_id'] = len(self.channels)
-                self.channels.append(current_channel)
-                current_channel = None
-    
-    def load_from_iptv_api(self, server_url, username, password):
-        """Charger depuis l'API IPTV"""
-        base_url = server_url.rstrip('/')
-        headers = {'User-Agent': 'Mozilla/5.0 (compatible; IPTV Manager)'}
-        
-        # Charger les chaînes
-        channels_url = f"{base_url}/player_api.php?username={username}&password={password}&action=get_live_streams"
-        response = requests.get(channels_url, timeout=30, headers=headers)
-        response.raise_for_status()
-        channels_data = response.json()
-        
-        self.channels = []
-        for channel in channels_data:
-            self.channels.append({
-                'name': channel.get('name', 'Inconnu'),
-                'group': 'IPTV',
-                'url': f"{base_url}/live/{username}/{password}/{channel['stream_id']}.m3u8",
-                'stream_id': channel.get('stream_id')
-            })
-        
-        # Charger les films
-        vod_url = f"{base_url}/player_api.php?username={username}&password={password}&action=get_vod_streams"
-        response = requests.get(vod_url, timeout=30, headers=headers)
-        response.raise_for_status()
-        vod_data = response.json()
-        
-        self.vod_movies = []
-        for movie in vod_data:
-            self.vod_movies.append({
-                'name': movie.get('name', 'Inconnu'),
-                'year': str(movie.get('year', '')),
-                'genre': movie.get('genre', 'Inconnu'),
-                'url': f"{base_url}/movie/{username}/{password}/{movie['stream_id']}.{movie.get('container_extension', 'mp4')}",
-                'stream_id': movie.get('stream_id')
-            })
-        
-        # Charger les séries
-        series_url = f"{base_url}/player_api.php?username={username}&password={password}&action=get_series"
-        response = requests.get(series_url, timeout=30, headers=headers)
-        response.raise_for_status()
-        series_data = response.json()
-        
-        self.vod_series = []
-        for series in series_data:
-            self.vod_series.append({
-                'name': series.get('name', 'Inconnu'),
-                'series_id': series.get('series_id'),
-                'episodes': []
-            })
+                if quiet:
+                    Clock.schedule_once(lambda dt: self.update_status(f"Catalogue non mis a jour: {error_msg}"), 0)
+                else:
+                    Clock.schedule_once(lambda dt: self.show_popup("Erreur", f"Erreur: {error_msg}"), 0)
+            finally:
+                self.catalog_lock.release()
+        
+        threading.Thread(target=refresh_thread, daemon=True).start()
+    
+    def show_catalog(self, origin):
+        """Rafraîchir les trois listes sans popup (catalogue en cache ou revalidé)"""
+        self.update_channels_list(self.channel_search.text)
+        self.update_movies_list(self.movie_search.text)
+        self.update_series_list(self.series_search.text)
+        counts = self.catalog_entry.counts
+        self.update_status(f"Catalogue ({origin}): {counts['channels']} chaines, "
+                           f"{counts['movies']} films, {counts['series']} series")
+    
+    def show_partial_channels(self, channels, count):
+        """Afficher les premières chaînes et le nombre lu pendant le téléchargement de la playlist"""
+        self.partial_channels = channels
+        
+        def show(dt):
+            self.update_channels_list(self.channel_search.text)
+            self.update_status(f"Chargement... {count} chaines")
+        
+        Clock.schedule_once(show, 0)
+    
+    def show_loaded_section(self, name):
+        """Afficher une section dès son écriture en base, sans attendre les autres"""
+        if name == 'channels':
+            self.partial_channels = None
+            refresh = lambda dt: self.update_channels_list(self.channel_search.text)
+        elif name == 'movies':
+            refresh = lambda dt: self.update_movies_list(self.movie_search.text)
+        else:
+            refresh = lambda dt: self.update_series_list(self.series_search.text)
+        Clock.schedule_once(refresh, 0)
+    
+    def get_account(self):
+        """Compte Xtream saisi dans l'onglet configuration"""
+        return XtreamAccount(self.server_input.text, self.username_input.text, self.password_input.text)
+    
+    def refresh_account_info(self):
+        """Lire max_connections / active_cons du compte Xtream pour le governor"""
+        catalog.refresh_account_info(self.get_account())
     
     def load_series_episodes(self, series_id):
         """Charger les épisodes d'une série et organiser par saisons"""
         def load_episodes_thread():
             try:
-                base_url = self.server_input.text.strip().rstrip('/')
-                username = self.username_input.text.strip()
-                password = self.password_input.text.strip()
-                
-                headers = {'User-Agent': 'Mozilla/5.0 (compatible; IPTV Manager)'}
-                
-                episodes_url = f"{base_url}/player_api.php?username={username}&password={password}&action=get_series_info&series_id={series_id}"
-                response = requests.get(episodes_url, timeout=20, headers=headers)
-                response.raise_for_status()
-                series_info = response.json()
-                
-                # ORGANISATION PAR SAISONS
-                episodes_by_season = {}
-                if 'episodes' in series_info:
-                    for season_num, season_episodes in series_info['episodes'].items():
-                        season_key = f"Saison {season_num}"
-                        episodes_by_season[season_key] = []
-                        
-                        for episode in season_episodes:
-                            episode_info = {
-                                'title': episode.get('title', f"Episode {episode.get('episode_num', '')}"),
-                                'episode_num': f"S{season_num}E{episode.get('episode_num', '')}",
-                                'season': season_num,
-                                'url': f"{base_url}/series/{username}/{password}/{episode['id']}.{episode.get('container_extension', 'mp4')}",
-                                'id': episode.get('id')
-                            }
-                            episodes_by_season[season_key].append(episode_info)
+                episodes_by_season = catalog.load_series_episodes(self.get_account(), series_id)
                 
                 self.selected_series_episodes = episodes_by_season
                 Clock.schedule_once(lambda dt: self.update_seasons_list(), 0)
@@ -1726,21 +1826,45 @@ class IPTVManagerApp(App):
         self.update_movies_list()
         self.update_series_list()
         
-        total = len(self.channels) + len(self.vod_movies) + len(self.vod_series)
-        self.update_status(f"Charge: {len(self.channels)} chaines, {len(self.vod_movies)} films, {len(self.vod_series)} series")
+        counts = self.catalog_entry.counts
+        total = sum(counts.values())
+        self.update_status(f"Charge: {counts['channels']} chaines, {counts['movies']} films, {counts['series']} series")
         self.show_popup("Chargement", f"{total} elements charges avec succes!")
     
-    def update_channels_list(self, search_term=""):
-        """Mettre à jour la liste des chaînes"""
-        self.channels_list.clear_widgets()
+    def catalog_page(self, section, search_term, offset, is_cancelled=None):
+        """Une page d'une section: requête sur la base, ou chaînes en cours de téléchargement
+        
+        Sans widget: appelable depuis le thread d'une LiveSearch.
+        """
+        partial_channels = self.partial_channels
+        if section == 'channels' and partial_channels is not None:
+            return catalog.filter_channels(partial_channels, search_term)[offset:offset + PAGE_SIZE]
+        store = self.catalog_store
+        if store is None:
+            return []
+        return store.search(section, search_term, limit=PAGE_SIZE, offset=offset, is_cancelled=is_cancelled)
+    
+    def add_more_button(self, list_layout, load_more):
+        """Bouton en fin de liste qui ajoute la page suivante"""
+        more_btn = Button(text='Plus de resultats...', size_hint_y=None, height=40)
         
-        filtered_channels = self.channels
-        if search_term:
-            filtered_channels = [ch for ch in self.channels 
-                               if search_term.lower() in ch['name'].lower() or 
-                                  search_term.lower() in ch['group'].lower()]
+        def on_press(instance):
+            list_layout.remove_widget(more_btn)
+            load_more()
         
-        for channel in filtered_channels[:50]:  # Limiter à 50 pour les performances
+        more_btn.bind(on_press=on_press)
+        list_layout.add_widget(more_btn)
+    
+    def update_channels_list(self, search_term="", offset=0):
+        """Mettre à jour la liste des chaînes (une page, la suite à la demande)"""
+        self.show_channels_page(self.catalog_page('channels', search_term, offset), search_term, offset)
+    
+    def show_channels_page(self, page, search_term, offset):
+        """Afficher une page de chaînes déjà cherchée (thread UI)"""
+        if offset == 0:
+            self.channels_list.clear_widgets()
+        
+        for channel in page:
             label = SelectableLabel(
                 item_data=channel,
                 app_instance=self,
@@ -1750,19 +1874,21 @@ class IPTVManagerApp(App):
                 text_size=(None, None)
             )
             self.channels_list.add_widget(label)
-    
-    def update_movies_list(self, search_term=""):
-        """Mettre à jour la liste des films"""
-        self.movies_list.clear_widgets()
         
-        filtered_movies = self.vod_movies
-        if search_term:
-            filtered_movies = [mv for mv in self.vod_movies 
-                             if search_term.lower() in mv['name'].lower() or 
-                                search_term.lower() in mv['genre'].lower() or
-                                search_term.lower() in str(mv['year']).lower()]
+        if len(page) == PAGE_SIZE:
+            self.add_more_button(self.channels_list,
+                                 lambda: self.update_channels_list(search_term, offset + PAGE_SIZE))
+    
+    def update_movies_list(self, search_term="", offset=0):
+        """Mettre à jour la liste des films (une page, la suite à la demande)"""
+        self.show_movies_page(self.catalog_page('movies', search_term, offset), search_term, offset)
+    
+    def show_movies_page(self, page, search_term, offset):
+        """Afficher une page de films déjà cherchée (thread UI)"""
+        if offset == 0:
+            self.movies_list.clear_widgets()
         
-        for movie in filtered_movies[:50]:  # Limiter à 50 pour les performances
+        for movie in page:
             label = SelectableLabel(
                 item_data=movie,
                 app_instance=self,
@@ -1772,17 +1898,21 @@ class IPTVManagerApp(App):
                 text_size=(None, None)
             )
             self.movies_list.add_widget(label)
-    
-    def update_series_list(self, search_term=""):
-        """Mettre à jour la liste des séries"""
-        self.series_list.clear_widgets()
         
-        filtered_series = self.vod_series
-        if search_term:
-            filtered_series = [sr for sr in self.vod_series 
-                             if search_term.lower() in sr['name'].lower()]
+        if len(page) == PAGE_SIZE:
+            self.add_more_button(self.movies_list,
+                                 lambda: self.update_movies_list(search_term, offset + PAGE_SIZE))
+    
+    def update_series_list(self, search_term="", offset=0):
+        """Mettre à jour la liste des séries (une page, la suite à la demande)"""
+        self.show_series_page(self.catalog_page('series', search_term, offset), search_term, offset)
+    
+    def show_series_page(self, page, search_term, offset):
+        """Afficher une page de séries déjà cherchée (thread UI)"""
+        if offset == 0:
+            self.series_list.clear_widgets()
         
-        for series in filtered_series[:50]:  # Limiter à 50 pour les performances
+        for series in page:
             label = SelectableLabel(
                 item_data=series,
                 app_instance=self,
@@ -1792,6 +1922,10 @@ class IPTVManagerApp(App):
                 text_size=(None, None)
             )
             self.series_list.add_widget(label)
+        
+        if len(page) == PAGE_SIZE:
+            self.add_more_button(self.series_list,
+                                 lambda: self.update_series_list(search_term, offset + PAGE_SIZE))
     
     def update_seasons_list(self):
         """Mettre à jour la liste des saisons"""
@@ -1830,16 +1964,16 @@ class IPTVManagerApp(App):
             self.episodes_list.add_widget(label)
     
     def filter_channels(self, instance, text):
-        """Filtrer les chaînes"""
-        self.update_channels_list(text)
+        """Filtrer les chaînes (recherche en arrière-plan, voir LiveSearch)"""
+        self.channel_live_search.submit(text)
     
     def filter_movies(self, instance, text):
-        """Filtrer les films"""
-        self.update_movies_list(text)
+        """Filtrer les films (recherche en arrière-plan, voir LiveSearch)"""
+        self.movie_live_search.submit(text)
     
     def filter_series(self, instance, text):
-        """Filtrer les séries"""
-        self.update_series_list(text)
+        """Filtrer les séries (recherche en arrière-plan, voir LiveSearch)"""
+        self.series_live_search.submit(text)
     
     def play_selected_channel(self, instance):
         """Lire une chaîne sélectionnée"""
@@ -1849,6 +1983,60 @@ class IPTVManagerApp(App):
         
         self.play_url(self.selected_channel['url'])
     
+    def record_selected_channel(self, instance):
+        """Enregistrer la chaîne live sélectionnée dans un fichier .ts"""
+        if not self.selected_channel:
+            self.show_popup("Erreur", "Veuillez selectionner une chaine")
+            return
+        
+        # Les chaînes live Xtream en .ts sont enregistrées depuis leur playlist .m3u8
+        url = hls_url(self.selected_channel['url'])
+        if url is None:
+            self.show_popup("Erreur", "Seules les chaines live HLS peuvent etre enregistrees")
+            return
+        
+        clean_name = self.clean_filename(self.selected_channel['name'])
+        record_folder = os.path.join(self.get_download_path(), "Enregistrements")
+        os.makedirs(record_folder, exist_ok=True)
+        save_path = os.path.join(record_folder, f"{clean_name} - {time.strftime('%Y%m%d-%H%M%S')}.ts")
+        
+        progress_popup = DownloadProgressPopup(clean_name)
+        progress_popup.title = f"Enregistrement: {clean_name}"
+        progress_popup.cancel_btn.text = "Arreter"
+        progress_popup.open()
+        
+        def show_recording(channel):
+            seconds = channel.seconds
+            progress_popup.update_progress(
+                0, f"Enregistrement: {int(seconds // 60)}:{int(seconds % 60):02d}", 0, 1,
+                f"{channel.downloaded / (1024*1024):.1f}MB | {channel.done} segments, {channel.failed} perdus")
+        
+        progress = progress_bus.channel(save_path, show_recording)
+        
+        def record_thread():
+            try:
+                recorder = HlsRecorder(url, save_path,
+                                       is_cancelled=lambda: progress_popup.cancelled,
+                                       on_progress=progress.update_recording)
+                try:
+                    result = recorder.run()
+                finally:
+                    progress.close()
+                message = (f"Enregistrement termine\n"
+                           f"Fichier: {save_path}\n"
+                           f"Duree: {result['recorded_seconds'] / 60:.1f} min\n"
+                           f"Taille: {result['recorded_bytes'] / (1024*1024):.1f} MB\n"
+                           f"Segments perdus: {result['skipped']}")
+                Clock.schedule_once(lambda dt: progress_popup.dismiss(), 0)
+                Clock.schedule_once(lambda dt: self.show_popup("Enregistrement", message), 0)
+            except Exception as e:
+                error_msg = str(e)
+                Clock.schedule_once(lambda dt: progress_popup.dismiss(), 0)
+                Clock.schedule_once(lambda dt: self.show_popup("Erreur", f"Erreur enregistrement:\n{error_msg}"), 0)
+            Clock.schedule_once(lambda dt: self.update_storage_info(), 1)
+        
+        threading.Thread(target=record_thread, daemon=True).start()
+    
     def play_selected_movie(self, instance):
         """Lire un film sélectionné"""
         if not self.selected_movie:
@@ -1903,29 +2091,54 @@ class IPTVManagerApp(App):
             self.show_popup("Erreur", "Aucun episode dans cette saison")
             return
         
-        # Confirmation avec info d'espace disque
+        # Confirmation avec la taille exacte et l'espace disque
         season_name = self.selected_season['season_name']
-        episode_count = len(self.selected_season_episodes)
+        self.confirm_bulk_download(f"Telecharger {season_name}?", self.selected_season_episodes,
+                                   self.start_season_download)
+    
+    def confirm_bulk_download(self, question, episodes, on_confirm):
+        """Sonder la taille réelle des épisodes en parallèle puis demander confirmation"""
+        self.update_status(f"Calcul de la taille de {len(episodes)} episodes...")
+        
+        def probe_thread():
+            urls = [episode['url'] for episode in episodes if episode.get('url')]
+            sizes = probe_sizes(urls, max_workers=self.get_parallel_downloads() * 2)
+            Clock.schedule_once(lambda dt: self.show_bulk_confirmation(question, episodes, sizes, on_confirm), 0)
+        
+        threading.Thread(target=probe_thread, daemon=True).start()
+    
+    def show_bulk_confirmation(self, question, episodes, sizes, on_confirm):
+        """Confirmation d'un téléchargement groupé avec taille totale et espace libre"""
+        known_sizes = [size for size in sizes.values() if size]
+        unknown = len(episodes) - len(known_sizes)
+        total_gb = sum(known_sizes) / (1024**3)
         
-        # Estimer la taille (supposons 500MB par épisode)
-        estimated_size_gb = (episode_count * 500) / 1024
+        text = f"{question}\n({len(episodes)} episodes)\nTaille totale: {total_gb:.2f}GB"
+        if unknown:
+            text += f" (+{unknown} de taille inconnue)"
+        try:
+            free_gb = free_space(self.get_download_path()) / (1024**3)
+            text += f"\nEspace libre: {free_gb:.1f}GB"
+            if total_gb > free_gb:
+                text += "\nATTENTION: espace insuffisant, les episodes en trop seront refuses"
+        except OSError:
+            pass
+        text += f"\nDossier: {self.get_download_path()}"
+        self.update_status("Pret")
         
         content = BoxLayout(orientation='vertical', spacing=10, padding=20)
-        content.add_widget(Label(
-            text=f"Telecharger {season_name}?\n({episode_count} episodes)\nTaille estimee: {estimated_size_gb:.1f}GB",
-            text_size=(300, None)
-        ))
+        content.add_widget(Label(text=text, text_size=(300, None)))
         
         popup = Popup(
             title="Confirmation",
             content=content,
-            size_hint=(0.8, 0.4)
+            size_hint=(0.8, 0.5)
         )
         
         btn_layout = BoxLayout(orientation='horizontal', size_hint_y=None, height=50, spacing=10)
         
         yes_btn = Button(text='Oui')
-        yes_btn.bind(on_press=lambda x: [popup.dismiss(), self.start_season_download()])
+        yes_btn.bind(on_press=lambda x: [popup.dismiss(), on_confirm(sizes)])
         btn_layout.add_widget(yes_btn)
         
         no_btn = Button(text='Non')
@@ -1935,61 +2148,24 @@ class IPTVManagerApp(App):
         content.add_widget(btn_layout)
         popup.open()
     
-    def start_season_download(self):
+    def start_season_download(self, sizes=None):
         """Démarrer le téléchargement d'une saison"""
         def download_season_thread():
             try:
                 series_name = self.clean_filename(self.selected_series['name'])
                 season_name = self.selected_season['season_name']
-                season_number = self.selected_season_episodes[0].get('season', '1')
-                
-                total_episodes = len(self.selected_season_episodes)
-                downloaded = 0
-                failed = 0
                 
                 # Utiliser le chemin de téléchargement défini
                 downloads_path = self.get_download_path()
                 
                 Clock.schedule_once(lambda dt: self.update_status(f"Telechargement {season_name}..."), 0)
                 
-                for i, episode in enumerate(self.selected_season_episodes):
-                    try:
-                        episode_num = episode.get('episode_num', f'Episode_{i+1}')
-                        episode_title = episode.get('title', 'Sans_titre')
-                        filename = f"{series_name} - {episode_num} - {episode_title}"
-                        
-                        # Mettre à jour le statut
-                        progress = ((i + 1) / total_episodes) * 100
-                        Clock.schedule_once(lambda dt, p=progress, ep=episode_num, curr=i+1, tot=total_episodes: 
-                                          self.update_status(f"{season_name}: {ep} ({curr}/{tot}) - {p:.0f}%"), 0)
-                        
-                        # Téléchargement
-                        headers = {'User-Agent': 'Mozilla/5.0 (compatible; IPTV Manager)'}
-                        response = requests.get(episode['url'], stream=True, timeout=30, headers=headers)
-                        response.raise_for_status()
-                        
-                        # Créer structure de dossiers dans le chemin défini
-                        series_folder = os.path.join(downloads_path, series_name)
-                        os.makedirs(series_folder, exist_ok=True)
-                        
-                        season_folder = os.path.join(series_folder, f"Saison {season_number}")
-                        os.makedirs(season_folder, exist_ok=True)
-                        
-                        file_path = os.path.join(season_folder, f"{self.clean_filename(filename)}.mp4")
-                        
-                        with open(file_path, 'wb') as f:
-                            for chunk in response.iter_content(chunk_size=65536):
-                                if chunk:
-                                    f.write(chunk)
-                        
-                        downloaded += 1
-                        
-                    except Exception as episode_error:
-                        failed += 1
-                        print(f"Erreur episode {episode.get('episode_num', 'inconnu')}: {episode_error}")
+                items = [self.create_episode_item(downloads_path, series_name, episode, i, sizes)
+                         for i, episode in enumerate(self.selected_season_episodes)]
+                counts = self.run_episode_queue(items, season_name)
                 
                 # Message final
-                Clock.schedule_once(lambda dt: self.show_season_download_result(downloaded, failed, total_episodes, season_name), 0)
+                Clock.schedule_once(lambda dt: self.show_season_download_result(counts[DONE], counts[FAILED], len(items), season_name), 0)
                 
             except Exception as season_error:
                 error_msg = str(season_error)
@@ -1997,6 +2173,61 @@ class IPTVManagerApp(App):
                 
         threading.Thread(target=download_season_thread, daemon=True).start()
     
+    def create_episode_item(self, downloads_path, series_name, episode, index, sizes=None):
+        """Préparer l'item de file d'un épisode (dossiers Serie/Saison N créés)"""
+        file_path = catalog.episode_path(downloads_path, series_name, episode, index)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        return DownloadItem(episode['url'], file_path, label=episode.get('episode_num', f'Episode_{index+1}'),
+                            size=(sizes or {}).get(episode['url']))
+    
+    def get_library(self):
+        """Index de la bibliothèque du dossier de téléchargements courant"""
+        downloads_path = self.get_download_path()
+        if self.library is None or self.library.root != os.path.abspath(downloads_path):
+            self.library = LibraryIndex(downloads_path)
+        return self.library
+    
+    def run_episode_queue(self, items, job_name):
+        """Télécharger des épisodes en parallèle et retourner le bilan par état"""
+        total = len(items)
+        
+        # Connexions déjà prises par d'autres appareils ou par la lecture
+        self.refresh_account_info()
+        
+        # Seuls les dossiers de la série sont relus, et seulement s'ils ont changé
+        library = self.get_library()
+        for folder in sorted({os.path.dirname(item.save_path) for item in items}):
+            library.refresh(folder)
+        
+        def show_queue(channel):
+            finished = channel.done + channel.failed
+            percent = (finished / total) * 100 if total else 100
+            self.update_status(f"{job_name}: {channel.label} {channel.status} "
+                               f"({finished}/{total}, {channel.connections} en cours) - {percent:.0f}%")
+        
+        progress = progress_bus.channel(job_name, show_queue)
+        
+        def on_update(item, counts):
+            progress.update_counts(counts[DONE], counts[FAILED], counts[RUNNING], total, item.label, item.state)
+        
+        episode_queue = DownloadQueue(
+            max_workers=self.get_parallel_downloads(),
+            on_update=on_update,
+            library=library
+        )
+        for item in items:
+            episode_queue.add(item)
+        try:
+            counts = episode_queue.run()
+        finally:
+            progress.close()
+            library.save()
+        
+        skipped = episode_queue.skipped_count()
+        if skipped:
+            print(f"{job_name}: {skipped} episode(s) deja complet(s), ignore(s)")
+        return counts
+    
     def show_season_download_result(self, downloaded, failed, total, season_name):
         """Afficher le résultat du téléchargement de saison"""
         if failed == 0:
@@ -2018,93 +2249,32 @@ class IPTVManagerApp(App):
             self.show_popup("Erreur", "Veuillez d'abord charger les episodes de la serie")
             return
         
-        # Compter le total d'épisodes et estimer la taille
-        total_episodes = sum(len(episodes) for episodes in self.selected_series_episodes.values())
-        estimated_size_gb = (total_episodes * 500) / 1024  # 500MB par épisode
-        
-        # Confirmation avec estimation de taille
-        content = BoxLayout(orientation='vertical', spacing=10, padding=20)
-        content.add_widget(Label(
-            text=f"Telecharger toute la serie '{self.selected_series['name']}'?\n({total_episodes} episodes)\nTaille estimee: {estimated_size_gb:.1f}GB\nDossier: {self.get_download_path()}",
-            text_size=(300, None)
-        ))
-        
-        popup = Popup(
-            title="Confirmation",
-            content=content,
-            size_hint=(0.8, 0.5)
-        )
-        
-        btn_layout = BoxLayout(orientation='horizontal', size_hint_y=None, height=50, spacing=10)
-        
-        yes_btn = Button(text='Oui')
-        yes_btn.bind(on_press=lambda x: [popup.dismiss(), self.start_series_download()])
-        btn_layout.add_widget(yes_btn)
-        
-        no_btn = Button(text='Non')
-        no_btn.bind(on_press=popup.dismiss)
-        btn_layout.add_widget(no_btn)
-        
-        content.add_widget(btn_layout)
-        popup.open()
+        # Confirmation avec la taille exacte de tous les épisodes
+        episodes = [episode for season_episodes in self.selected_series_episodes.values()
+                    for episode in season_episodes]
+        self.confirm_bulk_download(f"Telecharger toute la serie '{self.selected_series['name']}'?",
+                                   episodes, self.start_series_download)
     
-    def start_series_download(self):
+    def start_series_download(self, sizes=None):
         """Démarrer le téléchargement de la série complète"""
         def download_series_thread():
             try:
                 series_name = self.clean_filename(self.selected_series['name'])
-                total_episodes = sum(len(episodes) for episodes in self.selected_series_episodes.values())
-                
-                downloaded = 0
-                failed = 0
                 
                 # Utiliser le chemin de téléchargement défini
                 downloads_path = self.get_download_path()
                 
                 Clock.schedule_once(lambda dt: self.update_status(f"Telechargement serie: {series_name}"), 0)
                 
-                # Parcourir chaque saison
+                # Toutes les saisons dans une seule file
+                items = []
                 for season_name, episodes in self.selected_series_episodes.items():
                     for episode in episodes:
-                        try:
-                            episode_num = episode.get('episode_num', f'Episode_{downloaded+1}')
-                            episode_title = episode.get('title', 'Sans_titre')
-                            season = episode.get('season', '1')
-                            
-                            filename = f"{series_name} - {episode_num} - {episode_title}"
-                            
-                            # Mettre à jour le statut
-                            progress = ((downloaded + 1) / total_episodes) * 100
-                            Clock.schedule_once(lambda dt, p=progress, ep=episode_num, curr=downloaded+1, tot=total_episodes: 
-                                              self.update_status(f"Serie: {ep} ({curr}/{tot}) - {p:.0f}%"), 0)
-                            
-                            # Téléchargement
-                            headers = {'User-Agent': 'Mozilla/5.0 (compatible; IPTV Manager)'}
-                            response = requests.get(episode['url'], stream=True, timeout=30, headers=headers)
-                            response.raise_for_status()
-                            
-                            # Structure de dossiers dans le chemin défini
-                            series_folder = os.path.join(downloads_path, series_name)
-                            os.makedirs(series_folder, exist_ok=True)
-                            
-                            season_folder = os.path.join(series_folder, f"Saison {season}")
-                            os.makedirs(season_folder, exist_ok=True)
-                            
-                            file_path = os.path.join(season_folder, f"{self.clean_filename(filename)}.mp4")
-                            
-                            with open(file_path, 'wb') as f:
-                                for chunk in response.iter_content(chunk_size=65536):
-                                    if chunk:
-                                        f.write(chunk)
-                            
-                            downloaded += 1
-                            
-                        except Exception as episode_error:
-                            failed += 1
-                            print(f"Erreur episode {episode.get('episode_num', 'inconnu')}: {episode_error}")
+                        items.append(self.create_episode_item(downloads_path, series_name, episode, len(items), sizes))
+                counts = self.run_episode_queue(items, "Serie")
                 
                 # Message final
-                Clock.schedule_once(lambda dt: self.show_series_download_result(downloaded, failed, total_episodes, series_name), 0)
+                Clock.schedule_once(lambda dt: self.show_series_download_result(counts[DONE], counts[FAILED], len(items), series_name), 0)
                 
             except Exception as series_error:
                 error_msg = str(series_error)
@@ -2149,141 +2319,30 @@ class IPTVManagerApp(App):
                 
         threading.Thread(target=download_in_thread, daemon=True).start()
     
-    def download_with_reconnections(self, url, save_path, file_type, progress_popup):
-        """Téléchargement avec reconnexions PRÉVENTIVES"""
-        
-        max_reconnections = 1000
-        reconnection_count = 0
-        total_downloaded = 0
-        
-        total_size = self.get_file_size(url)
-        start_time = time.time()
-        
-        # Sessions pool
-        session_pool = []
-        for i in range(10):
-            session = requests.Session()
-            retry_strategy = Retry(total=0, backoff_factor=0)
-            adapter = HTTPAdapter(
-                max_retries=retry_strategy,
-                pool_connections=1,
-                pool_maxsize=1,
-                pool_block=False
-            )
-            session.mount("http://", adapter)
-            session.mount("https://", adapter)
-            session_pool.append(session)
-        
-        current_session_index = 0
-        
-        user_agents = [
-            'VLC/3.0.18 LibVLC/3.0.18',
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'Mozilla/5.0 (Android 10; Mobile; rv:109.0) Gecko/111.0 Firefox/109.0',
-            'Mozilla/5.0 (Linux; Android 10; SM-G973F) AppleWebKit/537.36'
-        ]
-        
-        with open(save_path, 'wb') as f:
-            
-            while total_downloaded < total_size and reconnection_count < max_reconnections and not progress_popup.cancelled:
-                try:
-                    session = session_pool[current_session_index % len(session_pool)]
-                    current_session_index += 1
-                    
-                    headers = {
-                        'User-Agent': user_agents[reconnection_count % len(user_agents)],
-                        'Accept': '*/*',
-                        'Accept-Encoding': 'identity',
-                        'Connection': 'keep-alive',
-                        'Range': f'bytes={total_downloaded}-',
-                        'Cache-Control': 'no-cache'
-                    }
-                    
-                    session.headers.clear()
-                    session.headers.update(headers)
-                    
-                    response = session.get(url, stream=True, timeout=10)
-                    
-                    if response.status_code not in [200, 206]:
-                        reconnection_count += 1
-                        continue
-                    
-                    connection_downloaded = 0
-                    connection_start_time = time.time()
-                    max_connection_time = 15.0
-                    max_connection_size = 150 * 1024 * 1024
-                    chunk_size = 524288
-                    
-                    f.seek(total_downloaded)
-                    last_progress_update = connection_start_time
-                    
-                    for chunk in response.iter_content(chunk_size=chunk_size):
-                        if chunk and not progress_popup.cancelled:
-                            f.write(chunk)
-                            connection_downloaded += len(chunk)
-                            total_downloaded += len(chunk)
-                            
-                            current_time = time.time()
-                            connection_elapsed = current_time - connection_start_time
-                            
-                            if current_time - last_progress_update >= 0.5:
-                                current_speed = (connection_downloaded / (1024 * 1024)) / connection_elapsed if connection_elapsed > 0 else 0
-                                progress = (total_downloaded / total_size) * 100 if total_size > 0 else 0
-                                
-                                status = f"Telechargement: {progress:.0f}%"
-                                details = f"{total_downloaded / (1024*1024):.1f}MB / {total_size / (1024*1024):.1f}MB"
-                                
-                                Clock.schedule_once(
-                                    lambda dt, p=progress, s=status, sp=current_speed, c=reconnection_count, d=details:
-                                    progress_popup.update_progress(p, s, sp, c+1, d), 0
-                                )
-                                
-                                last_progress_update = current_time
-                            
-                            if connection_elapsed >= max_connection_time:
-                                break
-                            if connection_downloaded >= max_connection_size:
-                                break
-                            if connection_elapsed >= 3.0:
-                                current_speed = (connection_downloaded / (1024 * 1024)) / connection_elapsed
-                                if current_speed < 25.0:
-                                    break
-                        
-                        elif progress_popup.cancelled:
-                            break
-                    
-                    try:
-                        response.close()
-                    except:
-                        pass
-                    
-                    if total_downloaded >= total_size:
-                        break
-                    if progress_popup.cancelled:
-                        break
-                    
-                    reconnection_count += 1
-                        
-                except requests.exceptions.RequestException as e:
-                    reconnection_count += 1
-                    time.sleep(0.1)
-                    continue
-                    
-                except Exception as e:
-                    reconnection_count += 1
-                    continue
-        
-        # Fermer toutes les sessions
-        for session in session_pool:
-            try:
-                session.close()
-            except:
-                pass
-        
-        # Statistiques finales
-        end_time = time.time()
-        total_time = end_time - start_time
-        final_speed = (total_downloaded / (1024 * 1024)) / total_time if total_time > 0 else 0
+    def download_with_reconnections(self, url, save_path, file_type, progress_popup, segments=4):
+        """Téléchargement avec reconnexions PRÉVENTIVES, en segments parallèles si possible"""
+        
+        # Taille, support des Range et validateurs appris sur la première requête du téléchargement
+        progress = progress_bus.channel(save_path, progress_popup.show_transfer)
+        downloader = Downloader(
+            url, save_path, None,
+            segments=segments,
+            is_cancelled=lambda: progress_popup.cancelled,
+            on_progress=progress.update,
+            weight=2.0  # Téléchargement unitaire prioritaire sur les files de saisons/séries
+        )
+        try:
+            result = downloader.run()
+        finally:
+            progress.close()
+        library = self.get_library()
+        library.record(save_path, url, result['complete'], result.get('sha256'))
+        library.save()
+        
+        total_downloaded = result['downloaded']
+        total_size = result['total_size'] or total_downloaded
+        reconnection_count = result['reconnections']
+        final_speed = result['speed']
         
         def show_success():
             progress_popup.dismiss()
@@ -2291,24 +2350,32 @@ class IPTVManagerApp(App):
             success_rate = (total_downloaded / total_size) * 100 if total_size > 0 else 0
             
             if progress_popup.cancelled:
-                self.show_popup("Annule", "Telechargement annule par l'utilisateur")
-                try:
-                    if os.path.exists(save_path):
-                        os.remove(save_path)
-                except:
-                    pass
-            elif success_rate >= 99:
+                # Le fichier partiel et son manifeste sont gardés pour la reprise
+                self.show_popup("Annule", 
+                    f"Telechargement annule par l'utilisateur\n"
+                    f"{size_mb:.1f} MB conserves, reprise au prochain lancement")
+            elif result['complete']:
+                resumed_text = ""
+                if result['resumed_from']:
+                    resumed_text = f"Repris a: {result['resumed_from']/(1024*1024):.1f} MB\n"
+                if result['repaired_ranges']:
+                    resumed_text += f"Plages reparees: {result['repaired_ranges']}\n"
+                digest_text = f"SHA-256: {result['sha256'][:16]}...\n" if result.get('sha256') else ""
                 self.show_popup("Telechargement", 
                     f"Fichier telecharge avec succes!\n"
                     f"Dossier: {save_path}\n"
                     f"Taille: {size_mb:.1f} MB\n"
+                    f"{resumed_text}"
+                    f"{digest_text}"
                     f"Vitesse: {final_speed:.1f} MB/s\n"
                     f"Reconnexions: {reconnection_count}")
             else:
+                # Les plages manquantes restent dans le manifeste pour la reprise
                 self.show_popup("Telechargement", 
-                    f"Telechargement partiel ({success_rate:.1f}%)\n"
+                    f"Fichier incomplet ({success_rate:.1f}%)\n"
                     f"Dossier: {save_path}\n"
-                    f"Taille: {size_mb:.1f} MB sur {total_size/(1024*1024):.1f} MB")
+                    f"Taille: {size_mb:.1f} MB sur {total_size/(1024*1024):.1f} MB\n"
+                    f"Les octets manquants seront repris au prochain lancement")
             
             self.update_status("Telechargement termine")
             # Mettre à jour les infos d'espace disque
@@ -2316,49 +2383,14 @@ class IPTVManagerApp(App):
         
         Clock.schedule_once(lambda dt: show_success(), 0)
     
-    def get_file_size(self, url):
-        """Obtenir la taille du fichier via une requête HEAD"""
-        try:
-            headers = {
-                'User-Agent': 'VLC/3.0.18 LibVLC/3.0.18',
-                'Accept': '*/*'
-            }
-            
-            response = requests.head(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            
-            content_length = response.headers.get('content-length')
-            if content_length:
-                return int(content_length)
-            else:
-                response = requests.get(url, stream=True, headers=headers, timeout=10)
-                response.raise_for_status()
-                content_length = response.headers.get('content-length')
-                response.close()
-                return int(content_length) if content_length else 100 * 1024 * 1024
-                
-        except Exception as e:
-            return 100 * 1024 * 1024  # 100MB par défaut
-    
     def clean_filename(self, filename):
         """Nettoyer un nom de fichier pour le système de fichiers"""
-        if not filename:
-            return "fichier"
-        
-        # Remplacer les caractères interdits et problématiques
-        clean = re.sub(r'[<>:"/\\|?*\x00-\x1f]', '_', str(filename))
-        # Enlever les espaces en début/fin
-        clean = clean.strip()
-        # Remplacer les espaces multiples par un seul
-        clean = re.sub(r'\s+', ' ', clean)
-        # Limiter la longueur
-        if len(clean) > 100:
-            clean = clean[:100]
-        
-        return clean if clean else "fichier"
+        return catalog.clean_filename(filename)
     
     def play_url(self, url):
         """Lire une URL avec le lecteur système"""
+        # Le lecteur externe prend une connexion du compte: les téléchargements lui cèdent la place
+        governor.hold(PLAYBACK, PLAYBACK_HOLD_SECONDS, 'lecture')
         try:
             # Sur Android, utiliser l'intent pour ouvrir avec un lecteur vidéo
             try:
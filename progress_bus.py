@@ -0,0 +1,124 @@
+"""Agrégation de la progression des téléchargements pour l'interface (sans dépendance Kivy)"""
+
+import threading
+
+
+class ProgressChannel:
+    """Compteurs d'un job, écrits par son thread et lus par l'interface
+
+    Les threads de téléchargement ne font qu'affecter des attributs et
+    incrémenter `version`: aucune fonction ni lambda n'est créée par mise à
+    jour. Une lecture peut mélanger deux mises à jour consécutives, ce qui
+    est sans conséquence pour un affichage rafraîchi au tick suivant.
+    """
+
+    __slots__ = ('key', 'render', 'downloaded', 'total', 'speed', 'connections',
+                 'reconnections', 'done', 'failed', 'seconds', 'label', 'status',
+                 'version', 'rendered_version', 'closed')
+
+    def __init__(self, key, render):
+        self.key = key
+        self.render = render
+        self.downloaded = 0
+        self.total = 0
+        self.speed = 0.0
+        self.connections = 0
+        self.reconnections = 0
+        self.done = 0
+        self.failed = 0
+        self.seconds = 0.0
+        self.label = ''
+        self.status = ''
+        self.version = 0
+        self.rendered_version = 0
+        self.closed = False
+
+    def update(self, downloaded, total=None, speed=0.0, connections=0, reconnections=0):
+        """Progression d'un transfert (octets, taille, MB/s ou KB/s selon l'appelant)"""
+        self.downloaded = downloaded
+        self.total = total or 0
+        self.speed = speed
+        self.connections = connections
+        self.reconnections = reconnections
+        self.version += 1
+
+    def update_counts(self, done, failed, running, total, label='', status=''):
+        """Progression d'une file d'items"""
+        self.done = done
+        self.failed = failed
+        self.connections = running
+        self.total = total
+        self.label = label
+        self.status = status
+        self.version += 1
+
+    def update_recording(self, seconds, recorded_bytes, segments, skipped):
+        """Progression d'un enregistrement (signature de HlsRecorder.on_progress)"""
+        self.seconds = seconds
+        self.downloaded = recorded_bytes
+        self.done = segments
+        self.failed = skipped
+        self.version += 1
+
+    @property
+    def percent(self):
+        if not self.total:
+            return 0
+        return self.downloaded * 100 / self.total
+
+    def close(self):
+        """Dernier rendu au prochain échantillonnage, puis retrait du bus"""
+        self.closed = True
+        self.version += 1
+
+
+class ProgressBus:
+    """Registre des canaux de progression, échantillonné par le thread UI
+
+    L'interface appelle sample() à cadence fixe (Clock.schedule_interval):
+    seuls les canaux modifiés depuis le dernier tick sont rendus, une fois
+    par tick quel que soit le nombre de mises à jour reçues entre-temps.
+    """
+
+    def __init__(self):
+        self._channels = []
+        self._lock = threading.Lock()
+
+    def channel(self, key, render):
+        """Ouvrir un canal; `render(channel)` est appelé depuis le thread UI"""
+        channel = ProgressChannel(key, render)
+        with self._lock:
+            self._channels.append(channel)
+        return channel
+
+    def sample(self):
+        """Rendre les canaux modifiés et retirer les canaux fermés; retourne le nombre rendus"""
+        with self._lock:
+            channels = list(self._channels)
+
+        rendered = 0
+        finished = []
+        for channel in channels:
+            version = channel.version
+            if version != channel.rendered_version:
+                channel.rendered_version = version
+                try:
+                    channel.render(channel)
+                except Exception as e:
+                    print(f"Erreur affichage progression {channel.key}: {e}")
+                rendered += 1
+            if channel.closed:
+                finished.append(channel)
+
+        if finished:
+            with self._lock:
+                self._channels = [c for c in self._channels if c not in finished]
+        return rendered
+
+    def __len__(self):
+        with self._lock:
+            return len(self._channels)
+
+
+# Bus unique du processus, échantillonné par l'application
+progress_bus = ProgressBus()
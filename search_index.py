@@ -0,0 +1,184 @@
+"""Index de recherche en mémoire: trigrammes, mots et valeurs par champ (sans dépendance Kivy)"""
+
+import bisect
+import heapq
+import itertools
+import unicodedata
+from array import array
+from collections import defaultdict
+
+
+# Type d'index de chaque champ: les noms (presque tous distincts) par trigrammes et mots,
+# les groupes, genres et années (quelques dizaines de valeurs) par valeur
+TEXT = 'text'
+VALUE = 'value'
+
+
+def normalize(text):
+    """Clé de recherche: minuscules, sans accents ('Télé' -> 'tele')"""
+    if not text:
+        return ''
+    text = str(text)
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def trigrams(key):
+    return {key[i:i + 3] for i in range(len(key) - 2)}
+
+
+def _postings():
+    return array('I')
+
+
+class TextField:
+    """Champ à valeurs presque toutes distinctes (noms)
+
+    Garde la clé normalisée de chaque entrée, une liste de postings par
+    trigramme (sous-chaînes de 3 caractères et plus) et une par mot
+    (préfixes). Les postings sont des array d'entiers croissants: 4 octets
+    par entrée au lieu d'un objet int, et parcourables dans l'ordre.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.trigram_postings = defaultdict(_postings)
+        self.word_postings = defaultdict(_postings)
+        self._sorted_words = None
+
+    def add(self, slot, text):
+        key = normalize(text)
+        self.keys.append(key)
+        postings = self.trigram_postings
+        for trigram in trigrams(key):
+            postings[trigram].append(slot)
+        for word in set(key.split()):
+            self.word_postings[word].append(slot)
+        self._sorted_words = None
+
+    def substring(self, term):
+        """Slots dont la clé contient `term` (déjà normalisé), en ordre croissant
+
+        Produits à la demande: une page de résultats s'arrête au 50e sans
+        parcourir le reste.
+        """
+        keys = self.keys
+        if len(term) < 3:
+            # Pas de trigramme: parcours des clés déjà normalisées
+            return (slot for slot, key in enumerate(keys) if term in key)
+        postings = []
+        for trigram in trigrams(term):
+            posting = self.trigram_postings.get(trigram)
+            if posting is None:
+                return iter(())
+            postings.append(posting)
+        shortest = min(postings, key=len)
+        if len(term) == 3:
+            return iter(shortest)
+        # Intersection avec les autres postings par la clé elle-même: contenir `term`
+        # implique de contenir tous ses trigrammes, et le test est exact
+        return (slot for slot in shortest if term in keys[slot])
+
+    def prefix(self, term):
+        """Slots dont un mot commence par `term`"""
+        if self._sorted_words is None:
+            self._sorted_words = sorted(self.word_postings)
+        words = self._sorted_words
+        start = bisect.bisect_left(words, term)
+        end = bisect.bisect_left(words, term + '\uffff', start)
+        slots = set()
+        for word in words[start:end]:
+            slots.update(self.word_postings[word])
+        return slots
+
+
+class ValueField:
+    """Champ à peu de valeurs distinctes (groupe, genre, année): postings par valeur
+
+    Une recherche teste chaque valeur distincte (quelques dizaines) puis
+    réunit les postings de celles qui correspondent.
+    """
+
+    def __init__(self):
+        self.value_postings = defaultdict(_postings)
+        self._keys = {}
+
+    def add(self, slot, text):
+        if not text:
+            return
+        # Quelques dizaines de valeurs: normalisées une fois chacune
+        key = self._keys.get(text)
+        if key is None:
+            key = self._keys[text] = normalize(text)
+        self.value_postings[key].append(slot)
+
+    def substring(self, term):
+        """Slots dont la valeur contient `term`, en ordre croissant"""
+        return heapq.merge(*(posting for value, posting in self.value_postings.items() if term in value))
+
+    def prefix(self, term):
+        slots = set()
+        for value, posting in self.value_postings.items():
+            if any(word.startswith(term) for word in value.split()):
+                slots.update(posting)
+        return slots
+
+
+FIELD_TYPES = {TEXT: TextField, VALUE: ValueField}
+
+
+class SearchIndex:
+    """Index d'une section du catalogue, construit une fois par add() puis remplacé
+
+    `fields` associe chaque champ cherché à son type (TEXT ou VALUE). Les
+    entrées sont identifiées par `item_id` (id de la ligne SQLite) et
+    rangées dans des slots consécutifs. search() retourne les ids dans
+    l'ordre d'ajout, c'est-à-dire l'ordre du fournisseur. Les minuscules et
+    accents sont normalisés une fois à l'ajout, jamais à la recherche.
+    """
+
+    def __init__(self, fields):
+        self.fields = {name: FIELD_TYPES[kind]() for name, kind in fields.items()}
+        self.ids = array('q')
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, item_id, values):
+        """Ajouter une entrée: `values` est {champ: texte brut}"""
+        slot = len(self.ids)
+        self.ids.append(item_id)
+        for name, field in self.fields.items():
+            field.add(slot, values.get(name))
+
+    def search(self, query, fields=None, prefix=False, limit=None):
+        """Ids des `limit` premières entrées dont un des `fields` (défaut: tous) contient `query`
+
+        Avec `prefix`, chaque mot de la requête doit commencer un mot du
+        champ ('star wa' trouve 'Star Wars'): intersection des postings de
+        chaque mot. Sinon la requête entière est cherchée comme sous-chaîne,
+        comme le filtre historique: les slots de chaque champ arrivent en
+        ordre croissant et sont fusionnés, la recherche s'arrête dès
+        `limit` résultats. Les espaces autour de la requête sont ignorés: une
+        requête vide ou faite d'espaces ne trouve rien.
+        """
+        term = normalize(query).strip()
+        if not term:
+            return []
+        fields = [self.fields[name] for name in (fields or self.fields)]
+        if prefix:
+            slots = None
+            for word in term.split():
+                matches = set().union(*(field.prefix(word) for field in fields))
+                slots = matches if slots is None else slots & matches
+            slots = sorted(slots)
+        elif len(fields) == 1:
+            slots = fields[0].substring(term)
+        else:
+            # Une entrée trouvée dans deux champs arrive deux fois de suite
+            slots = (slot for slot, _ in itertools.groupby(
+                heapq.merge(*(field.substring(term) for field in fields))))
+        ids = self.ids
+        return list(itertools.islice((ids[slot] for slot in slots), limit))
@@ -0,0 +1,8 @@
+"""Modules de l'application et serveur de pannes des benchmarks importables depuis les tests"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
@@ -0,0 +1,101 @@
+"""Recherche dans le catalogue SQLite et index en mémoire construit à la demande"""
+
+import time
+
+import pytest
+
+import catalog_store
+from catalog_store import CatalogStore
+from search_index import SearchIndex, TEXT, VALUE
+
+
+MOVIES = [
+    {'name': 'Star Wars', 'genre': 'Science-Fiction', 'year': '1977', 'stream_id': 1},
+    {'name': 'Légende', 'genre': 'Fantastique', 'year': '1985', 'stream_id': 2},
+    {'name': 'La Guerre des étoiles', 'genre': 'Science-Fiction', 'year': '1977', 'stream_id': 3},
+]
+
+
+def wait_for_index(store, section, timeout=5.0):
+    deadline = time.time() + timeout
+    while section not in store.indexes and time.time() < deadline:
+        time.sleep(0.01)
+    return store.indexes.get(section)
+
+
+def test_index_built_lazily_per_section(tmp_path):
+    store = CatalogStore(str(tmp_path / 'catalog.sqlite'), indexed=True)
+    store.replace_section('movies', MOVIES)
+    store.replace_section('series', [{'name': 'Star Trek', 'series_id': 9}])
+    assert store.indexes == {}
+
+    # Première recherche: réponse SQLite, index de la seule section cherchée construit à côté
+    assert [m['stream_id'] for m in store.search('movies', 'star')] == [1]
+    assert wait_for_index(store, 'movies') is not None
+    assert 'series' not in store.indexes
+    assert [m['stream_id'] for m in store.search('movies', 'legende')] == [2]
+    assert len(store.search('movies', '1977')) == 2
+
+    # Section réécrite: index abandonné, reconstruit à la recherche suivante
+    store.replace_section('movies', MOVIES[:1])
+    assert 'movies' not in store.indexes
+    assert len(store.search('movies', 'star')) == 1
+    assert wait_for_index(store, 'movies') is not None
+    assert len(store.indexes['movies']) == 1
+
+
+def test_same_results_before_and_after_index(tmp_path):
+    # SQLite (FTS trigram ou instr) puis index en mémoire: même sous-chaîne, mêmes résultats
+    store = CatalogStore(str(tmp_path / 'catalog.sqlite'), indexed=True)
+    store.replace_section('movies', MOVIES + [
+        {'name': 'Wars of the Star', 'genre': 'Action', 'year': '2001', 'stream_id': 4}])
+    queries = ['star wa', 'tar', 'ar', ' STAR ', 'legende', 'étoiles', 'science-fi', '19']
+    before = {query: [m['stream_id'] for m in store.search('movies', query)] for query in queries}
+    assert before['star wa'] == [1]
+    assert before['tar'] == [1, 4]
+    assert before['legende'] == [2]
+    assert store.build_index('movies')
+    after = {query: [m['stream_id'] for m in store.search('movies', query)] for query in queries}
+    assert after == before
+
+
+def test_replace_section_from_generator(tmp_path, monkeypatch):
+    # Lue par lots, la section n'apparaît qu'une fois complète; une erreur garde l'ancienne
+    monkeypatch.setattr(catalog_store, 'WRITE_BATCH', 2)
+    store = CatalogStore(str(tmp_path / 'catalog.sqlite'))
+    store.replace_section('movies', MOVIES)
+
+    def failing():
+        yield from MOVIES
+        assert len(store.search('movies')) == 3
+        raise ConnectionError('coupure')
+
+    with pytest.raises(ConnectionError):
+        store.replace_section('movies', failing())
+    assert [m['stream_id'] for m in store.search('movies')] == [1, 2, 3]
+    assert store.counts() == {'channels': 0, 'movies': 3, 'series': 0}
+
+    store.replace_section('movies', (dict(movie, stream_id=movie['stream_id'] + 10) for movie in MOVIES))
+    assert [m['stream_id'] for m in store.search('movies')] == [11, 12, 13]
+    assert [m['stream_id'] for m in store.search('movies', 'etoiles')] == [13]
+    assert store.counts()['movies'] == 3
+
+
+def test_whitespace_query_finds_nothing(tmp_path):
+    store = CatalogStore(str(tmp_path / 'catalog.sqlite'), indexed=True)
+    store.replace_section('movies', MOVIES)
+    assert store.search('movies', '   ') == []
+    assert store.search('movies', ' ') == []
+    assert len(store.search('movies', '')) == 3
+    assert store.build_index('movies')
+    assert store.search('movies', ' \t') == []
+
+
+def test_search_index_strips_query():
+    index = SearchIndex({'name': TEXT, 'genre': VALUE})
+    for item_id, movie in enumerate(MOVIES):
+        index.add(item_id, movie)
+    assert index.search('  ') == []
+    assert index.search(' star ') == [0]
+    assert index.search('science', limit=1) == [0]
+    assert index.search('guerre des', prefix=True) == [2]
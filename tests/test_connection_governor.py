@@ -0,0 +1,101 @@
+"""Comptabilité des baux du ConnectionGovernor et relecture du compte"""
+
+import threading
+import time
+
+from connection_governor import API, DOWNLOAD, PLAYBACK, RECORDING, ConnectionGovernor
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_unlimited_without_account():
+    governor = ConnectionGovernor()
+    leases = [governor.acquire(DOWNLOAD) for _ in range(10)]
+    assert all(leases)
+    assert governor.free_slots() is None
+    for lease in leases:
+        lease.release()
+    assert governor.leases == []
+
+
+def test_budget_counts_external_connections():
+    governor = ConnectionGovernor()
+    governor.update_account(3, 1)
+    assert governor.capacity() == 2
+    first = governor.acquire(DOWNLOAD)
+    second = governor.acquire(DOWNLOAD)
+    assert governor.free_slots() == 0
+    assert governor.acquire(DOWNLOAD, timeout=0.1) is None
+
+    # Nos propres baux ne sont pas comptés comme externes
+    governor.update_account(3, 3)
+    assert governor.external == 1
+
+    first.release()
+    first.release()
+    assert governor.free_slots() == 1
+    second.release()
+    assert governor.free_slots() == 2
+
+
+def test_priority_preempts_latest_download():
+    governor = ConnectionGovernor()
+    governor.update_account(2, 0)
+    older = governor.acquire(DOWNLOAD, 'ancien')
+    newer = governor.acquire(DOWNLOAD, 'recent')
+    got = []
+    thread = threading.Thread(target=lambda: got.append(governor.acquire(RECORDING, timeout=2)))
+    thread.start()
+    assert wait_until(lambda: newer.preempted)
+    assert not older.preempted
+    newer.release()
+    thread.join()
+    assert got[0] is not None and got[0].priority == RECORDING
+    got[0].release()
+    older.release()
+    assert governor.leases == []
+
+
+def test_api_waits_without_preempting_beyond_need():
+    governor = ConnectionGovernor()
+    governor.update_account(1, 0)
+    download = governor.acquire(DOWNLOAD)
+    got = []
+    thread = threading.Thread(target=lambda: got.append(governor.acquire(API, timeout=2)))
+    thread.start()
+    assert wait_until(lambda: download.preempted)
+    download.release()
+    thread.join()
+    assert got[0] is not None
+    got[0].release()
+
+
+def test_hold_expiry_refreshes_account():
+    governor = ConnectionGovernor()
+    refreshed = threading.Event()
+    governor.watch_account(refreshed.set)
+    lease = governor.hold(PLAYBACK, 0.05, 'lecture')
+    assert lease in governor.leases
+    assert refreshed.wait(2)
+    assert lease.released
+
+
+def test_account_polled_while_downloads_run():
+    governor = ConnectionGovernor()
+    calls = []
+    governor.watch_account(lambda: calls.append(time.time()), interval=0.02)
+    lease = governor.acquire(DOWNLOAD)
+    assert wait_until(lambda: len(calls) >= 2)
+    lease.release()
+    # Sans bail de téléchargement, la relecture s'arrête
+    assert wait_until(lambda: governor._poller is None)
+    count = len(calls)
+    time.sleep(0.1)
+    assert len(calls) == count
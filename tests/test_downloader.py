@@ -0,0 +1,156 @@
+"""Reprise et reconnexions du Downloader contre le serveur de pannes local"""
+
+import hashlib
+import os
+
+import pytest
+
+import downloader
+from connection_governor import ConnectionGovernor
+from downloader import MIN_SEGMENT_SIZE, OVERLAP_CHECK, DownloadManifest, Downloader, RemoteInfo
+from fault_server import FaultConfig, FaultServer
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(size, **config):
+        server = FaultServer.with_random_data(size, FaultConfig(**config)).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def test_stream_reconnects_after_cut(serve, tmp_path):
+    # Taille inconnue et coupure à mi-corps: la reconnexion se fait sans manifeste
+    server = serve(300_000, no_length=True, chunked=True, cut_first=1)
+    path = tmp_path / 'flux.ts'
+    result = Downloader(server.url('flux-coupe.ts'), str(path), None).run()
+    assert result['mode'] == 'flux'
+    assert result['complete']
+    assert result['reconnections'] == 1
+    assert path.read_bytes() == server.data
+
+
+def test_stream_with_cached_remote_info(serve, tmp_path):
+    # Le second téléchargement de la même URL part des informations en cache
+    server = serve(200_000, no_length=True, chunked=True)
+    url = server.url('flux-cache.ts')
+    for name in ('premier.ts', 'second.ts'):
+        path = tmp_path / name
+        result = Downloader(url, str(path), None).run()
+        assert result['complete']
+        assert path.read_bytes() == server.data
+    assert server.requests == 2
+
+
+def test_discovery_retries(serve, tmp_path):
+    # Les premières requêtes échouent: la découverte est retentée, pas abandonnée
+    server = serve(100_000, fail_first=2)
+    path = tmp_path / 'video.mp4'
+    result = Downloader(server.url('decouverte.mp4'), str(path), None, segments=1).run()
+    assert result['complete']
+    assert result['reconnections'] == 2
+    assert path.read_bytes() == server.data
+
+
+def test_written_before_only_counts_ranges_on_disk(tmp_path):
+    manifest = DownloadManifest(str(tmp_path / 'video.mp4'), 'http://a/video.mp4', 1000)
+    manifest.add_range(0, 100)
+    manifest.add_range(300, 500)
+    assert manifest.written_before(100, 64) == 64
+    assert manifest.written_before(50, 64) == 50
+    assert manifest.written_before(200, 64) == 0
+    assert manifest.written_before(320, 64) == 20
+    assert manifest.written_before(0, 64) == 0
+
+
+def test_serial_reconnects_after_disconnects(serve, tmp_path):
+    server = serve(3_000_000, disconnect_rate=0.05)
+    path = tmp_path / 'video.mp4'
+    result = Downloader(server.url('serie.mp4'), str(path), None, segments=1).run()
+    assert result['complete']
+    assert result['mode'] == 'serie'
+    assert result['reconnections'] > 0
+    assert path.read_bytes() == server.data
+    assert result['sha256'] == hashlib.sha256(server.data).hexdigest()
+    assert not os.path.exists(str(path) + DownloadManifest.suffix)
+
+
+def test_segmented_reconnects_after_disconnects(serve, tmp_path):
+    server = serve(2 * MIN_SEGMENT_SIZE + 1_000_000, disconnect_rate=0.01)
+    path = tmp_path / 'video.mp4'
+    result = Downloader(server.url('segments.mp4'), str(path), None, segments=4).run()
+    assert result['complete']
+    assert result['mode'] == 'segmente'
+    assert result['reconnections'] > 0
+    assert path.read_bytes() == server.data
+
+
+def test_segmented_grows_into_free_slots(serve, tmp_path, monkeypatch):
+    # Compte à 5 connexions, aucune autre utilisée: 5 segments au lieu des 2 demandés
+    governor = ConnectionGovernor()
+    governor.update_account(5, 0)
+    monkeypatch.setattr(downloader, 'governor', governor)
+    monkeypatch.setattr(downloader, 'MIN_SEGMENT_SIZE', 256 * 1024)
+    server = serve(3_000_000)
+    path = tmp_path / 'video.mp4'
+    result = Downloader(server.url('places.mp4'), str(path), None, segments=2).run()
+    assert result['complete']
+    assert result['mode'] == 'segmente'
+    assert server.requests == 1 + 5
+    assert path.read_bytes() == server.data
+    assert governor.leases == []
+
+
+def test_resume_from_manifest_after_cancel(serve, tmp_path):
+    server = serve(4_000_000)
+    url = server.url('reprise.mp4')
+    path = tmp_path / 'video.mp4'
+
+    first = Downloader(url, str(path), None, segments=1)
+    first.chunk_size = 64 * 1024
+    first.is_cancelled = lambda: first.downloaded >= 1_000_000
+    result = first.run()
+    assert not result['complete']
+    assert result['cancelled']
+    manifest = DownloadManifest.load(str(path))
+    assert manifest is not None and manifest.completed_bytes() >= 1_000_000
+
+    server.reset_counters()
+    result = Downloader(url, str(path), None, segments=1).run()
+    assert result['complete']
+    assert result['resumed_from'] == manifest.completed_bytes()
+    # Seuls les octets manquants (et le recouvrement de vérification) sont redemandés
+    assert server.bytes_sent < len(server.data) - result['resumed_from'] + 2 * OVERLAP_CHECK + 1_000_000
+    assert path.read_bytes() == server.data
+    assert result['sha256'] == hashlib.sha256(server.data).hexdigest()
+
+
+def test_server_ignoring_range_falls_back_to_serial(serve, tmp_path):
+    # Pas de mode segmenté tenté: la réponse 200 de la découverte sert tout le transfert
+    server = serve(2 * MIN_SEGMENT_SIZE + 100_000, ignore_range=True)
+    path = tmp_path / 'video.mp4'
+    result = Downloader(server.url('sans-range.mp4'), str(path), None, segments=4).run()
+    assert result['complete']
+    assert result['mode'] == 'serie'
+    assert path.read_bytes() == server.data
+    assert server.requests == 1
+    assert server.bytes_sent == len(server.data)
+
+
+def test_remote_info_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(downloader, '_remote_info_cache', {})
+    monkeypatch.setattr(downloader, 'REMOTE_INFO_MAX', 3)
+    expired = RemoteInfo(size=1)
+    expired.fetched_at -= downloader.REMOTE_INFO_TTL
+    downloader.remember_remote_info('http://a/0', RemoteInfo(size=0))
+    downloader.remember_remote_info('http://a/expire', expired)
+    for i in range(1, 4):
+        downloader.remember_remote_info(f'http://a/{i}', RemoteInfo(size=i))
+    assert list(downloader._remote_info_cache) == ['http://a/1', 'http://a/2', 'http://a/3']
+    assert downloader.cached_remote_info('http://a/3').size == 3
@@ -0,0 +1,113 @@
+"""Enregistrement HLS contre un serveur de fichiers local"""
+
+import functools
+import http.server
+import queue
+import threading
+import time
+
+import pytest
+
+from hls_recorder import HlsError, HlsRecorder, MediaPlaylist, hls_url
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def __init__(self, *args, requested=None, **kwargs):
+        self.requested = requested
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        self.requested.append(self.path)
+        if self.path.endswith('.ts'):
+            # Segments lents, comme un vrai serveur
+            time.sleep(0.05)
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def hls_server(tmp_path):
+    root = tmp_path / 'www'
+    root.mkdir()
+    requested = []
+    server = http.server.ThreadingHTTPServer(
+        ('127.0.0.1', 0), functools.partial(QuietHandler, directory=str(root), requested=requested))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield root, f'http://127.0.0.1:{server.server_port}', requested
+    server.shutdown()
+    server.server_close()
+
+
+def test_records_segments_in_order_and_skips_missing(hls_server, tmp_path):
+    root, base, _ = hls_server
+    segments = [bytes([i]) * (100_000 + i) for i in range(4)]
+    lines = ['#EXTM3U', '#EXT-X-TARGETDURATION:1', '#EXT-X-MEDIA-SEQUENCE:0']
+    for i, data in enumerate(segments):
+        if i != 2:
+            (root / f'seg{i}.ts').write_bytes(data)
+        lines += ['#EXTINF:1.0,', f'seg{i}.ts']
+    lines.append('#EXT-X-ENDLIST')
+    (root / 'live.m3u8').write_text('\n'.join(lines))
+
+    recorder = HlsRecorder(f'{base}/live.m3u8', str(tmp_path / 'live.ts'))
+    recorder.live_edge = 4
+    recorder.segment_retries = 2
+    result = recorder.run()
+
+    assert result['ended']
+    assert result['segments'] == 3
+    assert result['skipped'] == 1
+    assert result['recorded_seconds'] == 3.0
+    assert (tmp_path / 'live.ts').read_bytes() == segments[0] + segments[1] + segments[3]
+
+
+def test_sequence_reset_forgets_old_durations(tmp_path):
+    recorder = HlsRecorder('http://a/live.m3u8', str(tmp_path / 'live.ts'))
+    jobs = queue.Queue()
+    old = [(sequence, f'http://a/{sequence}.ts', 6.0) for sequence in range(100, 106)]
+    recorder._schedule(MediaPlaylist('', 6.0, 100, old, False), jobs)
+    assert set(recorder.durations) == {103, 104, 105}
+
+    new = [(sequence, f'http://a/n{sequence}.ts', 2.0) for sequence in range(0, 3)]
+    recorder._schedule(MediaPlaylist('', 2.0, 0, new, False), jobs)
+    assert recorder.durations == {0: 2.0, 1: 2.0, 2: 2.0}
+    assert recorder.next_sequence == 0
+
+
+def test_hls_url_rewrites_live_streams():
+    assert hls_url('http://h:8080/live/u/p/123.ts') == 'http://h:8080/live/u/p/123.m3u8'
+    assert hls_url('http://h/live/u/p/123') == 'http://h/live/u/p/123.m3u8'
+    assert hls_url('http://h/hls/chaine.m3u8?token=1') == 'http://h/hls/chaine.m3u8?token=1'
+    assert hls_url('http://h/movie/u/p/5.mp4') is None
+
+
+def test_endless_stream_rejected_before_reading(hls_server, tmp_path):
+    root, base, _ = hls_server
+    (root / 'flux.ts').write_bytes(b'\x47' * 3_000_000)
+    (root / 'faux.m3u8').write_bytes(b'\x47' * 3_000_000)
+    for name in ('flux.ts', 'faux.m3u8'):
+        recorder = HlsRecorder(f'{base}/{name}', str(tmp_path / 'live.ts'))
+        with pytest.raises(HlsError):
+            recorder.run()
+
+
+def test_max_duration_stops_fetching_queued_segments(hls_server, tmp_path):
+    root, base, requested = hls_server
+    lines = ['#EXTM3U', '#EXT-X-TARGETDURATION:1', '#EXT-X-MEDIA-SEQUENCE:0']
+    for i in range(30):
+        (root / f'seg{i}.ts').write_bytes(bytes([i]) * 1000)
+        lines += ['#EXTINF:1.0,', f'seg{i}.ts']
+    lines.append('#EXT-X-ENDLIST')
+    (root / 'live.m3u8').write_text('\n'.join(lines))
+
+    recorder = HlsRecorder(f'{base}/live.m3u8', str(tmp_path / 'live.ts'), max_duration=2)
+    recorder.live_edge = 30
+    recorder.lookahead = 2
+    result = recorder.run()
+    assert result['recorded_seconds'] >= 2
+    time.sleep(0.3)
+    # Les segments déjà en vol à l'arrêt, pas les 30 programmés
+    assert len([path for path in requested if path.endswith('.ts')]) <= 2 + 2 * recorder.lookahead
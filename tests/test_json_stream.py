@@ -0,0 +1,66 @@
+"""Décodage incrémental des tableaux JSON, quel que soit le découpage en chunks"""
+
+import json
+
+import pytest
+
+from json_stream import iter_json_array
+
+
+ITEMS = [
+    {'name': 'Télé Été ✓', 'stream_id': 12, 'rating': 7.25, 'added': None},
+    {'name': 'a,b]c', 'tags': ['x', {'y': [1, 2]}], 'ok': True},
+    -3.5e2,
+    12345,
+    'chaîne "citée"',
+    False,
+    [],
+]
+
+
+def split_at(data, *cuts):
+    bounds = [0, *cuts, len(data)]
+    return [data[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def test_every_single_chunk_boundary():
+    data = ('\ufeff \n' + json.dumps(ITEMS, ensure_ascii=False) + '\n').encode('utf-8')
+    for cut in range(len(data) + 1):
+        assert list(iter_json_array(split_at(data, cut))) == ITEMS, cut
+
+
+def test_byte_by_byte():
+    data = json.dumps(ITEMS, ensure_ascii=False, indent=2).encode('utf-8')
+    assert list(iter_json_array(data[i:i + 1] for i in range(len(data)))) == ITEMS
+
+
+def test_number_cut_before_its_delimiter():
+    # '1' puis '.25' ne doit pas produire 1
+    assert list(iter_json_array([b'[1', b'.25, 2', b'0]'])) == [1.25, 20]
+    assert list(iter_json_array([b'[1', b'e3]'])) == [1000.0]
+
+
+def test_elements_yielded_before_the_end():
+    def chunks():
+        yield b'[{"a": 1}, {"b"'
+        assert seen == [{'a': 1}]
+        yield b': 2}]'
+
+    seen = []
+    for value in iter_json_array(chunks()):
+        seen.append(value)
+    assert seen == [{'a': 1}, {'b': 2}]
+
+
+def test_object_null_and_empty_responses():
+    assert list(iter_json_array([b'{"1": {"n": ', b'1}, "2": {"n": 2}}'])) == [{'n': 1}, {'n': 2}]
+    assert list(iter_json_array([b'nu', b'll'])) == []
+    assert list(iter_json_array([b'', b'  '])) == []
+    assert list(iter_json_array([b'[', b']'])) == []
+
+
+def test_truncated_array_raises():
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array([b'[{"a": 1}, {"b": ']))
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array([b'[1, 2']))
@@ -0,0 +1,82 @@
+"""Complétude des fichiers de la bibliothèque et saut des items déjà téléchargés"""
+
+import os
+
+from download_queue import DONE, DownloadItem, DownloadQueue
+from library_index import COMPLETE, PARTIAL, UNKNOWN, LibraryIndex
+
+
+def write(path, size):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'x' * size)
+    return str(path)
+
+
+def test_unrecorded_file_is_not_complete(tmp_path):
+    path = write(tmp_path / 'Serie' / 'e01.mp4', 1000)
+    library = LibraryIndex(str(tmp_path))
+    library.refresh()
+    assert library.lookup(path)['state'] == UNKNOWN
+    assert not library.is_complete(path, 'http://a/e01.mp4')
+    assert not library.is_complete(path, None)
+
+
+def test_manifest_marks_partial(tmp_path):
+    path = write(tmp_path / 'e01.mp4', 1000)
+    write(tmp_path / 'e01.mp4.part.json', 10)
+    library = LibraryIndex(str(tmp_path))
+    library.refresh()
+    assert library.lookup(path)['state'] == PARTIAL
+
+
+def test_recorded_complete_requires_same_url(tmp_path):
+    path = write(tmp_path / 'e01.mp4', 1000)
+    library = LibraryIndex(str(tmp_path))
+    library.record(path, 'http://a/e01.mp4', True)
+    assert library.is_complete(path, 'http://a/e01.mp4')
+    assert not library.is_complete(path, 'http://b/e01.mp4')
+    assert not library.is_complete(path, None)
+
+    # Enregistrement conservé au rechargement et au rafraîchissement tant que le fichier ne bouge pas
+    library.save()
+    reloaded = LibraryIndex(str(tmp_path))
+    reloaded.refresh()
+    assert reloaded.lookup(path)['state'] == COMPLETE
+    assert reloaded.is_complete(path, 'http://a/e01.mp4')
+
+
+def test_modified_file_is_no_longer_complete(tmp_path):
+    path = write(tmp_path / 'e01.mp4', 1000)
+    library = LibraryIndex(str(tmp_path))
+    library.record(path, 'http://a/e01.mp4', True)
+    write(tmp_path / 'e01.mp4', 500)
+    os.utime(path, (1, 1))
+    library.refresh()
+    assert not library.is_complete(path, 'http://a/e01.mp4')
+
+
+def test_queue_skips_unknown_file_only_with_expected_size(tmp_path):
+    same = write(tmp_path / 'e01.mp4', 1000)
+    short = write(tmp_path / 'e02.mp4', 400)
+    library = LibraryIndex(str(tmp_path))
+    library.refresh()
+
+    queue = DownloadQueue(library=library, max_retries=0)
+    queue.add(DownloadItem('http://a/e01.mp4', same, size=1000))
+    queue.add(DownloadItem('http://a/e02.mp4', short, size=1000))
+    assert queue._already_downloaded(queue.items[0])
+    assert not queue._already_downloaded(queue.items[1])
+    # Le fichier adopté est désormais enregistré avec son URL
+    assert library.is_complete(same, 'http://a/e01.mp4')
+
+
+def test_queue_compares_unknown_file_to_remote_size(tmp_path):
+    path = write(tmp_path / 'e01.mp4', 1000)
+    library = LibraryIndex(str(tmp_path))
+    library.refresh()
+
+    queue = DownloadQueue(size_func=lambda url: 1000, library=library)
+    item = queue.add(DownloadItem('http://a/e01.mp4', path))
+    queue.run()
+    assert item.state == DONE
+    assert item.skipped
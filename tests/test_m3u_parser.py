@@ -0,0 +1,24 @@
+"""Parsing EXTINF et ChannelRecord"""
+
+from m3u_parser import ChannelRecord, iter_m3u, parse_extinf
+
+
+def test_attributes_after_bare_token():
+    # Un mot sans '=' au milieu des attributs ne coupe ni les suivants ni le nom
+    assert parse_extinf('#EXTINF:-1 tvg-id="x" junk tvg-logo="l",Nom') == (
+        '-1', {'tvg-id': 'x', 'tvg-logo': 'l'}, 'Nom')
+    assert parse_extinf('#EXTINF:-1 tvg-id="x" junk group-title="A, B",Nom, suite') == (
+        '-1', {'tvg-id': 'x', 'group-title': 'A, B'}, 'Nom, suite')
+    assert parse_extinf('#EXTINF:-1 tvg-id=x,Nom') == ('-1', {'tvg-id': 'x'}, 'Nom')
+    assert parse_extinf('#EXTINF:-1 junk,') is None
+
+
+def test_equal_records_hash_alike():
+    lines = ['#EXTM3U', '#EXTINF:-1 tvg-id="a" group-title="Info",Info 1', 'http://h/1.ts']
+    first, = iter_m3u(lines)
+    second = ChannelRecord.from_row(first.to_row())
+    assert first == second
+    assert hash(first) == hash(second)
+    assert len({first, second}) == 1
+    second['tvg-logo'] = 'logo.png'
+    assert first != second